@@ -41,14 +41,30 @@
 # 
 # ##### 1.1 - Import Libraries
 # 
-# The first step is to import [MySQL Connector](https://dev.mysql.com/doc/connector-python/en/) and [pandas](https://pandas.pydata.org/).
+# The first step is to import [MySQL Connector](https://dev.mysql.com/doc/connector-python/en/) and [pandas](https://pandas.pydata.org/), along with a few modules from the Python standard library that we will use later on. [pyarrow](https://arrow.apache.org/docs/python/) is optional, and only needed for sections 18 and 19.
+# 
+# This notebook is also exported as the script mysql.py, whose name hides MySQL Connector's own `mysql` package whenever its directory is on the import path - as it is when running the script, or this notebook. `import_package` from our school_db package (see section 25) finds the real package first.
 
 # In[1]:
 
 
+if __name__ != "__main__":
+    raise ImportError("mysql.py is the tutorial notebook exported as a script, and runs every cell when imported: import school_db instead")
+
+from school_db._lazy import import_package
+import_package("mysql") # this file is called mysql.py, so make sure `import mysql` finds MySQL Connector rather than this file
+
 import mysql.connector
 from mysql.connector import Error
 import pandas as pd
+try:
+    import pyarrow as pa # optional: only needed for sections 18 and 19
+except ImportError:
+    pa = None
+
+import asyncio
+import os
+import tempfile
 
 
 # -------------------
@@ -80,6 +96,7 @@ def create_server_connection(host_name, user_name, user_password):
 
 pw = "Tlord422" # IMPORTANT! MySQL Terminal password here.
 db = "school" # This is the name of the database we will create in the next step - call it whatever you like.
+run_benchmarks = False # Set to True to run the timing experiments in the later sections. They take several minutes.
 
 connection = create_server_connection("localhost", "root", pw)
 
@@ -145,6 +162,57 @@ def execute_query(connection, query):
         print(f"Error: '{err}'")
 
 
+# ##### 2.5 - Pool Database Connections
+# 
+# Throughout this notebook we call create_db_connection before every block of queries. Each call performs a full TCP and authentication handshake with the server, and the old connection is simply forgotten rather than closed.
+# 
+# Instead, let's keep a small pool of open connections per database and hand them out again. The pool:
+# * never holds more than `max_size` connections (callers wait up to `checkout_timeout` seconds for one to free up),
+# * checks a connection is still alive before handing it out,
+# * closes connections which have been sitting idle for longer than `max_idle_seconds`,
+# * recycles connections older than `max_lifetime_seconds`, so they never outlive server-side timeouts.
+# 
+# A connection taken from the pool goes back when we call close() on it, when we leave a `with` block, or when the variable holding it is reassigned - so the rest of the notebook keeps working unchanged.
+# 
+# From here on, the code for each new feature lives in the `school_db` package next to this notebook (see section 25), split into modules by topic. Each section imports what it needs from there and shows it in use.
+
+# In[ ]:
+
+
+from school_db import ConnectionPool, PooledConnection, get_pool
+
+
+# school_db's create_db_connection takes the same arguments as ours, but hands out pooled connections.
+
+# In[ ]:
+
+
+from school_db import create_db_connection
+
+
+# We can also borrow a connection just for the duration of a `with` block:
+# 
+# ```python
+# with create_db_connection("localhost", "root", pw, db) as connection:
+#     execute_query(connection, some_query)
+# ```
+# 
+# Any extra keyword arguments are passed on to mysql.connector.connect(). Connections opened with different options are kept in separate pools.
+# 
+# ##### 2.6 - Benchmark Pooled vs Unpooled Connections
+# 
+# To see what pooling buys us without needing a second MySQL Server, we use a small stand-in server from `school_db.testing` which behaves like a connection from mysql.connector.connect(), but simply sleeps for a typical localhost handshake and statement round trip. Like every benchmark in this notebook, it only runs when `run_benchmarks` (section 2.1) is set to True.
+
+# In[ ]:
+
+
+from school_db.testing import StandInServer
+from school_db.benchmarks import benchmark_connection_pool
+
+if run_benchmarks:
+    benchmark_connection_pool()
+
+
 # -------------------
 # 
 # ### 3. Creating Tables
@@ -519,6 +587,122 @@ df = pd.DataFrame(from_db, columns=columns)
 display(df)
 
 
+# ##### 5.6 - Streaming Large Results
+# 
+# read_query uses [fetchall()](https://dev.mysql.com/doc/connector-python/en/connector-python-api-mysqlcursor-fetchall.html), which pulls the entire result set into one Python list. That is fine for our little school, but a SELECT returning millions of rows will happily use all of our memory.
+# 
+# stream_query is a generator instead. It uses an unbuffered cursor, so rows stay on the server until we ask for them, and it fetches them `batch_size` at a time with [fetchmany()](https://dev.mysql.com/doc/connector-python/en/connector-python-api-mysqlcursor-fetchmany.html). Set `batches=True` to receive each list of rows rather than one row at a time.
+# 
+# If we stop iterating early (a `break`, or an exception in our loop), the rest of the result is read off the wire and discarded and the cursor is closed, so the connection can be used again straight away. An error from the server is printed as usual, but then also raised once the cursor has been cleaned up: stopping quietly would make a result which was cut short look complete.
+
+# In[ ]:
+
+
+from school_db import stream_query, close_cursor
+
+connection = create_db_connection("localhost", "root", pw, db)
+
+for result in stream_query(connection, q3, batch_size=2):
+  print(result)
+
+
+# Because only one batch is held at a time, peak memory stays flat however large the result is. We can check that with [tracemalloc](https://docs.python.org/3/library/tracemalloc.html) against the stand-in server from section 2.6, serving a large synthetic course table:
+
+# In[ ]:
+
+
+from school_db.testing import peak_memory, synthetic_courses
+
+for n in [10_000, 100_000]:
+    server = StandInServer(handshake_latency=0, query_latency=0, rows=lambda: synthetic_courses(n))
+    connection = server.connect()
+    buffered = peak_memory(read_query, connection, "SELECT * FROM course")
+    streamed = peak_memory(lambda: sum(1 for _ in stream_query(connection, "SELECT * FROM course")))
+    print(f"{n:>7,} rows - read_query: {buffered / 2**20:6.1f} MiB, stream_query: {streamed / 2**20:4.1f} MiB")
+
+
+# ##### 5.7 - Reading Straight into a DataFrame
+# 
+# In section 5.5 we copied every row into a list and typed out the column names by hand. pandas then had to guess the types of our columns, and ends up storing most of them as generic Python objects.
+# 
+# The cursor already knows all of this. [cursor.description](https://dev.mysql.com/doc/connector-python/en/connector-python-api-mysqlcursor-description.html) holds the name and MySQL type of every column in the result, so read_query_df can:
+# * take the column names from the cursor,
+# * give INT columns a [nullable integer](https://pandas.pydata.org/docs/user_guide/integer_na.html) dtype sized to the MySQL type (TINYINT becomes Int8, INT becomes Int32, and so on),
+# * turn BOOLEAN columns (stored by MySQL as TINYINT 0/1) into pandas booleans,
+# * parse DATE, DATETIME and TIMESTAMP columns to datetime64,
+# * store low-cardinality text columns such as `language` or `level` as [categoricals](https://pandas.pydata.org/docs/user_guide/categorical.html),
+# * and build the frame one column at a time, without copying each row into a list first.
+
+# In[ ]:
+
+
+from school_db import frame_from_rows, read_query_df
+
+connection = create_db_connection("localhost", "root", pw, db)
+df = read_query_df(connection, q5)
+
+display(df)
+display(df.dtypes)
+
+
+# Any of the inferred types can be overridden with the `dtypes` argument, e.g. `read_query_df(connection, q1, dtypes={"phone_no": "string"})`.
+# 
+# Let's compare this with the section 5.5 approach on a large synthetic course table served by the stand-in server.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_read_query_df
+
+if run_benchmarks:
+    benchmark_read_query_df()
+
+
+# ##### 5.8 - Processing Results in Chunks
+# 
+# Combining the two ideas above, read_query_chunks gives us an iterator of DataFrames of `chunksize` rows each, all read through one unbuffered cursor. This lets us analyse tables which are larger than our machine's memory, one chunk at a time.
+# 
+# The dtypes are worked out from the first chunk and then reused for every chunk after it, so a column never switches type halfway through. A text column which is low-cardinality in the first chunk stays a category throughout, and each chunk's categories extend the ones before it, so a value keeps its code from chunk to chunk. A TINYINT column is read as Int8 rather than boolean, even if the first chunk only holds 0 and 1, since a later chunk may not.
+
+# In[ ]:
+
+
+from school_db import read_query_chunks
+
+
+# Many aggregations can be computed chunk by chunk, as long as we know how to combine the partial results: sums and counts add up, minimums and maximums are taken again, and a mean is a total sum divided by a total count.
+# 
+# aggregate_chunks does exactly this. It takes [named aggregations](https://pandas.pydata.org/docs/user_guide/groupby.html#named-aggregation) in the form `{"output_name": (column, function)}`, where the function is one of sum, count, min, max or mean, and an optional column (or list of columns) to group by.
+
+# In[ ]:
+
+
+from school_db import aggregate_chunks
+
+
+# For example, the number of enrolments per language, along with the total and average length of the courses being taken:
+
+# In[ ]:
+
+
+q6 = """
+SELECT takes_course.participant_id, takes_course.course_id, course.language, course.course_length_weeks
+FROM takes_course
+JOIN course
+ON takes_course.course_id = course.course_id;
+"""
+
+connection = create_db_connection("localhost", "root", pw, db)
+chunks = read_query_chunks(connection, q6, chunksize=5)
+per_language = aggregate_chunks(chunks, {
+    "enrolments": ("participant_id", "count"),
+    "total_weeks": ("course_length_weeks", "sum"),
+    "average_weeks": ("course_length_weeks", "mean"),
+}, by="language")
+
+display(per_language)
+
+
 # ### 6. Updating Records
 # 
 # Sometimes we will need to update our Database. We can do this very easily using our execute_query function alongside the SQL [UPDATE](https://dev.mysql.com/doc/refman/8.0/en/update.html) statement.
@@ -736,11 +920,1044 @@ for result in results:
 # 
 # This method can allow us to create new records in our database (or read, update or delete existing records) using a python list as our input. It is difficult to overstate how useful this can be when we are working with Python and SQL together.
 # 
+# ##### 8.3 - Bulk Loading Large Numbers of Rows
+# 
+# execute_list_query is perfect for a handful of rows, but it sends the whole list in one go and commits once at the end. With millions of rows that means one enormous packet (which the server will refuse once it passes [max_allowed_packet](https://dev.mysql.com/doc/refman/8.0/en/packet-too-large.html)), the whole list has to be in memory first, and a single bad row rolls back everything.
+# 
+# bulk_insert works through any iterable - a list, a generator, a file being read line by line - and:
+# * groups the rows into multi-row `INSERT ... VALUES (...), (...), ...` statements, each sized to fit comfortably inside the server's max_allowed_packet,
+# * commits every `rows_per_commit` rows, so a failure only loses the current transaction,
+# * either stops at the first error or carries on with the next batch (`stop_on_error=False`),
+# * and reports how many rows per second it managed, along with the latency of each batch.
+
+# In[ ]:
+
+
+from school_db import max_allowed_packet, bulk_insert
+
+
+# Here the rows come from a generator, so they never all exist in memory at once. Against the stand-in server, using a 1 MiB packet:
+
+# In[ ]:
+
+
+from school_db.testing import synthetic_participants
+
+server = StandInServer(handshake_latency=0)
+connection = server.connect()
+stats = bulk_insert(connection, "participant", ["participant_id", "first_name", "last_name", "phone_no", "client"],
+                    synthetic_participants(200_000), packet_bytes=2**20)
+
+
+# 
+# ##### 8.4 - Loading Files with LOAD DATA LOCAL INFILE
+# 
+# For really big loads, such as a nightly refresh of the participant and takes_course tables, MySQL has a much faster route than INSERT statements: [LOAD DATA LOCAL INFILE](https://dev.mysql.com/doc/refman/8.0/en/load-data.html). The client sends the server a file, and the server parses it directly into the table, with no SQL text to build or parse for each row.
+# 
+# load_data_infile accepts either a pandas DataFrame or the path of a CSV file:
+# * a DataFrame is written out to a temporary file, a chunk at a time, and the file is removed again once it has been loaded,
+# * a CSV file is loaded as it is, skipping its header line,
+# * `columns` maps the DataFrame's (or CSV header's) column names to the table's column names - source columns which are not mapped are skipped. A list of names loads just those columns, under the same names,
+# * missing values in a DataFrame become NULL, and for CSV files any of the strings in `null_values` (by default just the empty string) are loaded as NULL.
+# 
+# For security, MySQL Connector refuses to send local files unless we allow it when connecting. Rather than allowing every file on our machine, we use the `allow_local_infile_in_path` option to allow just the directory the files are in (and the server must have [local_infile](https://dev.mysql.com/doc/refman/8.0/en/server-system-variables.html#sysvar_local_infile) switched on).
+
+# In[ ]:
+
+
+from school_db import load_data_infile
+
+
+# Let's compare it with execute_list_query and bulk_insert, loading 100,000 synthetic participants into a [temporary](https://dev.mysql.com/doc/refman/8.0/en/create-temporary-table.html) copy of the participant table, so our real data is left alone.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_load_data
+
+if run_benchmarks:
+    connection = create_db_connection("localhost", "root", pw, db, allow_local_infile_in_path=tempfile.gettempdir())
+    benchmark_load_data(connection)
+
+
+# 
+# ##### 8.5 - Reusing Prepared Statements
+# 
+# Every time we send a query as text, the server has to parse it and work out how to run it, even if it is the same point lookup we sent a moment ago with a different client_id. [Prepared statements](https://dev.mysql.com/doc/refman/8.0/en/sql-prepared-statements.html) let the server do that work once: the statement is sent with `%s` placeholders, prepared, and afterwards only the parameter values travel over the wire.
+# 
+# A prepared statement belongs to one connection, so we keep a small cache per connection which maps the SQL text to a [prepared cursor](https://dev.mysql.com/doc/connector-python/en/connector-python-api-mysqlcursorprepared.html). The cache holds at most `max_size` statements; when it is full the least recently used statement is closed on the server to make room. It also counts hits and misses, so we can see how well it is working.
+
+# In[ ]:
+
+
+from school_db import StatementCache, raw_connection, statement_cache, run_statement
+
+
+# Now execute_query and read_query can take an optional tuple of parameters. Queries without parameters are sent as plain text, exactly as before; queries with parameters go through the statement cache.
+
+# In[ ]:
+
+
+from school_db import execute_query, read_query
+
+find_client = """
+SELECT *
+FROM client
+WHERE client_id = %s;
+"""
+
+connection = create_db_connection("localhost", "root", pw, db)
+for client_id in [101, 102, 101, 103, 101]:
+  print(read_query(connection, find_client, (client_id,)))
+
+print(statement_cache(connection).stats())
+
+
+# To measure the gain, let's run the same point lookups on client_id, first with the id written into the SQL text and then as a parameter of a prepared statement. We try this against the stand-in server (with some extra time for parsing each text query) and against our real database.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_prepared_statements
+
+if run_benchmarks:
+    benchmark_prepared_statements(StandInServer(handshake_latency=0, query_latency=0.0001, parse_latency=0.0002).connect())
+
+    connection = create_db_connection("localhost", "root", pw, db)
+    benchmark_prepared_statements(connection)
+
+
+# --------------------
+# 
+# ### 9. Caching Query Results
+# 
+# ##### 9.1 - An In-Process Result Cache
+# 
+# Dashboards and reports tend to run the same few read queries (like q3 to q5) over and over, against data which hardly ever changes. Rather than asking the server every time, we can keep recent results in memory.
+# 
+# The cache is keyed on the SQL text - with its whitespace normalised, so the same query formatted differently still matches - together with its parameters, and the server host, port and current database of the connection, so the same query against another server or database is never answered from the cache. (The current database is asked for once per connection, and again after a USE statement.) It:
+# * holds at most `max_entries` results and `max_bytes` of data, dropping the least recently used results first,
+# * forgets results after `ttl_seconds`, which also bounds how stale a result can get when someone else writes to the database,
+# * only caches SELECT queries whose tables it can identify, and skips queries using functions like NOW() or RAND() whose results change from call to call.
+# 
+# Most importantly, it remembers which tables each cached result was read from. Whenever we change a table through our own functions, every result which read from that table is thrown away. Because of the ON DELETE CASCADE and SET NULL rules from section 3.3, a change to one table can also change rows in another (deleting a course deletes its takes_course rows, for example), so those dependent tables are invalidated too.
+
+# In[ ]:
+
+
+from school_db import normalize_sql, tables_read, tables_written, ResultCache
+
+
+# The cache is switched off until we call enable_result_cache. Once it is on, read_query checks it before going to the server, and execute_query and execute_list_query invalidate it after every write they commit. Writes made by bulk_insert and load_data_infile invalidate the table they loaded.
+
+# In[ ]:
+
+
+from school_db import enable_result_cache, disable_result_cache, invalidate_tables, execute_list_query, invalidates_table
+
+
+# Let's see it in action with q5, which joins course and client. The second read comes straight from the cache; then the address update from section 6 touches the client table, so the next read goes back to the server.
+
+# In[ ]:
+
+
+result_cache = enable_result_cache(max_entries=500, max_bytes=16 * 2**20, ttl_seconds=300)
+
+connection = create_db_connection("localhost", "root", pw, db)
+read_query(connection, q5)
+read_query(connection, q5)
+print(result_cache.stats())
+
+execute_query(connection, update)
+read_query(connection, q5)
+print(result_cache.stats())
+
+
+# --------------------
+# 
+# ### 10. Running Queries Concurrently
+# 
+# ##### 10.1 - Asynchronous Versions of Our Functions
+# 
+# All of the functions we have written so far block: while one query is waiting for the server, our program can't do anything else. When a report needs dozens of independent SELECTs, they run one after another, and the total time is the sum of all of their round trips.
+# 
+# MySQL Connector also comes with an [asyncio](https://docs.python.org/3/library/asyncio.html) version of its API, [mysql.connector.aio](https://dev.mysql.com/doc/connector-python/en/connector-python-asyncio.html). With it, we can write async counterparts of create_db_connection, execute_query, read_query and execute_list_query, and have many queries waiting on the server at the same time.
+# 
+# First, an asyncio version of the connection pool from section 2.5. It follows the same rules - a maximum size, a health check on checkout, idle eviction and a maximum lifetime - but waits for a free connection without blocking the event loop. A pool belongs to the event loop it was created in, so we keep one set of pools per loop.
+
+# In[ ]:
+
+
+from school_db import AsyncConnectionPool, get_async_pool
+
+
+# And now the async versions of our four functions. They work just like the originals (including the result cache from section 9), except that we `await` them. Unlike the synchronous versions, connections from create_db_connection_async are not returned to the pool when the variable is reassigned, so use them in an `async with` block or call `await connection.close()` when finished.
+
+# In[ ]:
+
+
+from school_db import create_db_connection_async, execute_query_async, read_query_async, execute_list_query_async
+
+
+# ##### 10.2 - Running Many Read Queries at Once
+# 
+# read_queries_concurrently takes a pool and a list of queries (each either an SQL string, or a tuple of SQL and parameters), runs them at the same time on separate connections, and returns their results in the same order as the queries. `concurrency` caps how many run at once, so we don't swamp the server.
+
+# In[ ]:
+
+
+from school_db import read_queries_concurrently
+
+async def read_school_summary():
+    pool = get_async_pool("localhost", "root", pw, db)
+    return await read_queries_concurrently(pool, [q1, q2, q3, q4, q5] + [(find_client, (client_id,)) for client_id in range(101, 106)])
+
+
+# asyncio.run starts an event loop for us; inside Jupyter, which is already running one, use `await read_school_summary()` instead.
+
+# In[ ]:
+
+
+for result in asyncio.run(read_school_summary()):
+  print(result)
+
+
+# To see the difference, let's give the stand-in server 20ms of latency per query - roughly what we would see talking to a database in another data centre - and run 50 queries first one after another with read_query, and then concurrently.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_concurrent_reads
+
+if run_benchmarks:
+    benchmark_concurrent_reads()
+
+
+# ##### 10.3 - Splitting One Big Read Across Threads or Processes
+# 
+# asyncio helps when we have many separate queries. A single large read, like `SELECT * FROM course` or the takes_course join from section 5.8, is a different problem: it runs on one connection, and the server works through it alone.
+# 
+# read_partitioned splits such a query into `partitions` ranges of an integer key column (for example course_id or participant_id), runs the ranges at the same time on pooled connections, and stitches the results back together in key order. By default it discovers the key range itself with MIN and MAX; pass `bounds=(low, high)` to skip that query.
+# 
+# Each partition's key range is added to the query's WHERE clause, so the query can be any SELECT without its own ORDER BY or LIMIT, including joins and `SELECT *`. When several of the joined tables have a column of the key's name, name it with its table, e.g. `course.course_id`. Each partition then only reads its own slice of the key's index.
+# 
+# Partitions run in a thread pool by default. With `processes=True` they run in a process pool instead, which also spreads the work of decoding rows in Python over several CPU cores. Each process opens its own connections, and the query functions have to be importable by the worker processes (which is the case on Linux, where processes are forked).
+
+# In[ ]:
+
+
+from school_db import read_partitioned
+
+df = read_partitioned("localhost", "root", pw, db, "SELECT * FROM course", "course_id", partitions=4)
+display(df)
+
+df = read_partitioned("localhost", "root", pw, db, q6, "participant_id", partitions=4)
+display(df)
+
+
+# --------------------
+# 
+# ### 11. Profiling Queries
+# 
+# ##### 11.1 - Timing Every Call
+# 
+# So far the only feedback our functions give us is "Query successful" or an error. To find out where the time actually goes, we can have them record a few measurements for every call:
+# * how long create_db_connection took to hand us a connection,
+# * how long the server took to execute the statement, and how long it took to fetch the rows back,
+# * how many rows were returned, or affected by a write,
+# * and roughly how many bytes went each way (MySQL Connector doesn't count these for us, so they are estimated from the size of the SQL text and of the rows).
+# 
+# Measurements are grouped by query fingerprint: the normalised SQL with every literal value replaced by `?`, so `WHERE client_id = 101` and `WHERE client_id = 102` count as the same query. For each fingerprint the profiler keeps a [histogram](https://en.wikipedia.org/wiki/Histogram) of durations in logarithmic buckets (each about 19% wider than the last), which takes the same small amount of memory no matter how many calls it sees, and gives us the p50, p95 and p99 latencies.
+# 
+# Any call which takes longer than `slow_query_seconds` is also passed to the `on_slow_query` function, which by default prints it. The profiler also keeps the most recent example of each query, so that we can run it again later (which we will do in section 12).
+
+# In[ ]:
+
+
+from school_db import query_fingerprint, QueryProfiler, enable_profiling, disable_profiling, profile_query
+
+
+# Our connection and query functions from school_db report to the profiler whenever it is switched on. When it is off, the only extra work is one check and a few calls to methods which do nothing.
+# 
+# Let's profile a handful of the queries from this notebook, flagging anything slower than 50ms, and look at the report. We switch off the result cache from section 9 first, so that every call really goes to the server.
+
+# In[ ]:
+
+
+disable_result_cache()
+profiler = enable_profiling(slow_query_seconds=0.05)
+
+connection = create_db_connection("localhost", "root", pw, db)
+for _ in range(20):
+    for query in [q1, q2, q3, q4, q5, q6]:
+        read_query(connection, query)
+    for client_id in range(101, 106):
+        read_query(connection, f"SELECT * FROM client WHERE client_id = {client_id};")
+
+display(profiler.report())
+print(profiler.export()["connect"])
+
+
+# --------------------
+# 
+# ### 12. Finding Missing Indexes
+# 
+# ##### 12.1 - Reading Query Plans with EXPLAIN
+# 
+# Our tables only have the indexes MySQL creates for us: one for each primary key, and one for each foreign key column (InnoDB always indexes foreign keys). A query like q3 (`WHERE language = 'ENG' ORDER BY start_date DESC`) or q4 (`WHERE dob < '1990-01-01'`) therefore has to read every row of its table, and q3 then has to sort the result as a separate step. With our 9 courses nobody will notice, but with 9 million they will.
+# 
+# [EXPLAIN FORMAT=JSON](https://dev.mysql.com/doc/refman/8.0/en/explain-output.html) asks the server how it plans to run a query, without running it. In the plan, a table accessed with `"access_type": "ALL"` is read in full, and `"using_filesort": true` means the rows have to be sorted after they are read.
+
+# In[ ]:
+
+
+from school_db import explain_query, plan_problems
+
+connection = create_db_connection("localhost", "root", pw, db)
+for query in [q3, q4]:
+    print(plan_problems(explain_query(connection, query)))
+
+
+# ##### 12.2 - An Index Advisor
+# 
+# Knowing a table is scanned is only half the story; we also want to know which index would help. advise_indexes takes a list of queries (SQL strings, or tuples of SQL and parameters), EXPLAINs each one, and for every table which is fully scanned or sorted it suggests a [composite index](https://dev.mysql.com/doc/refman/8.0/en/multiple-column-indexes.html) built from how the query uses that table, following the usual rules of thumb:
+# 1. first the columns compared with `=` or `IN` in the WHERE clause,
+# 2. then the columns used to join to the other tables,
+# 3. and finally either the first column compared with a range (`<`, `>`, `BETWEEN`, `LIKE 'abc%'`), or - if there isn't one - the ORDER BY columns, so the index can return rows already sorted.
+# 
+# For q3 that gives `course(language, start_date)`, and for q4 `teacher(dob)`. Suggestions which an existing index already covers (like the foreign key columns) are left out.
+# 
+# With `apply=True` the advisor also creates the indexes and times each query `runs` times before and after, so we can see whether they were worth it. Indexes aren't free - each one takes space and slows down writes to its table a little - so it's worth looking at the suggestions before applying them.
+
+# In[ ]:
+
+
+from school_db import advise_indexes
+
+connection = create_db_connection("localhost", "root", pw, db)
+advice = advise_indexes(connection, [q3, q4, q5])
+display(advice[["query", "table", "problem", "index"]])
+
+
+# The queries captured by the profiler in section 11 work just as well, so we can ask for advice on everything our application actually ran: `advise_indexes(connection, profiler.captured_queries(), apply=True)`.
+
+
+# --------------------
+# 
+# ### 13. Testing at Scale
+# 
+# ##### 13.1 - Generating a Large Synthetic School
+# 
+# Our section 4 data - 6 teachers, 5 clients, 14 participants and 17 enrolments - is perfect for learning, but tells us nothing about how our queries will behave with a few million rows. To find out, we need much more data which still looks like our school, and still respects all of its foreign keys.
+# 
+# SchoolDataGenerator produces that data for any scale, where the scale is the number of participants:
+# 
+# | Table | Rows |
+# |---|---|
+# | teacher | scale / 100 (at least 6) |
+# | client | scale / 50 (at least 5) |
+# | participant | scale |
+# | course | scale / 10 (at least 9) |
+# | takes_course | about 2 × scale (each participant takes 1 to 3 courses) |
+# 
+# so scales from 10^3 to 10^8 give tables of up to a few hundred million rows. Every table is produced by a generator, so the rows are never all in memory at once, and each table has its own random number generator seeded from `seed`, so the same seed and scale always produce exactly the same data. The ids start at `first_id`, well clear of the ids used in section 4.
+
+# In[ ]:
+
+
+from school_db.testing import SchoolDataGenerator
+
+generator = SchoolDataGenerator(scale=1000, seed=42)
+print(generator.sizes)
+print(next(generator.courses()))
+
+
+# ##### 13.2 - A Benchmark Suite for the Notebook's Operations
+# 
+# With a generator in hand, benchmark_school builds a separate database (so our real school is left alone) at each scale, fills it, and times the operations from this notebook:
+# * the read queries q1 to q5 from section 5,
+# * the client address update from section 6,
+# * deleting a course and restoring it again, as in section 7 (each is timed on its own, with the other one run in between),
+# * and inserting a list of new teachers with executemany, as in section 8 (they are removed again after each run, outside the timings).
+# 
+# Every operation is run `runs` times and its median and p95 recorded. The results are appended to `output` as [JSON Lines](https://jsonlines.org/) - one JSON object per operation and scale, along with the time, seed and server version - so results from different days or versions of our code can be loaded with `pd.read_json(output, lines=True)` and compared to catch regressions.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_school
+
+if run_benchmarks:
+    results = benchmark_school("localhost", "root", pw, {"q1": q1, "q2": q2, "q3": q3, "q4": q4, "q5": q5}, scales=(1_000, 10_000))
+    display(results.pivot(index="operation", columns="scale", values="median_ms"))
+
+
+# --------------------
+# 
+# ### 14. Transactions
+# 
+# ##### 14.1 - Grouping Statements into One Transaction
+# 
+# execute_query commits after every statement. Each commit waits for the server to flush its log to disk, so the four execute_query calls in section 4.2 cost four flushes. Worse, if the third one had failed, we would have been left with clients and participants but no courses.
+# 
+# A [transaction](https://dev.mysql.com/doc/refman/8.0/en/commit.html) fixes both problems: everything inside it is committed together, once, or not at all. transaction() gives us one as a context manager:
+# 
+# ```python
+# with transaction(connection) as tx:
+#     tx.execute(pop_client)
+#     tx.execute(pop_participant)
+#     tx.execute_list(sql, val)
+# ```
+# 
+# * When the `with` block finishes, everything is committed at once. If an exception escapes from it, everything is rolled back instead.
+# * tx.execute and tx.execute_list work like execute_query and execute_list_query, but raise errors rather than printing them, so that a failure really does roll the whole transaction back.
+# * `with tx.savepoint():` marks a [savepoint](https://dev.mysql.com/doc/refman/8.0/en/savepoint.html). If an exception escapes from that inner block, only the statements since the savepoint are rolled back, and the exception carries on up as usual.
+# * `commit_every=N` commits automatically after every N statements, which keeps transactions (and the server's undo log) from growing without limit during very large loads - at the price of no longer being all-or-nothing. Automatic commits wait until no savepoint is open.
+# 
+# The transaction can also be passed to any of our other functions in place of the connection (for example `bulk_insert(tx, ...)`). Their commits then count as statements of the transaction instead of committing straight away. If bulk_insert or merge_frame fails inside a transaction, only its own statements are rolled back, to a savepoint, and the error is raised, so that the owner of the transaction decides what happens to the rest. Keep in mind that execute_query and execute_list_query print errors rather than raising them, so they can't trigger a rollback.
+
+# In[ ]:
+
+
+from school_db import current_transaction, Transaction, transaction
+
+
+# Two of our earlier helpers know about transactions: raw_connection looks through a transaction to find the connection its prepared statements belong to, and cache invalidations made inside a transaction are repeated when it commits. Otherwise another connection could cache the old rows in between.
+# 
+# Let's try to run the section 4.2 population again. The clients are already in the table, so the very first INSERT fails on a duplicate primary key, and the whole transaction is rolled back - nothing is half-loaded.
+
+# In[ ]:
+
+
+connection = create_db_connection("localhost", "root", pw, db)
+try:
+    with transaction(connection) as tx:
+        for statement in [pop_client, pop_participant, pop_course, pop_takescourse]:
+            tx.execute(statement)
+except Error:
+    pass
+
+
+# Savepoints let part of a transaction fail without losing the rest. Here the second teacher reuses a tax_id, which must be unique, so just that insert is undone:
+
+# In[ ]:
+
+
+with transaction(connection) as tx:
+    tx.execute_list(sql, [(9, 'Ada', 'Lovelace', 'ENG', None, '1985-12-10', 99999, '+491700000000')])
+    try:
+        with tx.savepoint():
+            tx.execute_list(sql, [(10, 'Bad', 'Duplicate', 'ENG', None, '1990-01-01', 99999, '+491700000001')])
+    except Error as err:
+        print(f"Error: '{err}'")
+
+print(read_query(connection, "SELECT teacher_id, first_name, tax_id FROM teacher WHERE teacher_id >= 9;"))
+
+
+# ##### 14.2 - Measuring the Gain
+# 
+# Finally, let's compare inserting 1,000 teachers one execute_query at a time, each with its own commit, with inserting them in a single transaction, and in transactions of 100 statements. We use a temporary copy of the teacher table again.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_transactions
+
+if run_benchmarks:
+    benchmark_transactions(connection)
+
+
+# --------------------
+# 
+# ### 15. Schema Migrations
+# 
+# ##### 15.1 - Applying Only What Is Missing
+# 
+# Sections 2.2 and 3.1 - 3.3 run every CREATE and ALTER statement each time the notebook is run, and rely on execute_query printing an error when the table or key is already there. That costs a failing round trip per statement. Worse, ALTER TABLE ... ADD FOREIGN KEY doesn't fail the second time - it quietly adds a duplicate key.
+# 
+# Instead, we can declare the schema as an ordered list of numbered migrations, and keep a record of the ones already applied in a schema_migrations table in the database itself:
+# 
+# * If every migration is recorded, migrate() stops after a single query against schema_migrations.
+# * Otherwise it reads the tables and foreign keys that already exist from [information_schema](https://dev.mysql.com/doc/refman/8.0/en/information-schema-introduction.html) (again in one query), and runs only the migrations whose table or foreign key is missing. A migration whose object already exists - for example because it was created by the section 3 cells before we started tracking - is simply recorded as applied.
+# * Each migration also records a checksum of its SQL, so that editing a migration which has already been applied is reported rather than silently ignored.
+# 
+# Note that MySQL commits implicitly after every CREATE or ALTER statement, so migrations can't be grouped into a transaction. Instead, each one is recorded as soon as it has been applied, and a failing migration stops the run, so the next call resumes from there.
+
+# In[ ]:
+
+
+from school_db import Migration, MIGRATIONS, migrate
+
+
+# The database itself can be created the same way, with [CREATE DATABASE IF NOT EXISTS](https://dev.mysql.com/doc/refman/8.0/en/create-database.html), which is a no-op rather than an error when the database is already there.
+
+# In[ ]:
+
+
+connection = create_server_connection("localhost", "root", pw)
+create_database(connection, "CREATE DATABASE IF NOT EXISTS school")
+
+connection = create_db_connection("localhost", "root", pw, db)
+migrate(connection) # the first time, records the tables and keys created in section 3
+migrate(connection) # from now on, a single query
+
+
+# ##### 15.2 - Measuring Startup Time
+# 
+# Let's compare the two approaches on our already-created database: re-running the section 3 statements (each of which fails, or adds a duplicate foreign key) against the single query migrate() needs. To keep the comparison fair without adding duplicate keys to our real tables, the old approach is timed with the CREATE TABLE statements only.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_migrations
+
+if run_benchmarks:
+    benchmark_migrations(connection)
+
+
+# --------------------
+# 
+# ### 16. Syncing DataFrames into Tables
+# 
+# ##### 16.1 - Merging Only the Rows that Changed
+# 
+# In section 6 we updated one client's address with one UPDATE statement. When a whole batch of addresses arrives - say, as a DataFrame from the CRM - doing that once per row costs a round trip per client, changed or not.
+# 
+# merge_frame takes a DataFrame whose columns match the table's and which includes its primary key, and works out what has actually changed:
+# * it puts the values of each row of the DataFrame into a common text form (so that `10.5` and `Decimal('10.50')`, or a pandas Timestamp and a DATE, compare equal), and splits the rows into chunks of about `chunk_size` by a hash of their key,
+# * it asks the server for a row count and a checksum of each chunk of the table - the [BIT_XOR](https://dev.mysql.com/doc/refman/8.0/en/aggregate-functions.html#function_bit-xor) of the [CRC32](https://dev.mysql.com/doc/refman/8.0/en/mathematical-functions.html#function_crc32) of each row's text, which the server works out itself - and compares them with the DataFrame's,
+# * only the rows of chunks which differ are read, keeping just a short hash of each one, so syncing a large table with a few changes reads little more than those rows,
+# * rows with a new key are inserted, rows whose hash differs are updated, and identical rows are skipped entirely,
+# * with `delete_missing=True`, rows in the table whose key isn't in the DataFrame are deleted.
+# 
+# Inserts and updates are sent together as multi-row [INSERT ... ON DUPLICATE KEY UPDATE](https://dev.mysql.com/doc/refman/8.0/en/insert-on-duplicate.html) statements (INSERT IGNORE, when every column is part of the key), sized to fit in max_allowed_packet like bulk_insert's, and deletes as `DELETE ... WHERE key IN (...)` in batches of `delete_batch` keys. Everything is committed together at the end, or rolled back if any statement fails.
+
+# In[ ]:
+
+
+from school_db import merge_frame
+
+
+# Let's read the client table into a DataFrame, move the Big Business Federation back to its old address, and add a new client. Only those two rows are sent to the server; the other four are unchanged and skipped.
+
+# In[ ]:
+
+
+connection = create_db_connection("localhost", "root", pw, db)
+clients = read_query_df(connection, "SELECT * FROM client;")
+
+clients.loc[clients["client_id"] == 101, "address"] = "123 Falschungstraße, 10999 Berlin"
+clients = pd.concat([clients, pd.DataFrame([{
+    "client_id": 106, "client_name": "Sprachcafé e.V.", "address": "5 Musterweg, 10115 Berlin", "industry": "NGO"
+}])], ignore_index=True)
+
+merge_frame(connection, "client", clients, key="client_id")
+merge_frame(connection, "client", clients, key="client_id") # nothing left to do
+
+
+# Passing the same DataFrame without client 106, and with `delete_missing=True`, takes the table back to where it was:
+
+# In[ ]:
+
+
+merge_frame(connection, "client", clients[clients["client_id"] != 106], key="client_id", delete_missing=True)
+
+
+# ##### 16.2 - Measuring the Gain
+# 
+# Against the stand-in server, let's sync 10,000 clients, 1% of which have a new address, first with one UPDATE per row (as in section 6) and then with merge_frame.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_merge
+
+if run_benchmarks:
+    benchmark_merge()
+
+
+# --------------------
+# 
+# ### 17. Incremental Extraction
+# 
+# ##### 17.1 - Reading Only New Rows
+# 
+# A nightly export that runs `SELECT * FROM course` reads the whole table every time, even if only a handful of courses have been added since yesterday. If the table has a column which only ever grows - an auto-increment primary key, or an `updated_at` column such as
+# 
+# ```sql
+# ALTER TABLE course ADD updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, ADD INDEX (updated_at);
+# ```
+# 
+# then we can remember the highest value we have seen (the "high-water mark") and next time ask only for rows beyond it. read_incremental does this, keeping the marks in a small JSON file, so they survive between runs:
+# * with a primary key, it reads `WHERE course_id > mark`,
+# * with an `updated_at` column, several rows can share the same timestamp, and one of them may be committed after we have read the others. So it reads `WHERE updated_at >= mark`, and skips the rows (identified by `key`) which it already returned at exactly that timestamp,
+# * the mark is only saved once the rows have been read successfully, so a failed run is simply repeated next time.
+# 
+# Rows whose column is NULL are never picked up, so the column should be NOT NULL.
+
+# In[ ]:
+
+
+from school_db import ExtractState, read_incremental
+
+
+# The first run reads every course; the second finds nothing new; after we add a course, the third run reads just that one row.
+
+# In[ ]:
+
+
+connection = create_db_connection("localhost", "root", pw, db)
+state = ExtractState(os.path.join(tempfile.mkdtemp(), "school_extract_state.json"))
+
+courses = read_incremental(connection, "course", "course_id", state)
+read_incremental(connection, "course", "course_id", state)
+
+execute_query(connection, "INSERT INTO course VALUES (21, 'Business Russian', 'RUS', 'B1', 20, '2020-03-01', FALSE, 5, 104);")
+new_courses = read_incremental(connection, "course", "course_id", state)
+display(new_courses)
+
+
+# ##### 17.2 - Detecting Deleted Rows
+# 
+# A high-water mark can't tell us about rows which have been deleted: they simply stop appearing. Comparing every key we hold with every key in the table would mean reading the whole key column again. Instead, reconcile_deletes splits the (integer) key range into chunks of `chunk_size` keys, and asks the server for just a row count and a checksum per chunk - the [BIT_XOR](https://dev.mysql.com/doc/refman/8.0/en/aggregate-functions.html#function_bit-xor) of the [CRC32](https://dev.mysql.com/doc/refman/8.0/en/mathematical-functions.html#function_crc32) of each key. We compute the same for the keys of our local copy. Only the chunks whose count or checksum differ have their keys read in full, so a table with a few deletions costs one small aggregate query plus a few short range reads.
+# 
+# sync_table puts the two together for an ETL job: it reads the new rows into a local DataFrame every run, and every `reconcile_every` runs also removes the rows which have been deleted from the table.
+
+# In[ ]:
+
+
+from school_db import reconcile_deletes, sync_table
+
+
+# Let's delete the course we just added, and reconcile our local copy of the course table:
+
+# In[ ]:
+
+
+execute_query(connection, "DELETE FROM course WHERE course_id = 21;")
+
+local_courses = pd.concat([courses, new_courses], ignore_index=True)
+local_courses = sync_table(connection, "course", "course_id", state, local_courses, reconcile_every=1, chunk_size=10)
+display(local_courses)
+
+
+# --------------------
+# 
+# ### 18. Caching Results on Disk
+# 
+# ##### 18.1 - A Columnar Cache that Survives Restarts
+# 
+# The result cache from section 9 lives in memory, so it is empty again every time the notebook's kernel is restarted - and analysts restart a lot. Pulling the same course/client join into a DataFrame each time means the server runs the query, sends every row, and pandas rebuilds the DataFrame from Python objects.
+# 
+# With the disk cache switched on, read_query_df saves each DataFrame it builds to disk in the [Arrow IPC file format](https://arrow.apache.org/docs/python/ipc.html), and later reads of the same query load it back from there:
+# * an entry's key is a hash of the normalized query, its parameters and dtypes, and the [CHECKSUM TABLE](https://dev.mysql.com/doc/refman/8.0/en/checksum-table.html) of every table it reads, so any change to those tables simply leads to a different key, and the old entry is never used again. CHECKSUM TABLE does read the tables, but on the server, without sending any rows; queries with subqueries or non-deterministic functions (which tables_read can't vouch for) aren't cached,
+# * files are opened with [memory mapping](https://arrow.apache.org/docs/python/memory.html#memory-mapped-files), so their columns are used straight from the operating system's page cache rather than being read and copied. `as_arrow=True` returns the Arrow table itself, which involves no copying at all; converting to a DataFrame still has to copy some columns (text columns in particular),
+# * once the cache grows beyond `max_bytes`, the least recently used entries are deleted. Each hit updates its file's modification time, so the files themselves are the only record we need,
+# * new entries are written to a temporary file and renamed into place, so two notebooks sharing a cache directory never see a half-written file.
+# 
+# We use Arrow's IPC format rather than Parquet because Parquet files are compressed and encoded, and have to be decoded into memory before use, which rules out memory mapping them. The disk cache needs pyarrow to be installed (`pip install pyarrow`).
+
+# In[ ]:
+
+
+from school_db import DiskCache, enable_disk_cache, disable_disk_cache
+
+
+# Now read_query_df checks the disk cache first whenever it is switched on. It also accepts query parameters, like read_query. By default the cache lives in a `.query_cache` directory next to the notebook; here we use a temporary directory instead.
+
+# In[ ]:
+
+
+connection = create_db_connection("localhost", "root", pw, db)
+cache_dir = tempfile.mkdtemp()
+enable_disk_cache(cache_dir)
+
+df = read_query_df(connection, q5) # from the server, and saved to disk
+df = read_query_df(connection, q5) # from disk
+display(df)
+
+
+# ##### 18.2 - Inspecting and Purging the Cache
+# 
+# disk_cache_cli lists what is in a cache directory, shows its size, and removes entries - all of them, those not used for some number of hours, or the least recently used ones until the cache fits in a given size. It takes a command line as a list of strings, e.g. `disk_cache_cli(["purge", "--older-than", "24"])`.
+
+# In[ ]:
+
+
+from school_db import disk_cache_cli
+
+disk_cache_cli(["--dir", cache_dir, "list"])
+disk_cache_cli(["--dir", cache_dir, "stats"])
+
+
+# ##### 18.3 - Measuring the Gain
+# 
+# Finally, let's time reading 500,000 synthetic courses from the stand-in server into a DataFrame, compared with loading them back from the disk cache, both as a DataFrame and as an Arrow table. The stand-in server hands over rows straight from memory, so a real server, with the network in between, would look slower still.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_disk_cache
+
+if run_benchmarks and pa is not None:
+    benchmark_disk_cache()
+
+
+# --------------------
+# 
+# ### 19. Fetching Results into Arrow
+# 
+# ##### 19.1 - An Arrow Fetch Path
+# 
+# Even read_query_df from section 5.7 starts from cursor.fetchall(): a Python tuple per row, and a Python object for every single value, all held in memory until the DataFrame is built. For 500,000 courses that is 4.5 million objects which pandas then copies out of again.
+# 
+# MySQL Connector always hands us rows as tuples, so we can't avoid creating those objects altogether, but we can avoid keeping them. read_query_arrow reads the result through an unbuffered cursor `batch_size` rows at a time, and turns each batch straight into an [Arrow record batch](https://arrow.apache.org/docs/python/data.html#record-batches): one compact, typed buffer per column. Each batch's tuples can be freed as soon as it has been converted, so only one batch of Python objects exists at a time, and the finished result is held entirely in Arrow's columnar buffers.
+# 
+# The Arrow type of each column comes from the cursor's description, following the same rules as read_query_df: TINYINT columns holding only 0 and 1 become booleans, DECIMAL becomes float64, and low-cardinality text columns are [dictionary encoded](https://arrow.apache.org/docs/python/data.html#dictionary-arrays) (Arrow's equivalent of pandas categoricals). The types are fixed from the description before the first batch is read, so every batch has the same schema, even one whose rows are all NULL in some column.
+# 
+# read_query_df_arrow then gives us a DataFrame. With `zero_copy=True` (the default) its columns are [pd.ArrowDtype](https://pandas.pydata.org/docs/user_guide/pyarrow.html) columns which use the Arrow buffers as they are, so no data is copied at all. With `zero_copy=False` we get the usual NumPy-backed dtypes instead, at the price of one copy. Individual columns can also be viewed as NumPy arrays without copying, as long as they are numeric and have no missing values, via `table.column("course_id").to_numpy()`.
+
+# In[ ]:
+
+
+from school_db import arrow_batches, read_query_arrow, read_query_df_arrow
+
+if pa is not None:
+    connection = create_db_connection("localhost", "root", pw, db)
+    df = read_query_df_arrow(connection, q5)
+    display(df)
+    display(df.dtypes)
+
+
+# ##### 19.2 - Measuring the Gain
+# 
+# Let's compare the three paths on 500,000 synthetic courses from the stand-in server: the section 5.5 approach, read_query_df, and read_query_df_arrow. Speed and memory are measured in separate runs, as tracemalloc slows Python down. tracemalloc also only sees memory allocated by Python, so for the Arrow path we add the memory held in Arrow's own buffers.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_arrow_fetch
+
+if run_benchmarks and pa is not None:
+    benchmark_arrow_fetch()
+
+
+# --------------------
+# 
+# ### 20. Surviving Failures
+# 
+# ##### 20.1 - Retries, Reconnects and Failover
+# 
+# When the server goes away, create_db_connection prints an error and returns None, and the next line fails with `'NoneType' object has no attribute 'cursor'`. A connection which drops halfway through the notebook (a server restart, a network blip, [wait_timeout](https://dev.mysql.com/doc/refman/8.0/en/server-system-variables.html#sysvar_wait_timeout) expiring) is just as fatal.
+# 
+# create_resilient_connection gives us a connection object which deals with these failures itself:
+# * it takes a list of hosts ("host" or "host:port"). The first is the primary; the rest are read-only replicas, which reads fail over to when the primary can't be reached. Writes only ever go to the primary,
+# * it doesn't connect until the first statement, and reconnects automatically whenever the connection has been lost,
+# * statements which fail because the connection was lost, or because of a [deadlock](https://dev.mysql.com/doc/refman/8.0/en/innodb-deadlocks.html) or lock wait timeout, are retried, waiting a little longer each time (exponential backoff) plus a random amount (jitter), so that many clients don't all retry at the same moment,
+# * only statements which are safe to repeat are retried. Reads always are. A write is retried after a deadlock (MySQL has already rolled it back) or if the connection failed before it was sent, but not when the connection was lost while it was running, since we can't know whether it was applied. Nothing is retried inside a transaction() from section 14, where the whole transaction would need to be repeated,
+# * each host has a circuit breaker: after `failure_threshold` connection failures in a row, the host is skipped for `reset_seconds` rather than making every call wait for it to time out (and when every host we could use is skipped, the call fails straight away, without retrying). After that, a single call is let through to test it, and the breaker closes again once a call succeeds.
+# 
+# read_query, execute_query and execute_list_query use the retries when they are given a resilient connection. With any other connection they behave exactly as before.
+
+# In[ ]:
+
+
+from school_db import CircuitOpenError, RetryPolicy, CircuitBreaker, ResilientConnection, create_resilient_connection, run_resilient
+
+
+# The query functions hand the work to run_resilient as a small function of the connection to use, so that it can be run again on a new connection.
+# 
+# ##### 20.2 - Testing with a Fault-Injecting Proxy
+# 
+# To see all of this working without pulling the plug on our real server, FaultInjectingProxy sits between us and MySQL: it listens on a local port, and passes everything through to the server, except that we can tell it to
+# * add `latency` seconds to every packet,
+# * drop a random fraction (`drop_rate`) of packets by cutting the connection they belong to,
+# * cut every open connection right now, with drop_connections(),
+# * or refuse new connections altogether, by setting `refuse = True`.
+
+# In[ ]:
+
+
+from school_db.testing import FaultInjectingProxy
+
+
+# Let's connect through the proxy, with our real server listed again as a "replica", and break things. We use a fresh pool per host, with a short connection timeout, and a breaker which opens after two failures.
+
+# In[ ]:
+
+
+proxy = FaultInjectingProxy("localhost", 3306)
+connection = create_resilient_connection([proxy.address, "localhost"], "root", pw, db,
+                                         failure_threshold=2, reset_seconds=5, connection_timeout=2)
+
+print(read_query(connection, q1))
+
+proxy.drop_connections() # the connection is cut under us: the read reconnects and is retried
+print(read_query(connection, q1))
+
+proxy.refuse = True # the primary is down: reads fail over to the replica, writes fail
+print(read_query(connection, q1))
+execute_query(connection, update)
+print({host: breaker.state for host, breaker in connection.breakers.items()})
+
+proxy.close()
+
+
+# --------------------
+# 
+# ### 21. Pushing Analysis to the Server
+# 
+# ##### 21.1 - A Lazy Query Builder
+# 
+# A common pattern is to read raw rows with read_query, turn them into a DataFrame, and then group them in pandas - counting participants per client, say. Every participant row crosses the network, only to be boiled down to one number per client. The server could have done the grouping itself, and sent us five rows.
+# 
+# `lazy(connection, table)` gives us an object with a few pandas-like methods which, rather than doing anything straight away, just record what we asked for:
+# * `.filter("language = %s", "ENG")` or `.filter(language="ENG")` keeps matching rows (a WHERE clause, or HAVING once we have aggregated),
+# * `.join("client", "participant.client = client.client_id")` joins another table (`how="left"` for a LEFT JOIN),
+# * `.select("first_name", "last_name")` picks columns,
+# * `.groupby("client.client_name").agg(participants=("participant_id", "count"))` groups, using the same named aggregation style as pandas. The functions available are count, nunique, size, sum, mean, min, max, std and var,
+# * `.sort_values("participants", ascending=False)` and `.head(10)` sort and limit.
+# 
+# Nothing is run until we call `.collect()`, which compiles everything into one SQL statement and returns the (usually small) result as a DataFrame, with one column per group and aggregate. `.explain()` shows the SQL which would be run, along with the server's plan for it when called with `plan=True`.
+# 
+# Column names are checked to be plain identifiers (optionally `table.column`), while filter and join conditions are SQL, written just as in a WHERE or ON clause - with `%s` placeholders for values.
+
+# In[ ]:
+
+
+from school_db import LazyTable, lazy
+
+
+# Participants per client, and courses per teacher per language. Each is a single query, and only the grouped rows come back:
+
+# In[ ]:
+
+
+connection = create_db_connection("localhost", "root", pw, db)
+
+participants_per_client = (
+    lazy(connection, "participant")
+    .join("client", "participant.client = client.client_id")
+    .groupby("client.client_name")
+    .agg(participants=("participant.participant_id", "count"))
+    .sort_values("participants", ascending=False)
+)
+participants_per_client.explain()
+display(participants_per_client.collect())
+
+courses_per_teacher = (
+    lazy(connection, "course")
+    .join("teacher", "course.teacher = teacher.teacher_id")
+    .filter(in_school=True)
+    .groupby("teacher.last_name", "course.language")
+    .agg(courses=("course.course_id", "count"), weeks=("course.course_length_weeks", "sum"))
+    .filter("courses > %s", 1)
+)
+courses_per_teacher.explain()
+display(courses_per_teacher.collect())
+
+
+# For comparison, here is the first of those done the old way: every participant (and their client's name) comes back, and pandas does the counting.
+
+# In[ ]:
+
+
+rows = read_query(connection, "SELECT participant.participant_id, client.client_name FROM participant JOIN client ON participant.client = client.client_id;")
+by_hand = pd.DataFrame(rows, columns=["participant_id", "client_name"]).groupby("client_name").agg(participants=("participant_id", "count"))
+print(f"{len(rows)} rows read to produce {len(by_hand)} - pushed down, only {len(participants_per_client.collect())} rows are read")
+
+
+# --------------------
+# 
+# ### 22. Materialized Summary Tables
+# 
+# ##### 22.1 - Storing a Report as a Table
+# 
+# A report such as "enrolments per course and client" joins takes_course, course and client and groups the result every time it is asked for. The answer only changes when one of those tables does, and even then only for the courses or clients that were touched.
+# 
+# materialize() stores the result of such a GROUP BY query in a real table, and keeps it up to date:
+# * the table is built with `CREATE TABLE ... AS SELECT`, with the `key` columns (the query's group columns) as its primary key. A full rebuild creates a new copy and swaps it in with a single [RENAME TABLE](https://dev.mysql.com/doc/refman/8.0/en/rename-table.html), so readers never see a half-built table,
+# * `scopes` says, for each table the query reads, which of its columns identifies the groups a changed row belongs to, and which expression of the query that column corresponds to - for example a new takes_course row only affects the groups of its `course_id`, i.e. `course.course_id`,
+# * after every execute_query or execute_list_query, the written rows' values of that column are worked out from the statement (the rows of an INSERT, or a `WHERE column = ...` / `WHERE column IN (...)` condition on an UPDATE or DELETE). Only those groups are deleted from the summary table and recomputed, in one transaction,
+# * when that can't be worked out - a more complicated WHERE clause, an UPDATE of the column itself, a write through bulk_insert, merge_frame or a transaction() - the summary table is marked stale, and rebuilt in full the next time it is read,
+# * read_query and read_query_df notice when they are given the summary's query (give or take whitespace, or with an ORDER BY on its output columns), and read from the summary table instead.
+# 
+# Only writes made from this notebook are seen. Writes from anywhere else need a `refresh_view(connection, name)` to rebuild the summary.
+
+# In[ ]:
+
+
+from school_db import MaterializedView, materialize, refresh_view, drop_view
+from school_db.views import route_query
+
+
+# Our query functions are hooked into the views: reads are routed, writes refresh the groups they touch, and any other change to a view's tables marks it stale.
+# 
+# Let's materialize the enrolment report, enrol two participants on course 15, and read the report again. Only course 15's groups are recomputed, and the read comes from the summary table.
+
+# In[ ]:
+
+
+enrolments_report = """
+SELECT course.course_id, course.course_name, client.client_id, client.client_name,
+       COUNT(takes_course.participant_id) AS enrolments
+FROM takes_course
+JOIN course ON takes_course.course_id = course.course_id
+JOIN client ON course.client = client.client_id
+GROUP BY course.course_id, course.course_name, client.client_id, client.client_name;
+"""
+
+connection = create_db_connection("localhost", "root", pw, db)
+view = materialize(connection, "course_client_enrolments", enrolments_report, key=["course_id", "client_id"], scopes={
+    "takes_course": ("course_id", "course.course_id"),
+    "course": ("course_id", "course.course_id"),
+    "client": ("client_id", "client.client_id"),
+})
+print(route_query(connection, enrolments_report))
+
+execute_list_query(connection, "INSERT INTO takes_course (participant_id, course_id) VALUES (%s, %s)", [(102, 15), (103, 15)])
+display(read_query_df(connection, enrolments_report.rstrip().rstrip(";") + " ORDER BY enrolments DESC"))
+
+execute_query(connection, "DELETE FROM takes_course WHERE course_id = 15 AND participant_id IN (102, 103);") # not a simple condition: marked stale
+print(view.stale)
+display(read_query_df(connection, enrolments_report)) # rebuilt in full, then read
+
+drop_view(connection, view.name) # leave the school database as sections 3 and 4 built it
+
+
+# --------------------
+# 
+# ### 23. Paging Through Large Results
+# 
+# ##### 23.1 - Keyset Pagination
+# 
+# To show a long listing a page at a time - say `SELECT * FROM course ORDER BY start_date DESC` - the obvious approach is `LIMIT 20 OFFSET 10000`. But to skip 10,000 rows the server still has to find and step over every one of them, so each page is slower than the last.
+# 
+# Keyset (or "seek") pagination instead remembers where the last page ended, and asks for the rows which sort after it: `WHERE start_date < '2019-11-12' OR (start_date = '2019-11-12' AND course_id > 14)`. With an index on the ordering columns, the server jumps straight to that point, and every page costs the same however deep it is.
+# 
+# KeysetPaginator does this for any single-table or joined SELECT without its own ORDER BY, LIMIT or GROUP BY:
+# * `order_by` is a list of `(column, "ASC" or "DESC")`, and `key` is a unique, NOT NULL column (usually the primary key) which is added at the end to break ties, so that rows with the same start_date are neither skipped nor repeated,
+# * NULLs are handled the way MySQL sorts them: first in ascending order, last in descending order,
+# * page() returns the page's rows, and a token for the next page (None on the last page). The token is opaque: a URL-safe string which a listing endpoint can hand to its client and accept back. It holds the last row's ordering values, plus a check that it belongs to this listing,
+# * the rows are read with read_query, so the result cache, profiling and retries all apply.
+# 
+# For keyset pagination to be fast, the table needs an index on the ordering columns followed by the key, e.g. `course(start_date, course_id)`.
+
+# In[ ]:
+
+
+from school_db import KeysetPaginator
+
+connection = create_db_connection("localhost", "root", pw, db)
+courses = KeysetPaginator(connection, "SELECT course_id, course_name, start_date FROM course", [("start_date", "DESC")],
+                          key="course_id", page_size=3)
+rows, token = courses.page()
+print(rows, token)
+rows, token = courses.page(token)
+print(rows)
+
+
+# ##### 23.2 - Measuring the Gain
+# 
+# Let's fill a temporary copy of the course table with a million synthetic courses (whose start dates repeat every two years, so there are plenty of ties), index it on `(start_date, course_id)`, and time fetching one page of 20 at increasing depths, with OFFSET and with a keyset token. To jump straight to a deep page for the keyset version, we build its token from the row just before that page.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_pagination
+
+if run_benchmarks:
+    benchmark_pagination(connection)
+
+
+# --------------------
+# 
+# ### 24. Running SQL Scripts
+# 
+# ##### 24.1 - Many Statements, One Round Trip
+# 
+# Sections 3 and 4 set up the school with eleven calls to execute_query, and each one waits for a full round trip to the server before the next can be sent. Against a server across a network, most of the time goes on waiting rather than working.
+# 
+# MySQL can run several statements sent together in one go ([multi-statement execution](https://dev.mysql.com/doc/connector-python/en/connector-python-multi.html)), returning a result for each in turn. run_script uses this:
+# * it accepts a string of statements separated by semicolons, or the path of a `.sql` file. Semicolons inside quotes and comments are ignored, and `DELIMITER` lines are understood, so scripts that create stored procedures or triggers work too (those statements are sent on their own),
+# * the statements are sent in batches as large as max_allowed_packet allows, usually just one,
+# * the result of each statement - rows affected, any rows returned, or the error - comes back as soon as the server has run it. iter_script yields them one at a time, while run_script prints a line for each and returns them all,
+# * when a statement fails, the server skips the rest of its batch. With `stop_on_error=True` (the default) we stop there; otherwise the remaining statements are sent again as a new batch, and the script carries on.
+# 
+# As with execute_query, everything which ran successfully is committed at the end. A statement which returns several result sets (such as a CALL) would throw the results out of step with the statements, so CALLs are best run with execute_query.
+
+# In[ ]:
+
+
+from school_db import split_statements, iter_script, run_script
+
+
+# Let's set up a complete copy of the school - every table, foreign key and row from sections 3 and 4 - in a new database, with a single call:
+
+# In[ ]:
+
+
+school_script = "\n".join([
+    "CREATE DATABASE school_copy;",
+    "USE school_copy;",
+    create_teacher_table, create_client_table, create_participant_table, create_course_table,
+    alter_participant, alter_course, alter_course_again, create_takescourse_table,
+    pop_teacher, pop_client, pop_participant, pop_course, pop_takescourse,
+])
+
+connection = create_server_connection("localhost", "root", pw)
+results = run_script(connection, school_script)
+run_script(connection, "DROP DATABASE school_copy;")
+
+
+# ##### 24.2 - Measuring the Gain
+# 
+# Against the stand-in server, with 1ms of latency per round trip (a typical local network), let's run 200 INSERT statements with execute_query, and as one script.
+
+# In[ ]:
+
+
+from school_db.benchmarks import benchmark_script
+
+if run_benchmarks:
+    benchmark_script()
+
+
+# --------------------
+# 
+# ### 25. Using the Code as a Library
+# 
+# ##### 25.1 - The school_db Package
+# 
+# Running this notebook from top to bottom imports pandas and MySQL Connector and connects to our server straight away, which is what we want in a tutorial, but not in a script or a command line tool which only needs one or two of our functions. That is why everything from section 2.5 onwards lives in the `school_db` package next to this notebook, split into modules by topic (`school_db.queries`, `school_db.frames`, `school_db.bulk`, `school_db.migrations` and so on), and the benchmarks in `school_db.benchmarks`.
+# 
+# Importing school_db has no side effects: it doesn't connect to anything, and each name is only imported from its module the first time it is used. pandas, pyarrow and MySQL Connector are loaded the first time a function actually needs them, so `from school_db import read_query` takes around 20ms rather than the best part of a second, and the connector is only imported once we open a connection. The package also has a command line, which needs neither pandas nor a server until a command does:
+# 
+# ```
+# python -m school_db migrate --password ...
+# python -m school_db script setup.sql --database school
+# python -m school_db cache stats
+# python -m school_db startup
+# ```
+# 
+# ##### 25.2 - Keeping Startup Fast
+# 
+# It only takes one careless `import pandas` at the top of a module to undo all of this, so `python -m school_db startup` checks it. It imports the package in a fresh interpreter with [`python -X importtime`](https://docs.python.org/3/using/cmdline.html#cmdoption-X), takes the median of a few runs, and fails (with a non-zero exit status, so it can run in CI) if importing takes longer than `STARTUP_BUDGET_MS` (50ms) or pulls in pandas, pyarrow or MySQL Connector.
+
+# In[ ]:
+
+
+from school_db.startup import benchmark_startup
+
+if run_benchmarks:
+    benchmark_startup()
+
+
 # --------------------
 # 
-# ### 9. Conclusion
+# ### 26. Conclusion
 # 
-# ##### 9.1 - Conclusion
+# ##### 26.1 - Conclusion
 # 
 # From using Python and MySQL Connector to create an entirely new database in MySQL Server, creating tables, defining their relationships to one another and populating them with data. We have covered how to [Create, Read, Update and Delete](https://en.wikipedia.org/wiki/Create,_read,_update_and_delete) data in our database.
 # 
@@ -0,0 +1,56 @@
+"""The reusable parts of the MySQL tutorial as a library.
+
+Importing school_db is cheap and has no side effects: each name below is imported from its submodule the first
+time it is used, and pandas, pyarrow and MySQL Connector are only imported once something actually needs them.
+Mutable state (the result cache, the profiler, the disk cache) lives on its submodule, e.g. school_db.caching.result_cache.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "connections": ["create_server_connection", "create_database", "create_db_connection", "ConnectionPool",
+                    "PooledConnection", "get_pool", "raw_connection", "close_cursor"],
+    "queries": ["read_query", "execute_query", "execute_list_query", "stream_query", "max_allowed_packet"],
+    "statements": ["StatementCache", "statement_cache", "run_statement"],
+    "transactions": ["Transaction", "transaction", "current_transaction", "invalidate_tables", "invalidates_table"],
+    "caching": ["ResultCache", "enable_result_cache", "disable_result_cache"],
+    "profiling": ["QueryProfiler", "enable_profiling", "disable_profiling", "profile_query"],
+    "resilience": ["CircuitOpenError", "RetryPolicy", "CircuitBreaker", "ResilientConnection",
+                   "create_resilient_connection", "run_resilient"],
+    "views": ["MaterializedView", "materialize", "refresh_view", "drop_view"],
+    "frames": ["frame_from_rows", "read_query_df", "read_query_chunks", "aggregate_chunks"],
+    "diskcache": ["DiskCache", "enable_disk_cache", "disable_disk_cache", "disk_cache_cli"],
+    "arrow": ["arrow_batches", "read_query_arrow", "read_query_df_arrow"],
+    "bulk": ["bulk_insert", "load_data_infile"],
+    "merge": ["merge_frame"],
+    "incremental": ["ExtractState", "read_incremental", "reconcile_deletes", "sync_table"],
+    "concurrency": ["AsyncConnectionPool", "get_async_pool", "create_db_connection_async", "execute_query_async",
+                    "read_query_async", "execute_list_query_async", "read_queries_concurrently", "read_partitioned"],
+    "indexes": ["explain_query", "plan_problems", "advise_indexes"],
+    "builder": ["LazyTable", "lazy"],
+    "pagination": ["KeysetPaginator"],
+    "scripts": ["split_statements", "iter_script", "run_script"],
+    "migrations": ["Migration", "MIGRATIONS", "migrate"],
+    "parsing": ["normalize_sql", "tables_read", "tables_written", "query_fingerprint"],
+}
+
+_SUBMODULES = {*_EXPORTS, "testing", "benchmarks", "startup", "cli"}
+
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULE_OF)
+
+
+def __getattr__(name):
+    if name in _MODULE_OF:
+        value = getattr(importlib.import_module(f"{__name__}.{_MODULE_OF[name]}"), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value # so the next lookup doesn't come through here
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_MODULE_OF, *_SUBMODULES})
@@ -0,0 +1,87 @@
+"""Stand-ins for heavy modules, which import the real module the first time it is used."""
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import threading
+
+
+class LazyModule:
+    def __init__(self, name, submodules=(), install=None):
+        self._name = name
+        self._submodules = submodules # imported along with it, e.g. pyarrow.compute
+        self._install = install # how to install it, for the error when it is missing
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded yet"
+        return f"<lazy module {self._name!r} ({state})>"
+
+    def available(self):
+        # Whether the module could be imported, without importing it
+        if self._module is not None or self._name in sys.modules:
+            return True
+        try:
+            top_level = self._name.partition(".")[0]
+            if top_level != self._name and top_level not in sys.modules:
+                import_package(top_level)
+            return importlib.util.find_spec(self._name) is not None
+        except ImportError:
+            return False
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = self._import()
+                module = self._module
+        return module
+
+    def _import(self):
+        top_level = self._name.partition(".")[0]
+        if top_level != self._name and top_level not in sys.modules:
+            import_package(top_level)
+        try:
+            module = importlib.import_module(self._name)
+            for submodule in self._submodules:
+                importlib.import_module(f"{self._name}.{submodule}")
+        except ImportError as err:
+            if self._install is None:
+                raise
+            raise ImportError(f"{err}; install it with: pip install {self._install}") from err
+        return module
+
+
+def import_package(name):
+    # The tutorial's mysql.py hides the real mysql package whenever its directory is on sys.path (as it is for
+    # `python -m school_db` run from the repository), so skip over plain modules of that name to find the package
+    try:
+        spec = importlib.util.find_spec(name)
+    except ImportError:
+        return
+    if spec is None or spec.submodule_search_locations is not None:
+        return
+    for entry in sys.path:
+        found = importlib.machinery.PathFinder.find_spec(name, [entry or os.getcwd()])
+        if found is not None and found.submodule_search_locations is not None and found.loader is not None:
+            module = importlib.util.module_from_spec(found)
+            sys.modules[name] = module
+            try:
+                found.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[name]
+                raise
+            return
+
+
+pd = LazyModule("pandas", install="pandas")
+pa = LazyModule("pyarrow", submodules=("compute", "ipc"), install="pyarrow")
+connector = LazyModule("mysql.connector", install="mysql-connector-python")
+aio = LazyModule("mysql.connector.aio", install="mysql-connector-python")
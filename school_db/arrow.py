@@ -0,0 +1,111 @@
+"""Query results fetched straight into Arrow record batches, without keeping a list of rows."""
+
+from ._lazy import connector, pa, pd
+from .connections import close_cursor
+from .frames import BINARY_CHARSET, field_types
+
+
+def arrow_type(field_type, flags, charset=None):
+    # The Arrow type for a column from the cursor's description, the same for every batch however many NULLs it holds
+    FieldType = connector.FieldType
+    unsigned = bool(flags & connector.FieldFlag.UNSIGNED)
+    integer_types = {
+        FieldType.TINY: pa.uint8() if unsigned else pa.int8(),
+        FieldType.SHORT: pa.uint16() if unsigned else pa.int16(),
+        FieldType.INT24: pa.uint32() if unsigned else pa.int32(),
+        FieldType.LONG: pa.uint32() if unsigned else pa.int32(),
+        FieldType.LONGLONG: pa.uint64() if unsigned else pa.int64(),
+        FieldType.YEAR: pa.int16(),
+        FieldType.BIT: pa.uint64(),
+    }
+    blob_types = {FieldType.TINY_BLOB, FieldType.BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB}
+    if field_type in integer_types:
+        return integer_types[field_type]
+    if field_type == FieldType.FLOAT:
+        return pa.float32()
+    if field_type in (FieldType.DOUBLE, FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        return pa.float64()
+    if field_type in (FieldType.DATE, FieldType.NEWDATE):
+        return pa.date32()
+    if field_type in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp("us")
+    if field_type == FieldType.TIME:
+        return pa.duration("us")
+    if field_type == FieldType.NULL:
+        return pa.null()
+    if field_type == FieldType.SET:
+        return pa.list_(pa.string())
+    if field_type == getattr(FieldType, "VECTOR", None): # MySQL 9
+        return pa.list_(pa.float32())
+    if field_type == FieldType.GEOMETRY or (charset == BINARY_CHARSET and field_type in blob_types | field_types()[3]):
+        return pa.binary()
+    return pa.string() # text, TEXT and JSON columns, and anything else the server sends as text
+
+
+def arrow_batches(connection, query, params=None, batch_size=65536):
+    if not pa.available():
+        raise ImportError("The Arrow fetch path needs pyarrow: pip install pyarrow")
+    FieldType = connector.FieldType
+    cursor = connection.cursor(buffered=False)
+    unread = False
+    try:
+        cursor.execute(query, params)
+        unread = True
+        types = [column[1] for column in cursor.description]
+        # One schema for every batch: inferring types per batch would make a batch of only NULLs type null
+        schema = pa.schema([(column[0], arrow_type(column[1], column[7] if len(column) > 7 else 0,
+                                                   column[8] if len(column) > 8 else None))
+                            for column in cursor.description])
+        empty = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                unread = False
+                break
+            empty = False
+            columns = list(zip(*rows))
+            del rows
+            arrays = []
+            for field_type, field, values in zip(types, schema, columns):
+                if field_type in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+                    arrays.append(pa.array(values).cast(field.type)) # Decimals only convert by casting
+                else:
+                    arrays.append(pa.array(values, type=field.type))
+            del columns
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if empty: # so that an empty result still has its columns
+            yield pa.RecordBatch.from_pylist([], schema=schema)
+    finally:
+        close_cursor(cursor, unread, batch_size)
+
+
+def read_query_arrow(connection, query, params=None, batch_size=65536, category_threshold=0.5):
+    try:
+        batches = list(arrow_batches(connection, query, params, batch_size))
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+    if not batches:
+        return pa.table({})
+    table = pa.Table.from_batches(batches)
+    del batches
+
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if pa.types.is_int8(field.type) and column.null_count < len(column):
+            smallest, largest = pa.compute.min_max(column).values()
+            if smallest.as_py() >= 0 and largest.as_py() <= 1:
+                table = table.set_column(i, field.name, column.cast(pa.bool_()))
+        elif pa.types.is_string(field.type) and len(column):
+            if pa.compute.count_distinct(column).as_py() <= category_threshold * len(column):
+                table = table.set_column(i, field.name, column.dictionary_encode())
+    return table
+
+
+def read_query_df_arrow(connection, query, params=None, batch_size=65536, category_threshold=0.5, zero_copy=True):
+    table = read_query_arrow(connection, query, params, batch_size, category_threshold)
+    if table is None:
+        return None
+    if zero_copy:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
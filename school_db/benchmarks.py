@@ -0,0 +1,440 @@
+"""The tutorial's benchmarks, against the stand-in server or a real database."""
+
+import asyncio
+import contextlib
+import datetime
+import functools
+import json
+import statistics
+import tempfile
+import time
+
+from . import caching, diskcache
+from ._lazy import connector, pa, pd
+from .arrow import read_query_df_arrow
+from .bulk import bulk_insert, latency_percentiles, load_data_infile
+from .concurrency import AsyncConnectionPool, read_queries_concurrently
+from .connections import ConnectionPool, create_db_connection, create_server_connection
+from .diskcache import DiskCache
+from .frames import read_query_df
+from .merge import merge_frame
+from .migrations import MIGRATIONS, migrate
+from .pagination import KeysetPaginator
+from .queries import execute_list_query, execute_query, read_query
+from .scripts import run_script
+from .statements import run_statement, statement_cache
+from .testing import (SchoolDataGenerator, StandInServer, connect_to_stand_in, course_columns, peak_memory,
+                      populate_school, synthetic_courses, synthetic_participants)
+from .transactions import transaction
+
+PARTICIPANT_COLUMNS = ["participant_id", "first_name", "last_name", "phone_no", "client"]
+
+
+def benchmark_connection_pool(statements=200, server=None):
+    server = server or StandInServer()
+    query = "SELECT 1"
+
+    start = time.perf_counter()
+    for _ in range(statements):
+        connection = server.connect() # what the notebook does: a fresh handshake per statement
+        connection.cursor().execute(query)
+    unpooled = statements / (time.perf_counter() - start)
+
+    pool = ConnectionPool(server.connect)
+    start = time.perf_counter()
+    for _ in range(statements):
+        with pool.connection() as connection:
+            connection.cursor().execute(query)
+    pooled = statements / (time.perf_counter() - start)
+    pool.close()
+
+    print(f"Unpooled: {unpooled:,.0f} statements/sec")
+    print(f"Pooled:   {pooled:,.0f} statements/sec ({pooled / unpooled:.1f}x)")
+    return {"unpooled": unpooled, "pooled": pooled}
+
+
+def read_query_df_by_hand(connection, query):
+    # The tutorial's section 5.5 approach, for a query returning the course table's columns
+    from_db = []
+    for result in read_query(connection, query):
+        result = list(result)
+        from_db.append(result)
+    return pd.DataFrame(from_db, columns=[name for name, _ in course_columns()])
+
+
+def benchmark_read_query_df(rows=500_000):
+    server = StandInServer(handshake_latency=0, query_latency=0, rows=list(synthetic_courses(rows)), columns=course_columns())
+    connection = server.connect()
+    results = {}
+    for reader in [read_query_df_by_hand, read_query_df]:
+        start = time.perf_counter()
+        df = reader(connection, "SELECT * FROM course")
+        elapsed = time.perf_counter() - start
+        results[reader.__name__] = {"seconds": elapsed, "bytes": df.memory_usage(deep=True).sum()}
+        print(f"{reader.__name__:>22}: {elapsed:5.2f}s, {results[reader.__name__]['bytes'] / 2**20:6.1f} MiB")
+    return results
+
+
+def benchmark_load_data(connection, rows=100_000):
+    data = list(synthetic_participants(rows))
+    df = pd.DataFrame(data, columns=PARTICIPANT_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(PARTICIPANT_COLUMNS))
+    loaders = {
+        "execute_list_query": lambda: execute_list_query(
+            connection, f"INSERT INTO participant_load_benchmark VALUES ({placeholders})", data),
+        "bulk_insert": lambda: bulk_insert(connection, "participant_load_benchmark", PARTICIPANT_COLUMNS, data),
+        "load_data_infile": lambda: load_data_infile(connection, "participant_load_benchmark", df),
+    }
+
+    execute_query(connection, "CREATE TEMPORARY TABLE participant_load_benchmark LIKE participant;")
+    timings = {}
+    for name, load in loaders.items():
+        execute_query(connection, "TRUNCATE TABLE participant_load_benchmark;")
+        start = time.perf_counter()
+        load()
+        timings[name] = rows / (time.perf_counter() - start)
+    execute_query(connection, "DROP TEMPORARY TABLE participant_load_benchmark;")
+
+    for name, rows_per_sec in timings.items():
+        print(f"{name:>18}: {rows_per_sec:10,.0f} rows/sec")
+    return timings
+
+
+def benchmark_prepared_statements(connection, lookups=1000):
+    client_ids = [101 + i % 5 for i in range(lookups)]
+    saved, caching.result_cache = caching.result_cache, None # time the round trips, not the result cache
+
+    try:
+        start = time.perf_counter()
+        for client_id in client_ids:
+            read_query(connection, f"SELECT * FROM client WHERE client_id = {client_id};")
+        text = (time.perf_counter() - start) / lookups
+
+        start = time.perf_counter()
+        for client_id in client_ids:
+            read_query(connection, "SELECT * FROM client WHERE client_id = %s;", (client_id,))
+        prepared = (time.perf_counter() - start) / lookups
+    finally:
+        caching.result_cache = saved
+
+    print(f"Text:     {text * 1e6:7.1f} µs per lookup")
+    print(f"Prepared: {prepared * 1e6:7.1f} µs per lookup ({text / prepared:.1f}x)")
+    print(f"Statement cache: {statement_cache(connection).stats()}")
+    return {"text": text, "prepared": prepared}
+
+
+def benchmark_concurrent_reads(queries=50, concurrency=10, server=None):
+    server = server or StandInServer(handshake_latency=0.005, query_latency=0.02)
+    query = "SELECT * FROM course;"
+    saved, caching.result_cache = caching.result_cache, None # time the round trips, not the result cache
+
+    connection = server.connect()
+    start = time.perf_counter()
+    for _ in range(queries):
+        read_query(connection, query)
+    sequential = time.perf_counter() - start
+
+    async def run_concurrently():
+        pool = AsyncConnectionPool(functools.partial(connect_to_stand_in, server), max_size=concurrency)
+        start = time.perf_counter()
+        await read_queries_concurrently(pool, [query] * queries, concurrency)
+        elapsed = time.perf_counter() - start
+        await pool.close()
+        return elapsed
+
+    try:
+        concurrent = asyncio.run(run_concurrently())
+    finally:
+        caching.result_cache = saved
+    print(f"Sequential: {sequential:.2f}s")
+    print(f"Concurrent: {concurrent:.2f}s ({sequential / concurrent:.1f}x faster, {concurrency} at a time)")
+    return {"sequential": sequential, "concurrent": concurrent}
+
+
+def time_operation(operation, runs=5, setup=None, cleanup=None):
+    # Only the operation itself is timed; setup and cleanup run before and after each run
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+        if cleanup:
+            cleanup()
+    return timings
+
+
+def school_operations(connection, generator, queries, bulk_rows=1000):
+    # name -> (operation, setup, cleanup), with a read operation for each of `queries` ({name: SQL})
+    client_id = generator.first_id
+    course = next(generator.courses())
+    enrolled = [row for row in generator.enrolments() if row[1] == course[0]] # deleted along with the course
+    first_new_teacher = generator.first_id + generator.sizes["teacher"]
+    new_teachers = [(teacher_id, "New", "Teacher", "ENG", None, "1990-01-01", teacher_id, "+490000000000")
+                    for teacher_id in range(first_new_teacher, first_new_teacher + bulk_rows)]
+
+    def read(query):
+        return lambda: run_statement(connection, query).fetchall()
+
+    def write(query, params=None):
+        def run():
+            run_statement(connection, query, params)
+            connection.commit()
+        return run
+
+    def insert_teachers():
+        cursor = connection.cursor()
+        cursor.executemany("INSERT INTO teacher VALUES (%s, %s, %s, %s, %s, %s, %s, %s);", new_teachers)
+        connection.commit()
+        cursor.close()
+
+    def restore_course():
+        cursor = connection.cursor()
+        cursor.execute("INSERT INTO course VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);", course)
+        cursor.executemany("INSERT INTO takes_course VALUES (%s, %s);", enrolled)
+        connection.commit()
+        cursor.close()
+
+    delete_course = write("DELETE FROM course WHERE course_id = %s;", (course[0],))
+    delete_new_teachers = write("DELETE FROM teacher WHERE teacher_id >= %s;", (first_new_teacher,))
+
+    return {
+        **{name: (read(query), None, None) for name, query in queries.items()},
+        "update_client_address": (write("UPDATE client SET address = %s WHERE client_id = %s;",
+                                        ("23 Fingiertweg, 14534 Berlin", client_id)), None, None),
+        "delete_course": (delete_course, None, restore_course),
+        "restore_course": (restore_course, delete_course, None),
+        "bulk_insert_teachers": (insert_teachers, None, delete_new_teachers),
+    }
+
+
+def benchmark_school(host_name, user_name, user_password, queries, scales=(1_000, 10_000, 100_000), seed=42, runs=5,
+                     output="benchmark_results.jsonl", bench_db="school_benchmark"):
+    results = []
+    for scale in scales:
+        server = create_server_connection(host_name, user_name, user_password)
+        execute_query(server, f"DROP DATABASE IF EXISTS {bench_db};")
+        execute_query(server, f"CREATE DATABASE {bench_db};")
+        server.close()
+
+        connection = create_db_connection(host_name, user_name, user_password, bench_db)
+        for migration in MIGRATIONS:
+            execute_query(connection, migration.sql)
+        generator = SchoolDataGenerator(scale, seed)
+        loaded = populate_school(connection, generator)
+
+        for name, (operation, setup, cleanup) in school_operations(connection, generator, queries).items():
+            timings = time_operation(operation, runs, setup, cleanup)
+            percentiles = latency_percentiles(timings)
+            results.append({
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "operation": name,
+                "scale": scale,
+                "rows": sum(loaded.values()),
+                "seed": seed,
+                "runs": runs,
+                "median_ms": statistics.median(timings) * 1000,
+                "p95_ms": percentiles["p95"] * 1000,
+                "max_ms": percentiles["max"] * 1000,
+                "server_version": connection.get_server_info(),
+            })
+        connection.close()
+
+    with open(output, "a", encoding="utf-8") as file:
+        for result in results:
+            file.write(json.dumps(result) + "\n")
+    return pd.DataFrame(results)
+
+
+def benchmark_transactions(connection, statements=1000):
+    insert = "INSERT INTO teacher_tx_benchmark VALUES (%s, 'New', 'Teacher', 'ENG', NULL, '1990-01-01', %s, NULL);"
+    execute_query(connection, "CREATE TEMPORARY TABLE teacher_tx_benchmark LIKE teacher;")
+    timings = {}
+
+    start = time.perf_counter()
+    for teacher_id in range(statements):
+        run_statement(connection, insert, (teacher_id, teacher_id))
+        connection.commit() # what execute_query does, without printing 1,000 lines
+    timings["commit per statement"] = time.perf_counter() - start
+
+    for name, commit_every in [("one transaction", None), ("commit every 100", 100)]:
+        run_statement(connection, "DELETE FROM teacher_tx_benchmark;")
+        connection.commit()
+        start = time.perf_counter()
+        with transaction(connection, commit_every=commit_every) as tx:
+            for teacher_id in range(statements):
+                tx.execute(insert, (teacher_id, teacher_id))
+        timings[name] = time.perf_counter() - start
+
+    execute_query(connection, "DROP TEMPORARY TABLE teacher_tx_benchmark;")
+    for name, seconds in timings.items():
+        print(f"{name:>20}: {statements / seconds:8,.0f} statements/sec")
+    return timings
+
+
+def benchmark_migrations(connection, runs=20):
+    create_statements = [migration.sql for migration in MIGRATIONS if migration.foreign_key is None]
+    cursor = connection.cursor()
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        for statement in create_statements:
+            try:
+                cursor.execute(statement)
+            except connector.Error:
+                pass
+    rerun = (time.perf_counter() - start) / runs
+
+    with contextlib.redirect_stdout(None):
+        start = time.perf_counter()
+        for _ in range(runs):
+            migrate(connection)
+        migrated = (time.perf_counter() - start) / runs
+
+    cursor.close()
+    print(f"Re-running the DDL: {rerun * 1000:.2f} ms ({len(create_statements)} failing statements)")
+    print(f"migrate():          {migrated * 1000:.2f} ms (1 query)")
+    return {"rerun": rerun, "migrate": migrated}
+
+
+def benchmark_merge(clients=10_000, changed_fraction=0.01, server=None):
+    FieldType = connector.FieldType
+    current = [(client_id, f"Client {client_id}", f"{client_id} Musterstraße, 10115 Berlin", "Retail")
+               for client_id in range(clients)]
+    server = server or StandInServer(handshake_latency=0, rows=current, columns=[
+        ("client_id", FieldType.LONG),
+        ("client_name", FieldType.VAR_STRING),
+        ("address", FieldType.VAR_STRING),
+        ("industry", FieldType.VAR_STRING),
+    ])
+    connection = server.connect()
+    df = pd.DataFrame(current, columns=["client_id", "client_name", "address", "industry"])
+    step = int(1 / changed_fraction)
+    df.loc[df["client_id"] % step == 0, "address"] = "23 Fingiertweg, 14534 Berlin"
+
+    start = time.perf_counter()
+    cursor = connection.cursor()
+    for client_id, address in zip(df["client_id"], df["address"]):
+        cursor.execute("UPDATE client SET address = %s WHERE client_id = %s;", (address, int(client_id)))
+    connection.commit()
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = merge_frame(connection, "client", df, key="client_id", packet_bytes=2**20)
+    merged = time.perf_counter() - start
+
+    print(f"One UPDATE per row: {per_row:.3f}s ({clients:,} statements)")
+    print(f"merge_frame:        {merged:.3f}s ({stats['statements']:,} statements, "
+          f"{stats['rows_read']:,} rows read in full, {per_row / merged:.1f}x)")
+    return {"per_row": per_row, "merge": merged}
+
+
+def benchmark_disk_cache(rows=500_000, directory=None):
+    server = StandInServer(handshake_latency=0, query_latency=0, rows=lambda: synthetic_courses(rows), columns=course_columns())
+    connection = server.connect()
+    query = "SELECT * FROM course"
+    saved = diskcache.disk_cache
+    with tempfile.TemporaryDirectory() as temporary:
+        diskcache.disk_cache = DiskCache(directory or temporary)
+        try:
+            timings = {}
+            start = time.perf_counter()
+            read_query_df(connection, query) # a miss: read from the server and written to disk
+            timings["server, writing to disk"] = time.perf_counter() - start
+            start = time.perf_counter()
+            read_query_df(connection, query)
+            timings["disk, as DataFrame"] = time.perf_counter() - start
+            start = time.perf_counter()
+            read_query_df(connection, query, as_arrow=True)
+            timings["disk, as Arrow table"] = time.perf_counter() - start
+        finally:
+            diskcache.disk_cache = saved
+
+    for name, seconds in timings.items():
+        print(f"{name:>24}: {seconds * 1000:8.1f} ms")
+    return timings
+
+
+def benchmark_arrow_fetch(rows=500_000):
+    server = StandInServer(handshake_latency=0, query_latency=0, rows=list(synthetic_courses(rows)), columns=course_columns())
+    connection = server.connect()
+    query = "SELECT * FROM course"
+    readers = {
+        "tuples (section 5.5)": read_query_df_by_hand,
+        "read_query_df": read_query_df,
+        "read_query_df_arrow": read_query_df_arrow,
+    }
+    results = {}
+    for name, reader in readers.items():
+        start = time.perf_counter()
+        reader(connection, query)
+        elapsed = time.perf_counter() - start # timed separately, as tracemalloc slows Python's allocations down
+
+        held = {}
+        def read():
+            arrow_before = pa.total_allocated_bytes()
+            held["frame"] = reader(connection, query)
+            held["arrow"] = pa.total_allocated_bytes() - arrow_before
+        peak = peak_memory(read) + held["arrow"]
+        df = held.pop("frame")
+        results[name] = {"rows_per_sec": rows / elapsed, "peak_bytes_per_row": peak / rows,
+                         "result_bytes_per_row": df.memory_usage(deep=True).sum() / rows}
+        del df
+        print(f"{name:>22}: {rows / elapsed:10,.0f} rows/sec, peak {peak / rows:6.1f} bytes/row, "
+              f"result {results[name]['result_bytes_per_row']:5.1f} bytes/row")
+    return results
+
+
+def benchmark_pagination(connection, rows=1_000_000, depths=(0, 1_000, 10_000, 100_000, 500_000, 990_000), runs=5, page_size=20):
+    execute_query(connection, "CREATE TEMPORARY TABLE course_pages LIKE course;")
+    execute_query(connection, "ALTER TABLE course_pages ADD INDEX (start_date, course_id);")
+    bulk_insert(connection, "course_pages", None, synthetic_courses(rows))
+    query = "SELECT * FROM course_pages"
+    paginator = KeysetPaginator(connection, query, [("start_date", "DESC")], key="course_id", page_size=page_size)
+    saved, caching.result_cache = caching.result_cache, None # time the server, not the cache
+
+    results = []
+    try:
+        for depth in depths:
+            offset_sql = f"{query} ORDER BY start_date DESC, course_id ASC LIMIT {page_size} OFFSET {depth};"
+            token = None
+            if depth:
+                before = read_query(connection, f"SELECT start_date, course_id FROM course_pages ORDER BY start_date DESC, course_id ASC LIMIT 1 OFFSET {depth - 1};")
+                token = paginator.encode(before[0])
+            timings = {"offset": [], "keyset": []}
+            for _ in range(runs):
+                start = time.perf_counter()
+                read_query(connection, offset_sql)
+                timings["offset"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                paginator.page(token)
+                timings["keyset"].append(time.perf_counter() - start)
+            result = {"depth": depth, **{name: statistics.median(times) for name, times in timings.items()}}
+            results.append(result)
+            print(f"depth {depth:>9,}: OFFSET {result['offset'] * 1000:7.2f} ms, keyset {result['keyset'] * 1000:6.2f} ms")
+    finally:
+        caching.result_cache = saved
+        execute_query(connection, "DROP TEMPORARY TABLE course_pages;")
+    return results
+
+
+def benchmark_script(statements=200, server=None):
+    server = server or StandInServer(handshake_latency=0, query_latency=0.001)
+    connection = server.connect()
+    inserts = [f"INSERT INTO participant VALUES ({1000 + i}, 'First{i}', 'Last{i}', '49155{i:06d}', NULL);"
+               for i in range(statements)]
+
+    with contextlib.redirect_stdout(None):
+        start = time.perf_counter()
+        for insert in inserts:
+            execute_query(connection, insert)
+        one_by_one = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_script(connection, "\n".join(inserts), max_batch_bytes=2**20)
+        scripted = time.perf_counter() - start
+
+    print(f"execute_query per statement: {one_by_one * 1000:7.1f} ms")
+    print(f"run_script:                  {scripted * 1000:7.1f} ms ({one_by_one / scripted:.0f}x)")
+    return {"one_by_one": one_by_one, "script": scripted}
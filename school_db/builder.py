@@ -0,0 +1,133 @@
+"""A lazy, pandas-like query builder which runs filters, joins and aggregations in SQL."""
+
+from .frames import read_query_df
+from .indexes import explain_query
+from .parsing import identifier
+
+
+AGGREGATE_SQL = {
+    "count": "COUNT({})",
+    "nunique": "COUNT(DISTINCT {})",
+    "size": "COUNT(*)",
+    "sum": "SUM({})",
+    "mean": "AVG({})",
+    "min": "MIN({})",
+    "max": "MAX({})",
+    "std": "STDDEV_SAMP({})",
+    "var": "VAR_SAMP({})",
+}
+
+
+class LazyTable:
+    def __init__(self, connection, table):
+        self.connection = connection
+        self.table = identifier(table)
+        self.joins = []
+        self.where = []
+        self.having = []
+        self.params = {"where": [], "having": []}
+        self.columns = []
+        self.group_by = []
+        self.aggregates = []
+        self.order_by = []
+        self.limit = None
+
+    def _copy(self):
+        other = LazyTable.__new__(LazyTable)
+        other.__dict__.update({
+            name: (list(value) if isinstance(value, list) else value) for name, value in self.__dict__.items()
+        })
+        other.params = {name: list(values) for name, values in self.params.items()}
+        return other
+
+    def filter(self, condition=None, *params, **equals):
+        other = self._copy()
+        clause = "having" if other.aggregates else "where"
+        conditions = [(condition, list(params))] if condition else []
+        conditions += [(f"{identifier(column)} = %s", [value]) for column, value in equals.items()]
+        for sql, values in conditions:
+            getattr(other, clause).append(f"({sql})")
+            other.params[clause].extend(values)
+        return other
+
+    def join(self, table, on, how="inner"):
+        if how not in ("inner", "left"):
+            raise ValueError("how must be 'inner' or 'left'")
+        other = self._copy()
+        other.joins.append(f"{'LEFT JOIN' if how == 'left' else 'JOIN'} {identifier(table)} ON {on}")
+        return other
+
+    def select(self, *columns):
+        other = self._copy()
+        other.columns = [identifier(column) for column in columns]
+        return other
+
+    def groupby(self, *columns):
+        other = self._copy()
+        other.group_by = [identifier(column) for column in columns]
+        return other
+
+    def agg(self, **aggregates):
+        other = self._copy()
+        for name, (column, function) in aggregates.items():
+            if function not in AGGREGATE_SQL:
+                raise ValueError(f"Unknown aggregation {function!r}; use one of {', '.join(AGGREGATE_SQL)}")
+            column = "*" if function == "size" else identifier(column)
+            other.aggregates.append(f"{AGGREGATE_SQL[function].format(column)} AS {identifier(name)}")
+        return other
+
+    def size(self):
+        return self.agg(size=(None, "size"))
+
+    def sort_values(self, by, ascending=True):
+        by = [by] if isinstance(by, str) else list(by)
+        ascending = [ascending] * len(by) if isinstance(ascending, bool) else list(ascending)
+        other = self._copy()
+        other.order_by = [f"{identifier(column)}{'' if up else ' DESC'}" for column, up in zip(by, ascending)]
+        return other
+
+    def head(self, n=5):
+        other = self._copy()
+        other.limit = int(n)
+        return other
+
+    def to_sql(self):
+        if self.aggregates:
+            columns = [f"{column} AS {column.split('.')[-1]}" if "." in column else column for column in self.group_by]
+            columns += self.aggregates
+        else:
+            columns = self.columns or ["*"]
+        sql = f"SELECT {', '.join(columns)}\nFROM {self.table}"
+        for join in self.joins:
+            sql += f"\n{join}"
+        if self.where:
+            sql += f"\nWHERE {' AND '.join(self.where)}"
+        if self.group_by and self.aggregates:
+            sql += f"\nGROUP BY {', '.join(self.group_by)}"
+        if self.having:
+            sql += f"\nHAVING {' AND '.join(self.having)}"
+        if self.order_by:
+            sql += f"\nORDER BY {', '.join(self.order_by)}"
+        if self.limit is not None:
+            sql += f"\nLIMIT {self.limit}"
+        params = self.params["where"] + self.params["having"]
+        return sql + ";", tuple(params) or None
+
+    def explain(self, plan=False):
+        sql, params = self.to_sql()
+        print(sql)
+        if params:
+            print(f"-- parameters: {params}")
+        if plan:
+            return explain_query(self.connection, sql, params)
+
+    def collect(self, **options):
+        sql, params = self.to_sql()
+        return read_query_df(self.connection, sql, params=params, **options)
+
+    def __repr__(self):
+        return f"<LazyTable\n{self.to_sql()[0]}\n>"
+
+
+def lazy(connection, table):
+    return LazyTable(connection, table)
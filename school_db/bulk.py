@@ -0,0 +1,174 @@
+"""Fast bulk loading: packet-sized multi-row INSERTs and LOAD DATA LOCAL INFILE."""
+
+import contextlib
+import csv
+import os
+import tempfile
+import time
+
+from ._lazy import connector, pd
+from .profiling import estimate_row_bytes
+from .queries import max_allowed_packet
+from .transactions import Transaction, invalidates_table
+
+
+def packet_batches(rows, max_bytes):
+    batch, size = [], 0
+    for row in rows:
+        row_bytes = estimate_row_bytes(row)
+        if batch and size + row_bytes > max_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(row)
+        size += row_bytes
+    if batch:
+        yield batch
+
+
+def latency_percentiles(latencies):
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(latencies)
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+    return {"p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": ordered[-1]}
+
+
+def bulk_insert(connection, table, columns, rows, packet_bytes=None, rows_per_commit=10000, stop_on_error=True):
+    packet_bytes = packet_bytes or max_allowed_packet(connection)
+    column_list = f" ({', '.join(columns)})" if columns else ""
+    prefix = f"INSERT INTO {table}{column_list} VALUES "
+    cursor = connection.cursor()
+
+    inserted = failed = pending = 0
+    latencies = []
+    start = time.perf_counter()
+
+    def commit_pending():
+        nonlocal inserted, failed, pending
+        try:
+            connection.commit()
+            inserted += pending
+        except connector.Error as err:
+            print(f"Error: '{err}'")
+            failed += pending
+            return False
+        finally:
+            pending = 0
+        return True
+
+    # Inside a transaction, a failure only undoes this call's rows: the rest of the transaction is up to its owner
+    in_transaction = isinstance(connection, Transaction)
+    try:
+        with connection.savepoint() if in_transaction else contextlib.nullcontext():
+            for batch in packet_batches(rows, int(packet_bytes * 0.9) - len(prefix)):
+                placeholders = "(" + ", ".join(["%s"] * len(batch[0])) + ")"
+                sql = prefix + ", ".join([placeholders] * len(batch))
+                batch_start = time.perf_counter()
+                try:
+                    cursor.execute(sql, [value for row in batch for value in row])
+                    pending += len(batch)
+                except connector.Error as err:
+                    print(f"Error: '{err}'")
+                    if in_transaction:
+                        if stop_on_error:
+                            raise
+                        failed += len(batch) # MySQL has already undone the failed statement
+                        continue
+                    failed += pending + len(batch)
+                    pending = 0
+                    try:
+                        connection.rollback()
+                    except connector.Error:
+                        pass
+                    if stop_on_error:
+                        break
+                    continue
+                latencies.append(time.perf_counter() - batch_start)
+                if pending >= rows_per_commit and not commit_pending() and stop_on_error:
+                    break
+            if pending:
+                commit_pending()
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": inserted,
+        "failed_rows": failed,
+        "batches": len(latencies),
+        "seconds": elapsed,
+        "rows_per_sec": inserted / elapsed if elapsed else 0.0,
+        "batch_latency": latency_percentiles(latencies),
+    }
+    latency = stats["batch_latency"]
+    print(f"Inserted {inserted:,} rows in {stats['batches']:,} batches ({stats['rows_per_sec']:,.0f} rows/sec), "
+          f"batch latency p50 {latency['p50'] * 1000:.1f}ms, p95 {latency['p95'] * 1000:.1f}ms, max {latency['max'] * 1000:.1f}ms")
+    if failed:
+        print(f"{failed:,} rows were rolled back")
+    return stats
+
+
+def sql_string(value):
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def write_load_file(df, file, chunksize=100000):
+    # Backslash is LOAD DATA's escape character, so escape it in text columns; NULL is written as \N
+    df = df.copy()
+    for name, column in df.items():
+        if pd.api.types.is_bool_dtype(column):
+            df[name] = column.astype("Int8")
+        elif pd.api.types.is_float_dtype(column) and column.dropna().mod(1).eq(0).all():
+            df[name] = column.astype("Int64") # integers which picked up a NaN, so they don't load as 1.0
+        elif pd.api.types.is_string_dtype(column) or isinstance(column.dtype, pd.CategoricalDtype):
+            df[name] = column.astype("string").str.replace("\\", "\\\\", regex=False)
+    df.to_csv(file, header=False, index=False, na_rep="\\N", lineterminator="\n", chunksize=chunksize, date_format="%Y-%m-%d %H:%M:%S")
+
+
+def load_data_infile(connection, table, source, columns=None, null_values=("",), delimiter=",", chunksize=100000):
+    if columns is not None and not isinstance(columns, dict):
+        columns = {name: name for name in columns} # a list of columns keeps their names
+    path = None
+    cursor = connection.cursor()
+    try:
+        if isinstance(source, pd.DataFrame):
+            df = source[list(columns)].rename(columns=columns) if columns else source
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", encoding="utf-8", delete=False) as file:
+                path = file.name
+                write_load_file(df, file, chunksize)
+            query = (
+                f"LOAD DATA LOCAL INFILE {sql_string(path)} INTO TABLE {table} CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(df.columns)});"
+            )
+        else:
+            with open(source, newline="", encoding="utf-8") as file:
+                header = next(csv.reader(file, delimiter=delimiter))
+            columns = columns or {name: name for name in header}
+            variables = [f"@c{i}" if name in columns else "@skip" for i, name in enumerate(header)]
+            nulls = ", ".join(sql_string(value) for value in null_values)
+            assignments = [
+                f"{columns[name]} = IF(@c{i} IN ({nulls}), NULL, @c{i})" if nulls else f"{columns[name]} = @c{i}"
+                for i, name in enumerate(header) if name in columns
+            ]
+            query = (
+                f"LOAD DATA LOCAL INFILE {sql_string(os.path.abspath(source))} INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY {sql_string(delimiter)} OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+                f"({', '.join(variables)}) SET {', '.join(assignments)};"
+            )
+        cursor.execute(query)
+        connection.commit()
+        print(f"Loaded {cursor.rowcount:,} rows into {table}")
+        return cursor.rowcount
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+    finally:
+        cursor.close()
+        if path is not None:
+            os.remove(path)
+
+
+bulk_insert = invalidates_table(bulk_insert)
+load_data_infile = invalidates_table(load_data_infile)
@@ -0,0 +1,141 @@
+"""An in-process cache of read_query results, invalidated by table whenever we write."""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Which tables can change when a row in a table is deleted, via the school's foreign keys
+FOREIGN_KEY_DEPENDENTS = {
+    "client": {"participant", "course"},
+    "teacher": {"course"},
+    "participant": {"takes_course"},
+    "course": {"takes_course"},
+}
+
+
+def dependent_tables(tables, dependents=FOREIGN_KEY_DEPENDENTS):
+    # tables, and every table whose rows a foreign key can change when theirs are deleted
+    pending, affected = list(tables), set()
+    while pending:
+        table = pending.pop()
+        if table not in affected:
+            affected.add(table)
+            pending.extend(dependents.get(table, ()))
+    return affected
+
+
+class ResultCache:
+    def __init__(self, max_entries=1000, max_bytes=64 * 2**20, ttl_seconds=60, dependents=FOREIGN_KEY_DEPENDENTS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.dependents = dependents
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict() # key -> (rows, tables, size in bytes, expiry time)
+        self._by_table = {} # table -> keys of the results read from it
+        self._versions = {} # table -> number of times it has been invalidated
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return list(entry[0])
+
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in sorted(tables))
+
+    def put(self, key, rows, tables, versions):
+        size = result_size(rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # Don't store a result if one of its tables was written while the query was running
+            if versions != tuple(self._versions.get(table, 0) for table in sorted(tables)):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (list(rows), tables, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tables(self, tables):
+        affected = dependent_tables(tables, self.dependents)
+        with self._lock:
+            for table in affected:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for table in self._by_table:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "invalidations": self.invalidations}
+
+    def _remove(self, key):
+        # Called with the lock held
+        _, tables, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+
+def result_size(rows):
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in rows)
+
+
+result_cache = None
+
+def enable_result_cache(**options):
+    global result_cache
+    result_cache = ResultCache(**options)
+    return result_cache
+
+def disable_result_cache():
+    global result_cache
+    result_cache = None
+
+
+# Called with the tables of every invalidation (None meaning all of them), e.g. to mark materialized views stale
+invalidation_hooks = []
+
+def invalidate_cached_tables(tables):
+    if tables is not None:
+        tables = dependent_tables(tables)
+    if result_cache is not None:
+        if tables is None:
+            result_cache.clear()
+        elif tables:
+            result_cache.invalidate_tables(tables)
+    for hook in invalidation_hooks:
+        hook(tables)
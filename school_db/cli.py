@@ -0,0 +1,93 @@
+"""The command line: python -m school_db {cache,migrate,script,startup}."""
+
+import argparse
+import os
+import sys
+
+from ._lazy import connector
+
+
+def add_connection_options(parser):
+    parser.add_argument("--host", default="localhost", help="MySQL server (default: %(default)s)")
+    parser.add_argument("--user", default="root", help="user name (default: %(default)s)")
+    parser.add_argument("--password", default=os.environ.get("MYSQL_PWD", ""), help="password (default: $MYSQL_PWD)")
+    parser.add_argument("--database", default="school", help="database (default: %(default)s)")
+
+
+def connect(args):
+    # Imported here, so commands which don't need the connector (and --help) start quickly
+    from .connections import create_db_connection
+    return create_db_connection(args.host, args.user, args.password, args.database)
+
+
+def run_cache(args):
+    from .diskcache import run_cache_command
+    run_cache_command(args)
+    return 0
+
+
+def run_migrate(args):
+    from .migrations import migrate
+    connection = connect(args)
+    if connection is None:
+        return 1
+    try:
+        migrate(connection)
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return 1
+    finally:
+        connection.close()
+    return 0
+
+
+def run_script_command(args):
+    from .scripts import run_script
+    connection = connect(args)
+    if connection is None:
+        return 1
+    try:
+        results = run_script(connection, args.script, stop_on_error=not args.keep_going)
+    finally:
+        connection.close()
+    return 1 if any(result["error"] is not None for result in results) else 0
+
+
+def run_startup(args):
+    from .startup import benchmark_startup
+    results = benchmark_startup(args.modules, args.runs, args.budget)
+    return 0 if all(result["within_budget"] for result in results) else 1
+
+
+def main(argv=None):
+    from .diskcache import add_cache_arguments
+    from .startup import STARTUP_BUDGET_MS
+    parser = argparse.ArgumentParser(prog="python -m school_db", description="Work with the school database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cache = commands.add_parser("cache", help="inspect and purge the on-disk query result cache")
+    add_cache_arguments(cache)
+    cache.set_defaults(handler=run_cache)
+
+    migrate = commands.add_parser("migrate", help="apply the schema migrations which haven't been applied yet")
+    add_connection_options(migrate)
+    migrate.set_defaults(handler=run_migrate)
+
+    script = commands.add_parser("script", help="run a multi-statement SQL script")
+    script.add_argument("script", help="a .sql file")
+    script.add_argument("--keep-going", action="store_true", help="carry on after a statement fails")
+    add_connection_options(script)
+    script.set_defaults(handler=run_script_command)
+
+    startup = commands.add_parser("startup", help="check that importing school_db stays within its startup budget")
+    startup.add_argument("modules", nargs="*", default=["school_db", "school_db.queries", "school_db.cli"], help="modules to import (default: %(default)s)")
+    startup.add_argument("--runs", type=int, default=5, help="imports to take the median of (default: %(default)s)")
+    startup.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help="milliseconds (default: %(default)s)")
+    startup.set_defaults(handler=run_startup)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""Running queries concurrently: an asyncio connection pool and query functions, and partitioned parallel reads."""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import re
+import time
+import weakref
+from collections import deque
+
+from . import caching
+from ._lazy import aio, connector, pd
+from .connections import connection_identity_async, forget_pools, get_pool
+from .frames import frame_from_rows
+from .parsing import SQL_LITERAL, normalize_sql, select_list_end, tables_read, tables_written
+from .transactions import invalidate_tables
+from .views import GROUP_BY, scoped_query
+
+
+class AsyncConnectionPool:
+    def __init__(self, connect, max_size=10, max_idle_seconds=300, max_lifetime_seconds=3600, checkout_timeout=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque() # (raw connection, created at, returned at), most recently returned on the right
+        self._size = 0 # idle + checked out
+        self._closed = False
+        self._available = asyncio.Condition()
+
+    async def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            async with self._available:
+                if self._closed:
+                    raise connector.errors.PoolError("Connection pool is closed")
+                stale = self._evict_idle()
+                if self._idle:
+                    raw, created, _ = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    raw, created = None, time.monotonic()
+                else:
+                    try:
+                        await asyncio.wait_for(self._available.wait(), deadline - time.monotonic())
+                    except asyncio.TimeoutError:
+                        raise connector.errors.PoolError(f"No connection available after {self.checkout_timeout}s") from None
+                    continue
+            for old in stale:
+                await self._close_quietly(old)
+
+            if raw is None:
+                try:
+                    raw = await self._connect()
+                except BaseException:
+                    await self._forget()
+                    raise
+            elif self._expired(created) or not await self._is_healthy(raw):
+                await self._discard(raw)
+                continue
+            return AsyncPooledConnection(self, raw, created)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        # Usable as `async with pool.connection() as connection:`
+        connection = await self.checkout()
+        try:
+            yield connection
+        finally:
+            await connection.close()
+
+    async def checkin(self, raw, created):
+        if self._expired(created) or not await self._reset(raw):
+            await self._discard(raw)
+            return
+        async with self._available:
+            if self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((raw, created, time.monotonic()))
+                raw = None
+            self._available.notify()
+        if raw is not None:
+            await self._close_quietly(raw)
+
+    async def close(self):
+        async with self._available:
+            self._closed = True
+            idle = [raw for raw, _, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._available.notify_all()
+        for raw in idle:
+            await self._close_quietly(raw)
+
+    def stats(self):
+        return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle)}
+
+    def _evict_idle(self):
+        # Called with the condition held; returns the evicted connections so they are closed outside it
+        now = time.monotonic()
+        stale = []
+        while self._idle and now - self._idle[0][2] > self.max_idle_seconds:
+            stale.append(self._idle.popleft()[0])
+        self._size -= len(stale)
+        if stale:
+            self._available.notify_all()
+        return stale
+
+    def _expired(self, created):
+        return time.monotonic() - created > self.max_lifetime_seconds
+
+    async def _is_healthy(self, raw):
+        try:
+            return await raw.is_connected()
+        except connector.Error:
+            return False
+
+    async def _reset(self, raw):
+        try:
+            if raw.in_transaction:
+                await raw.rollback()
+            return True
+        except connector.Error:
+            return False
+
+    async def _discard(self, raw):
+        await self._close_quietly(raw)
+        await self._forget()
+
+    async def _forget(self):
+        async with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    @staticmethod
+    async def _close_quietly(raw):
+        try:
+            await raw.close()
+        except connector.Error:
+            pass
+
+
+class AsyncPooledConnection:
+    # Behaves like the underlying asyncio MySQL connection, but close() returns it to its pool
+    def __init__(self, pool, raw, created):
+        self._pool = pool
+        self._raw = raw
+        self._created = created
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise connector.errors.PoolError("Connection has already been returned to the pool")
+        return getattr(raw, name)
+
+    async def close(self):
+        raw, self._raw = self.__dict__.get("_raw"), None
+        if raw is not None:
+            await self._pool.checkin(raw, self._created)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+_async_pools = weakref.WeakKeyDictionary() # event loop -> {connection details: pool}
+
+def get_async_pool(host_name, user_name, user_password, db_name, connect_options=None, **pool_options):
+    connect_options = connect_options or {}
+    key = (host_name, user_name, user_password, db_name, tuple(sorted(connect_options.items())))
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(key)
+    if pool is None:
+        connect = functools.partial(
+            aio.connect,
+            host=host_name,
+            user=user_name,
+            password=user_password,
+            database=db_name,
+            **connect_options
+        )
+        pool = pools[key] = AsyncConnectionPool(connect, **pool_options)
+    return pool
+
+
+async def create_db_connection_async(host_name, user_name, user_password, db_name, **connect_options):
+    connection = None
+    try:
+        connection = await get_async_pool(host_name, user_name, user_password, db_name, connect_options).checkout()
+        print("MySQL Database connection successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+    return connection
+
+
+async def execute_query_async(connection, query, params=None):
+    cursor = await connection.cursor()
+    try:
+        await cursor.execute(query, params)
+        await connection.commit()
+        invalidate_tables(tables_written(query))
+        print("Query successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+    finally:
+        await cursor.close()
+
+
+async def read_query_async(connection, query, params=None):
+    cache = caching.result_cache
+    tables = tables_read(query) if cache is not None else None
+    if tables:
+        key = (await connection_identity_async(connection), normalize_sql(query), tuple(params) if params is not None else None)
+        result = cache.get(key)
+        if result is not None:
+            return result
+        versions = cache.versions(tables)
+    cursor = await connection.cursor()
+    try:
+        await cursor.execute(query, params)
+        result = await cursor.fetchall()
+        if tables:
+            cache.put(key, result, tables, versions)
+        return result
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+    finally:
+        await cursor.close()
+
+
+async def execute_list_query_async(connection, sql, val):
+    cursor = await connection.cursor()
+    try:
+        await cursor.executemany(sql, val)
+        await connection.commit()
+        invalidate_tables(tables_written(sql))
+        print("Query successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+    finally:
+        await cursor.close()
+
+
+async def read_queries_concurrently(pool, queries, concurrency=10):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(query):
+        query, params = (query, None) if isinstance(query, str) else query
+        async with limit:
+            async with pool.connection() as connection:
+                return await read_query_async(connection, query, params)
+
+    return await asyncio.gather(*(run(query) for query in queries))
+
+
+def key_partitions(low, high, partitions):
+    step = max(1, -(-(high - low + 1) // partitions))
+    return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+
+def read_partition(connection_details, query, params):
+    with get_pool(*connection_details).connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall(), cursor.description
+        finally:
+            cursor.close()
+
+
+def partition_rows(futures):
+    # One ordered stream of rows, handed out partition by partition as each one finishes
+    try:
+        for future in futures:
+            yield from future.result()[0]
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        raise
+    finally:
+        for future in futures:
+            future.cancel() # the partitions nobody will read, if the stream failed or was closed early
+
+
+def read_partitioned(host_name, user_name, user_password, db_name, query, key, partitions=8, workers=None,
+                     processes=False, bounds=None, as_frame=True):
+    connection_details = (host_name, user_name, user_password, db_name)
+    base = normalize_sql(query)
+    if re.search(r"\b(?:ORDER\s+BY|LIMIT)\b", SQL_LITERAL.sub("?", base), re.I):
+        raise ValueError("The query must not have its own ORDER BY or LIMIT")
+    # The key range goes into the query's WHERE clause, rather than wrapping the query in a derived table,
+    # which would fail on a SELECT * over a join with columns of the same name
+    futures = []
+    try:
+        if bounds is None:
+            group_by = GROUP_BY.search(base)
+            rows_read = base[select_list_end(base):group_by.start() if group_by else len(base)].strip()
+            bounds = read_partition(connection_details, f"SELECT MIN({key}), MAX({key}) {rows_read}", ())[0][0]
+        low, high = bounds
+        ranges = key_partitions(int(low), int(high), partitions) if low is not None else []
+        partition_query = f"{scoped_query(base, f'{key} >= %s AND {key} < %s')} ORDER BY {key}"
+
+        if processes:
+            # Forked workers start with copies of this process's pools, whose connections they mustn't share
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers or min(partitions, 8), initializer=forget_pools)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or min(partitions, 8))
+        futures = [executor.submit(read_partition, connection_details, partition_query, key_range) for key_range in ranges]
+        executor.shutdown(wait=False) # the partitions already submitted still run to completion
+        if not as_frame:
+            return partition_rows(futures)
+        results = [future.result() for future in futures]
+    except connector.Error as err:
+        for future in futures:
+            future.cancel()
+        print(f"Error: '{err}'")
+        return None
+
+    rows = [row for partition, _ in results for row in partition]
+    description = results[0][1] if results else None
+    return frame_from_rows(rows, description) if description else pd.DataFrame()
@@ -0,0 +1,283 @@
+"""Connecting to the server, with a pool of open connections per database."""
+
+import functools
+import re
+import threading
+import time
+from collections import deque
+
+from . import profiling
+from ._lazy import connector
+
+USE_DATABASE = re.compile(r"^\s*USE\s", re.I)
+
+
+def create_server_connection(host_name, user_name, user_password):
+    connection = None
+    try:
+        connection = connector.connect(
+            host=host_name,
+            user=user_name,
+            passwd=user_password
+        )
+        print("MySQL Database connection successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+    return connection
+
+
+def create_database(connection, query):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        print("Database created successfully")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=5, max_idle_seconds=300, max_lifetime_seconds=3600, checkout_timeout=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque() # (raw connection, created at, returned at), most recently returned on the right
+        self._size = 0 # idle + checked out
+        self._closed = False
+        self._lock = threading.Condition()
+
+    def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise connector.errors.PoolError("Connection pool is closed")
+                stale = self._evict_idle()
+                if self._idle:
+                    raw, created, _ = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    raw, created = None, time.monotonic()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise connector.errors.PoolError(f"No connection available after {self.checkout_timeout}s")
+                    self._lock.wait(remaining)
+                    continue
+            for old in stale:
+                self._close_quietly(old)
+
+            if raw is None:
+                try:
+                    raw = self._connect()
+                except BaseException:
+                    self._forget()
+                    raise
+            elif self._expired(created) or not self._is_healthy(raw):
+                self._discard(raw)
+                continue
+            return PooledConnection(self, raw, created)
+
+    def connection(self):
+        # Usable as `with pool.connection() as connection:`
+        return self.checkout()
+
+    def checkin(self, raw, created):
+        if self._expired(created) or not self._reset(raw):
+            self._discard(raw)
+            return
+        with self._lock:
+            if self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((raw, created, time.monotonic()))
+                raw = None
+            self._lock.notify()
+        if raw is not None:
+            self._close_quietly(raw)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle = [raw for raw, _, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for raw in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle)}
+
+    def _evict_idle(self):
+        # Called with the lock held; returns the evicted connections so they are closed outside it
+        now = time.monotonic()
+        stale = []
+        while self._idle and now - self._idle[0][2] > self.max_idle_seconds:
+            stale.append(self._idle.popleft()[0])
+        self._size -= len(stale)
+        if stale:
+            self._lock.notify_all()
+        return stale
+
+    def _expired(self, created):
+        return time.monotonic() - created > self.max_lifetime_seconds
+
+    def _is_healthy(self, raw):
+        try:
+            return raw.is_connected()
+        except connector.Error:
+            return False
+
+    def _reset(self, raw):
+        # Never hand out a connection with someone else's transaction still open
+        try:
+            if getattr(raw, "in_transaction", False):
+                raw.rollback()
+            return True
+        except connector.Error:
+            return False
+
+    def _discard(self, raw):
+        self._close_quietly(raw)
+        self._forget()
+
+    def _forget(self):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except connector.Error:
+            pass
+
+
+class PooledConnection:
+    # Behaves like the underlying MySQL connection, but close() returns it to its pool
+    wraps_connection = True
+
+    def __init__(self, pool, raw, created):
+        self._pool = pool
+        self._raw = raw
+        self._created = created
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise connector.errors.PoolError("Connection has already been returned to the pool")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self.__dict__.get("_raw"), None
+        if raw is not None:
+            self._pool.checkin(raw, self._created)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(host_name, user_name, user_password, db_name, connect_options=None, **pool_options):
+    connect_options = connect_options or {}
+    key = (host_name, user_name, user_password, db_name, tuple(sorted(connect_options.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            connect = functools.partial(
+                connector.connect,
+                host=host_name,
+                user=user_name,
+                passwd=user_password,
+                database=db_name,
+                **connect_options
+            )
+            pool = _pools[key] = ConnectionPool(connect, **pool_options)
+    return pool
+
+
+_inherited_pools = []
+
+def forget_pools():
+    # Run in a forked worker process. The pools it inherited hold the parent's sockets, so it mustn't use them; it
+    # mustn't close them either, as that would close them for the parent too, so they are only set aside
+    global _pools, _pools_lock
+    _inherited_pools.append(_pools)
+    _pools, _pools_lock = {}, threading.Lock()
+
+
+def create_db_connection(host_name, user_name, user_password, db_name, **connect_options):
+    connection = None
+    start = time.perf_counter()
+    try:
+        connection = get_pool(host_name, user_name, user_password, db_name, connect_options).checkout()
+        print("MySQL Database connection successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+    if profiling.profiler is not None:
+        profiling.profiler.record_connect(time.perf_counter() - start)
+    return connection
+
+
+def raw_connection(connection):
+    # Look through pooled connections, transactions and resilient connections for the connection underneath
+    while getattr(type(connection), "wraps_connection", False):
+        connection = connection._raw
+    return connection
+
+
+def connection_identity(connection):
+    # (host, port, current database) of the server behind the connection, looked up once, and again after a USE
+    raw = raw_connection(connection)
+    identity = getattr(raw, "_identity", None)
+    if identity is None:
+        try:
+            database = getattr(raw, "database", None) # a query, on a MySQL connection
+        except connector.Error:
+            return (getattr(raw, "server_host", None), getattr(raw, "server_port", None), None)
+        identity = raw._identity = (getattr(raw, "server_host", None), getattr(raw, "server_port", None), database)
+    return identity
+
+
+async def connection_identity_async(connection):
+    identity = getattr(connection, "_identity", None)
+    if identity is None:
+        try:
+            database = await connection.get_database() if hasattr(connection, "get_database") else getattr(connection, "database", None)
+        except connector.Error:
+            return (getattr(connection, "server_host", None), getattr(connection, "server_port", None), None)
+        identity = connection._identity = (getattr(connection, "server_host", None), getattr(connection, "server_port", None), database)
+    return identity
+
+
+def forget_identity(connection, query):
+    # Called for each statement run: after a USE, the connection's current database has to be looked up again
+    if USE_DATABASE.match(query):
+        raw_connection(connection).__dict__.pop("_identity", None)
+
+
+def close_cursor(cursor, unread=False, batch_size=1000):
+    # Discard whatever is left of an unbuffered result, so the connection can run its next query
+    try:
+        while unread and cursor.fetchmany(batch_size):
+            pass
+        cursor.close()
+    except connector.Error:
+        pass
@@ -0,0 +1,172 @@
+"""A columnar cache of read_query_df results on disk, in the Arrow IPC file format."""
+
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+
+from ._lazy import connector, pa
+from .parsing import normalize_sql, table_name
+
+
+class DiskCache:
+    def __init__(self, directory=".query_cache", max_bytes=2**30):
+        if not pa.available():
+            raise ImportError("The disk cache needs pyarrow: pip install pyarrow")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, query, params, checksums, options=None):
+        text = json.dumps([normalize_sql(query), [repr(param) for param in params or ()],
+                           sorted(checksums.items()), repr(options)])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".arrow")
+
+    def get(self, key, as_arrow=False):
+        path = self.path(key)
+        try:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            os.utime(path) # now the most recently used entry
+        except (FileNotFoundError, pa.ArrowInvalid):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return table if as_arrow else table.to_pandas(split_blocks=True)
+
+    def put(self, key, df, query, tables):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"query": normalize_sql(query).encode(),
+            b"tables": json.dumps(sorted(tables)).encode(),
+            b"rows": str(table.num_rows).encode(),
+        })
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+            temporary = file.name
+        with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".arrow"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                info = os.stat(path)
+                metadata = pa.ipc.open_file(pa.memory_map(path)).schema.metadata or {}
+            except (FileNotFoundError, pa.ArrowInvalid):
+                continue
+            entries.append({
+                "key": name[:-len(".arrow")],
+                "bytes": info.st_size,
+                "last_used": info.st_mtime,
+                "rows": int(metadata.get(b"rows", b"0")),
+                "tables": json.loads(metadata.get(b"tables", b"[]")),
+                "query": metadata.get(b"query", b"").decode(),
+            })
+        return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+    def remove(self, key):
+        try:
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(entry["bytes"] for entry in entries)
+        removed = 0
+        while entries and total > max_bytes:
+            entry = entries.pop() # the least recently used
+            if self.remove(entry["key"]):
+                total -= entry["bytes"]
+                removed += 1
+        return removed
+
+    def purge(self, older_than_seconds=None):
+        cutoff = time.time() - older_than_seconds if older_than_seconds is not None else math.inf
+        return sum(self.remove(entry["key"]) for entry in self.entries() if entry["last_used"] < cutoff)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry["bytes"] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def table_checksums(connection, tables):
+    # {table: checksum}, or None if any of them doesn't exist
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"CHECKSUM TABLE {', '.join(sorted(tables))};")
+        checksums = {table_name(table): checksum for table, checksum in cursor.fetchall()}
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+    finally:
+        cursor.close()
+    if None in checksums.values() or set(checksums) != set(tables):
+        return None
+    return checksums
+
+
+disk_cache = None
+
+def enable_disk_cache(directory=".query_cache", max_bytes=2**30):
+    global disk_cache
+    disk_cache = DiskCache(directory, max_bytes)
+    return disk_cache
+
+def disable_disk_cache():
+    global disk_cache
+    disk_cache = None
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--dir", default=".query_cache", help="cache directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="cache_command", required=True)
+    commands.add_parser("list", help="list entries, most recently used first")
+    commands.add_parser("stats", help="show the number and total size of entries")
+    purge = commands.add_parser("purge", help="remove entries (all of them, unless limited by an option)")
+    purge.add_argument("--older-than", type=float, metavar="HOURS", help="only entries not used for this many hours")
+    purge.add_argument("--max-bytes", type=int, help="remove least recently used entries until the cache fits in this size")
+
+
+def run_cache_command(args):
+    cache = DiskCache(args.dir, max_bytes=math.inf)
+    if args.cache_command == "list":
+        for entry in cache.entries():
+            last_used = datetime.datetime.fromtimestamp(entry["last_used"]).strftime("%Y-%m-%d %H:%M")
+            print(f"{entry['key'][:12]}  {entry['bytes'] / 2**20:8.2f} MiB  {entry['rows']:>10,} rows  {last_used}  {entry['query'][:60]}")
+    elif args.cache_command == "stats":
+        stats = cache.stats()
+        print(f"{stats['entries']:,} entries, {stats['bytes'] / 2**20:.2f} MiB in {args.dir}")
+    elif args.max_bytes is not None:
+        print(f"Removed {cache.evict(args.max_bytes):,} entries")
+    else:
+        older_than = args.older_than * 3600 if args.older_than is not None else None
+        print(f"Removed {cache.purge(older_than):,} entries")
+
+
+def disk_cache_cli(argv=None):
+    parser = argparse.ArgumentParser(prog="query-cache", description="Inspect and purge the on-disk query result cache.")
+    add_cache_arguments(parser)
+    run_cache_command(parser.parse_args(argv))
@@ -0,0 +1,172 @@
+"""Query results as typed pandas DataFrames, whole or in chunks, and aggregations over chunks."""
+
+import functools
+
+from . import diskcache
+from ._lazy import connector, pa, pd
+from .connections import close_cursor
+from .diskcache import table_checksums
+from .parsing import tables_read
+from .views import routes_to_views
+
+BINARY_CHARSET = 63 # the charset id of BINARY, VARBINARY and BLOB columns
+
+
+@functools.cache
+def field_types():
+    # (integer dtypes, float dtypes, datetime types, string types) by the connector's FieldType codes
+    FieldType = connector.FieldType
+    integer_dtypes = {
+        FieldType.TINY: "Int8",
+        FieldType.SHORT: "Int16",
+        FieldType.INT24: "Int32",
+        FieldType.LONG: "Int32",
+        FieldType.LONGLONG: "Int64",
+        FieldType.YEAR: "Int16",
+    }
+    float_dtypes = {
+        FieldType.FLOAT: "float32",
+        FieldType.DOUBLE: "float64",
+        FieldType.DECIMAL: "Float64",
+        FieldType.NEWDECIMAL: "Float64",
+    }
+    datetime_types = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+    string_types = {FieldType.VARCHAR, FieldType.VAR_STRING, FieldType.STRING, FieldType.ENUM}
+    return integer_dtypes, float_dtypes, datetime_types, string_types
+
+
+def column_dtype(field_type, flags, values, category_threshold=0.5):
+    integer_dtypes, float_dtypes, datetime_types, string_types = field_types()
+    if field_type in integer_dtypes:
+        if field_type == connector.FieldType.TINY and all(value in (0, 1, None) for value in values):
+            return "boolean"
+        dtype = integer_dtypes[field_type]
+        return "U" + dtype if flags & connector.FieldFlag.UNSIGNED else dtype
+    if field_type in float_dtypes:
+        return float_dtypes[field_type]
+    if field_type in datetime_types:
+        return "datetime64[ns]"
+    if field_type in string_types:
+        if values and len(set(values)) <= category_threshold * len(values):
+            return "category"
+        return "string"
+    return "object"
+
+
+def frame_from_rows(rows, description, dtypes=None, category_threshold=0.5):
+    names = [column[0] for column in description]
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    dtypes = dtypes or {}
+    data = {}
+    for name, column, values in zip(names, description, columns):
+        flags = column[7] if len(column) > 7 else 0
+        dtype = dtypes.get(name) or column_dtype(column[1], flags, values, category_threshold)
+        if dtype == "datetime64[ns]":
+            data[name] = pd.to_datetime(pd.Series(values, dtype=object)).astype(dtype)
+        else:
+            data[name] = pd.Series(values, dtype=dtype)
+    return pd.DataFrame(data, columns=names)
+
+
+def read_query_df(connection, query, dtypes=None, category_threshold=0.5, params=None, as_arrow=False):
+    cache = diskcache.disk_cache
+    key = None
+    tables = tables_read(query) if cache is not None else None
+    if tables:
+        checksums = table_checksums(connection, tables)
+        if checksums:
+            key = cache.key(query, params, checksums, (dtypes, category_threshold))
+            cached = cache.get(key, as_arrow)
+            if cached is not None:
+                return cached
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        df = frame_from_rows(cursor.fetchall(), cursor.description, dtypes, category_threshold)
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+    finally:
+        cursor.close()
+
+    if key is not None:
+        cache.put(key, df, query, tables)
+    return pa.Table.from_pandas(df, preserve_index=False) if as_arrow else df
+
+
+read_query_df = routes_to_views(read_query_df)
+
+
+def chunk_dtypes(chunk, description):
+    # The dtypes to read every later chunk with: a TINYINT which only held 0 and 1 so far may hold 2 in the next chunk
+    dtypes = {}
+    for (name, dtype), column in zip(chunk.dtypes.items(), description):
+        if dtype == "boolean" and column[1] == connector.FieldType.TINY:
+            flags = column[7] if len(column) > 7 else 0
+            dtype = "UInt8" if flags & connector.FieldFlag.UNSIGNED else "Int8"
+        dtypes[name] = str(dtype)
+    return dtypes
+
+
+def read_query_chunks(connection, query, chunksize=10000, dtypes=None, category_threshold=0.5):
+    cursor = connection.cursor(buffered=False)
+    unread = False
+    categories = {} # column -> the categories of the chunks so far
+    try:
+        cursor.execute(query)
+        unread = True
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                unread = False
+                break
+            chunk = frame_from_rows(rows, cursor.description, dtypes, category_threshold)
+            if dtypes is None or len(dtypes) < len(chunk.columns):
+                dtypes = {**chunk_dtypes(chunk, cursor.description), **(dtypes or {})}
+                chunk = chunk.astype({name: dtypes[name] for name, dtype in chunk.dtypes.items() if str(dtype) != dtypes[name]})
+            for name, dtype in chunk.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype):
+                    # Every chunk's categories extend the ones before, so each value keeps its code
+                    seen = categories.get(name, dtype.categories[:0])
+                    categories[name] = seen.append(dtype.categories.difference(seen, sort=False))
+                    chunk[name] = chunk[name].cat.set_categories(categories[name])
+            yield chunk
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        raise # a result cut short mustn't pass for the whole of it
+    finally:
+        close_cursor(cursor, unread, chunksize)
+
+
+PARTIAL_AGGREGATES = {"sum": ["sum"], "count": ["count"], "min": ["min"], "max": ["max"], "mean": ["sum", "count"]}
+
+COMBINE_PARTIALS = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def aggregate_chunks(chunks, aggregations, by=None):
+    needed = {}
+    for column, function in aggregations.values():
+        for partial in PARTIAL_AGGREGATES[function]:
+            needed[f"{column}__{partial}"] = (column, partial)
+
+    partials = []
+    for chunk in chunks:
+        grouped = chunk.groupby(by if by is not None else (lambda _: 0), observed=True, dropna=False)
+        partials.append(grouped.agg(**needed))
+    if not partials:
+        return pd.DataFrame(columns=list(aggregations))
+
+    combined = pd.concat(partials)
+    levels = list(range(combined.index.nlevels))
+    combined = combined.groupby(level=levels, dropna=False).agg(
+        {name: COMBINE_PARTIALS[partial] for name, (_, partial) in needed.items()}
+    )
+
+    result = pd.DataFrame(index=combined.index)
+    for name, (column, function) in aggregations.items():
+        if function == "mean":
+            result[name] = combined[f"{column}__sum"] / combined[f"{column}__count"]
+        else:
+            result[name] = combined[f"{column}__{function}"]
+    return result if by is not None else result.iloc[0]
@@ -0,0 +1,162 @@
+"""Incremental extracts: reading only new rows past a saved high-water mark, and reconciling deletions."""
+
+import base64
+import datetime
+import decimal
+import json
+import os
+import tempfile
+import zlib
+
+from ._lazy import connector, pd
+from .frames import frame_from_rows
+
+
+class ExtractState:
+    def __init__(self, path="extract_state.json"):
+        self.path = path
+        try:
+            with open(path) as file:
+                self.tables = json.load(file)
+        except FileNotFoundError:
+            self.tables = {}
+
+    def get(self, table):
+        return self.tables.get(table, {})
+
+    def set(self, table, **values):
+        self.tables.setdefault(table, {}).update(values)
+        # Write to a temporary file and rename it, so a crash never leaves a half-written state file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as file:
+            json.dump(self.tables, file, indent=2)
+        os.replace(file.name, self.path)
+
+
+def to_state(value):
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, datetime.timedelta): # TIME columns
+        return {"timedelta": value // datetime.timedelta(microseconds=1)}
+    if isinstance(value, decimal.Decimal):
+        return {"decimal": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"bytes": base64.b64encode(value).decode()}
+    return value
+
+
+def from_state(value):
+    if isinstance(value, dict):
+        if "datetime" in value:
+            return datetime.datetime.fromisoformat(value["datetime"])
+        if "date" in value:
+            return datetime.date.fromisoformat(value["date"])
+        if "decimal" in value:
+            return decimal.Decimal(value["decimal"])
+        if "timedelta" in value:
+            return datetime.timedelta(microseconds=value["timedelta"])
+        if "bytes" in value:
+            return base64.b64decode(value["bytes"], validate=True)
+    return value
+
+
+def read_incremental(connection, table, column, state, key=None, columns="*"):
+    # key is only needed when column is not unique, e.g. an updated_at column; columns must include column and key
+    saved = state.get(table)
+    mark = from_state(saved.get("mark"))
+    seen_at_mark = {json.dumps(value) for value in saved.get("keys_at_mark", [])} if key else set()
+    query = f"SELECT {columns} FROM {table}"
+    params = None
+    if mark is not None:
+        query += f" WHERE {column} {'>=' if key else '>'} %s"
+        params = (mark,)
+    query += f" ORDER BY {column};"
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        description = cursor.description
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+    finally:
+        cursor.close()
+
+    names = [field[0] for field in description]
+    position = names.index(column)
+    if key:
+        key_position = names.index(key)
+        rows = [row for row in rows if not (row[position] == mark and json.dumps(to_state(row[key_position])) in seen_at_mark)]
+    if rows:
+        new_mark = rows[-1][position]
+        keys_at_mark = [to_state(row[key_position]) for row in rows if row[position] == new_mark] if key else []
+        if new_mark == mark:
+            keys_at_mark += list(saved.get("keys_at_mark", []))
+        state.set(table, column=column, mark=to_state(new_mark), keys_at_mark=keys_at_mark)
+    print(f"Read {len(rows):,} new rows from {table}")
+    return frame_from_rows(rows, description)
+
+
+def key_checksums(keys, chunk_size):
+    checksums = {}
+    for key in keys:
+        key = int(key)
+        count, checksum = checksums.get(key // chunk_size, (0, 0))
+        checksums[key // chunk_size] = (count + 1, checksum ^ zlib.crc32(str(key).encode()))
+    return checksums
+
+
+def reconcile_deletes(connection, table, key, local_keys, chunk_size=10000):
+    # Returns the keys which are in local_keys but no longer in the table
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"SELECT FLOOR({key} / %s), COUNT(*), BIT_XOR(CRC32({key})) FROM {table} GROUP BY 1;",
+            (chunk_size,)
+        )
+        remote = {int(chunk): (int(count), int(checksum)) for chunk, count, checksum in cursor.fetchall()}
+        local_keys = {int(local_key) for local_key in local_keys}
+        local = key_checksums(local_keys, chunk_size)
+
+        deleted = set()
+        differing = [chunk for chunk in local if local[chunk] != remote.get(chunk)]
+        for chunk in differing:
+            cursor.execute(
+                f"SELECT {key} FROM {table} WHERE {key} >= %s AND {key} < %s;",
+                (chunk * chunk_size, (chunk + 1) * chunk_size)
+            )
+            remote_keys = {int(row[0]) for row in cursor.fetchall()}
+            deleted.update(local_key for local_key in local_keys
+                           if local_key // chunk_size == chunk and local_key not in remote_keys)
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+    finally:
+        cursor.close()
+
+    print(f"Checked {len(local):,} chunks of {table}, read {len(differing):,} in full, found {len(deleted):,} deleted rows")
+    return deleted
+
+
+def sync_table(connection, table, key, state, local=None, column=None, reconcile_every=10, chunk_size=10000):
+    # Brings the local DataFrame up to date with the table; column defaults to the primary key
+    column = column or key
+    new_rows = read_incremental(connection, table, column, state, key=key if column != key else None)
+    if new_rows is None:
+        return local
+    if local is None:
+        local = new_rows
+    elif len(new_rows):
+        local = pd.concat([local[~local[key].isin(new_rows[key])], new_rows], ignore_index=True)
+
+    runs = state.get(table).get("runs", 0) + 1
+    if runs >= reconcile_every:
+        deleted = reconcile_deletes(connection, table, key, local[key], chunk_size)
+        if deleted is not None:
+            local = local[~local[key].isin(deleted)].reset_index(drop=True)
+            runs = 0
+    state.set(table, runs=runs)
+    return local
@@ -0,0 +1,179 @@
+"""Reading query plans, and suggesting (and optionally creating) the indexes they are missing."""
+
+import json
+import re
+import statistics
+import time
+
+from ._lazy import connector, pd
+from .parsing import FROM_CLAUSE, SQL_LITERAL, query_fingerprint, table_name
+from .queries import execute_query, read_query
+from .statements import run_statement
+
+
+def explain_query(connection, query, params=None):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("EXPLAIN FORMAT=JSON " + query.strip().rstrip(";"), params)
+        return json.loads(cursor.fetchall()[0][0])
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+    finally:
+        cursor.close()
+
+
+def plan_tables(node, filesort=False):
+    # Every table access in a plan, along with whether its rows end up going through a filesort
+    if isinstance(node, dict):
+        filesort = filesort or node.get("using_filesort", False)
+        table = node.get("table")
+        if isinstance(table, dict) and "table_name" in table:
+            yield table, filesort
+        for value in node.values():
+            yield from plan_tables(value, filesort)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_tables(item, filesort)
+
+
+def plan_problems(plan):
+    problems = []
+    for table, filesort in plan_tables(plan):
+        full_scan = table.get("access_type") == "ALL"
+        if full_scan or filesort:
+            problems.append({
+                "alias": table["table_name"],
+                "access_type": table.get("access_type"),
+                "rows_examined": table.get("rows_examined_per_scan"),
+                "full_scan": full_scan,
+                "filesort": bool(filesort),
+                "used_columns": table.get("used_columns", []),
+            })
+    return problems
+
+
+WHERE_CLAUSE = re.compile(r"\bWHERE\b(.*?)(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bHAVING\b|$)", re.I | re.S)
+ORDER_BY_CLAUSE = re.compile(r"\bORDER\s+BY\b(.*?)(?=\bLIMIT\b|$)", re.I | re.S)
+ON_CLAUSE = re.compile(r"\bON\b(.*?)(?=\b(?:WHERE|GROUP|ORDER|LIMIT|JOIN|INNER|LEFT|RIGHT|CROSS)\b|$)", re.I | re.S)
+EQUALITY = re.compile(r"([`\w.]+)\s*(?:=|<=>)\s*(?:\?|%s|-?\d|TRUE\b|FALSE\b|NULL\b)|([`\w.]+)\s+(?:IN\s*\(|IS\s+NULL\b)", re.I)
+RANGE = re.compile(r"([`\w.]+)\s*(?:<=|>=|<>|!=|<|>|\bBETWEEN\b|\bLIKE\s+\?)", re.I)
+JOIN_PAIR = re.compile(r"([`\w]+\.[`\w]+)\s*=\s*([`\w]+\.[`\w]+)")
+
+
+def query_shape(sql):
+    # Which tables a query reads (by alias), and how it filters, joins and sorts them
+    sql = SQL_LITERAL.sub("?", sql)
+    aliases = {}
+    for clause in FROM_CLAUSE.findall(sql):
+        for source in clause.split(","):
+            words = [word for word in source.split() if word.upper() != "AS"]
+            if words:
+                aliases[words[-1].strip("`")] = table_name(words[0])
+    where = WHERE_CLAUSE.search(sql)
+    where = where.group(1) if where else ""
+    order_by = ORDER_BY_CLAUSE.search(sql)
+    order_by = [item.split()[0] for item in order_by.group(1).split(",") if item.split()] if order_by else []
+    return {
+        "aliases": aliases,
+        "equality": [left or right for left, right in EQUALITY.findall(where)],
+        "range": [column for column in RANGE.findall(where)],
+        "order_by": order_by,
+        "joins": [pair for on in ON_CLAUSE.findall(sql) for pair in JOIN_PAIR.findall(on)],
+    }
+
+
+def column_alias(column, shape, used_columns):
+    # Work out which table (alias) a column reference belongs to
+    if "." in column:
+        return column.split(".")[0].strip("`")
+    owners = [alias for alias, columns in used_columns.items() if column.strip("`") in columns]
+    if len(owners) == 1:
+        return owners[0]
+    return next(iter(shape["aliases"])) if len(shape["aliases"]) == 1 else None
+
+
+def bare_column(column):
+    return column.split(".")[-1].strip("`")
+
+
+def recommend_index(alias, shape, used_columns):
+    def on_alias(columns):
+        return [bare_column(column) for column in columns if column_alias(column, shape, used_columns) == alias]
+
+    columns = on_alias(shape["equality"])
+    for left, right in shape["joins"]:
+        for mine, theirs in [(left, right), (right, left)]:
+            if column_alias(mine, shape, used_columns) == alias and column_alias(theirs, shape, used_columns) != alias:
+                columns.append(bare_column(mine))
+    ranges = on_alias(shape["range"])
+    sort = on_alias(shape["order_by"])
+    if ranges:
+        columns.append(ranges[0])
+    elif sort and len(sort) == len(shape["order_by"]):
+        columns.extend(sort)
+    return list(dict.fromkeys(columns)) # drop repeats, keep the order
+
+
+def existing_indexes(connection, table):
+    rows = read_query(connection, """
+        SELECT index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index;
+    """, (table,)) or []
+    indexes = {}
+    for index_name, column_name in rows:
+        indexes.setdefault(index_name, []).append(column_name.lower())
+    return list(indexes.values())
+
+
+def index_name(table, columns):
+    return f"idx_{table}_{'_'.join(columns)}"[:64] # MySQL's limit on identifier length
+
+
+def time_query(connection, query, params=None, runs=20):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_statement(connection, query, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def advise_indexes(connection, queries, apply=False, runs=20):
+    advice = []
+    for query in queries:
+        query, params = (query, None) if isinstance(query, str) else query
+        plan = explain_query(connection, query, params)
+        if plan is None:
+            continue
+        shape = query_shape(query)
+        used_columns = {table["table_name"]: table.get("used_columns", []) for table, _ in plan_tables(plan)}
+        for problem in plan_problems(plan):
+            table = shape["aliases"].get(problem["alias"], problem["alias"])
+            columns = recommend_index(problem["alias"], shape, used_columns)
+            covered = any(index[:len(columns)] == [column.lower() for column in columns]
+                          for index in existing_indexes(connection, table))
+            create_index = f"CREATE INDEX {index_name(table, columns)} ON {table} ({', '.join(columns)});"
+            advice.append({
+                "query": query_fingerprint(query),
+                "table": table,
+                "problem": " + ".join(name for name, found in [("full scan", problem["full_scan"]), ("filesort", problem["filesort"])] if found),
+                "rows_examined": problem["rows_examined"],
+                "index": f"{table}({', '.join(columns)})" if columns and not covered else None,
+                "create_index": create_index if columns and not covered else None,
+                "sql": query,
+                "params": params,
+            })
+    advice = pd.DataFrame(advice)
+    if not apply or advice.empty:
+        return advice
+
+    queries_to_time = advice.drop_duplicates("sql")
+    before = {row.sql: time_query(connection, row.sql, row.params, runs) for row in queries_to_time.itertuples()}
+    for create_index in advice["create_index"].dropna().unique():
+        execute_query(connection, create_index)
+    after = {row.sql: time_query(connection, row.sql, row.params, runs) for row in queries_to_time.itertuples()}
+    advice["before_ms"] = advice["sql"].map(before) * 1000
+    advice["after_ms"] = advice["sql"].map(after) * 1000
+    return advice
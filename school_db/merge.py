@@ -0,0 +1,218 @@
+"""Merging a DataFrame into a table, sending only the rows that changed."""
+
+import datetime
+import decimal
+import contextlib
+import hashlib
+import time
+import zlib
+
+from ._lazy import connector, pd
+from .bulk import packet_batches
+from .connections import close_cursor
+from .frames import BINARY_CHARSET
+from .parsing import table_name
+from .queries import max_allowed_packet
+from .transactions import Transaction, invalidate_tables
+
+SEPARATOR = "\x1f"
+NULL_TEXT = "\\N"
+
+
+def canonical_value(value):
+    # A text form of the value which is the same whether it came from MySQL or from pandas
+    if value is None or (not isinstance(value, (str, bytes)) and pd.isna(value)):
+        return NULL_TEXT
+    if pd.api.types.is_bool(value):
+        return "1" if value else "0"
+    if pd.api.types.is_integer(value):
+        return str(int(value))
+    if pd.api.types.is_float(value) or isinstance(value, decimal.Decimal):
+        return format(decimal.Decimal(str(value)).normalize(), "f")
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def row_text(row):
+    return SEPARATOR.join(canonical_value(value) for value in row)
+
+
+def row_hash(row):
+    return hashlib.blake2b(row_text(row).encode(), digest_size=16).digest()
+
+
+def python_value(value):
+    # The connector can't send numpy scalars or pandas missing values
+    if value is None or (not isinstance(value, (str, bytes)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def column_text(name, field_type, charset=None):
+    # SQL for the column's value in the text form canonical_value gives it, where MySQL's own form differs
+    FieldType = connector.FieldType
+    if field_type in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        return f"IF(LOCATE('.', {name}), TRIM(TRAILING '.' FROM TRIM(TRAILING '0' FROM {name})), {name})"
+    if field_type in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return f"IF(TIME({name}) = '00:00:00', DATE({name}), {name})"
+    if charset == BINARY_CHARSET and field_type in (FieldType.STRING, FieldType.VAR_STRING, FieldType.TINY_BLOB,
+                                                    FieldType.BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB):
+        return f"LOWER(HEX({name}))"
+    return name
+
+
+def chunk_checksums(connection, table, key, columns, chunks):
+    # ({chunk: (rows, BIT_XOR of the CRC32 of each row's text)}, the SQL for a row's chunk, its parameters),
+    # where a row's chunk is the CRC32 of its key's text modulo chunks. A value MySQL writes differently from
+    # canonical_value (say, a DOUBLE in exponent form) only makes its chunk look changed, and be read in full.
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} LIMIT 0;")
+        cursor.fetchall()
+        texts = {column: column_text(column, field[1], field[8] if len(field) > 8 else None)
+                 for column, field in zip(columns, cursor.description)}
+
+        def text_of(names):
+            return f"CONCAT_WS(%s, {', '.join(f'COALESCE({texts[name]}, %s)' for name in names)})", [SEPARATOR] + [NULL_TEXT] * len(names)
+
+        key_sql, key_params = text_of(key)
+        row_sql, row_params = text_of(columns)
+        cursor.execute(
+            f"SELECT MOD(CRC32({key_sql}), %s) AS chunk, COUNT(*), BIT_XOR(CRC32({row_sql})) FROM {table} GROUP BY chunk;",
+            key_params + [chunks] + row_params
+        )
+        checksums = {int(chunk): (int(count), int(checksum)) for chunk, count, checksum in cursor.fetchall()}
+    finally:
+        cursor.close()
+    return checksums, f"MOD(CRC32({key_sql}), %s)", key_params + [chunks]
+
+
+def table_hashes(connection, table, key, columns, where=None, params=None, batch_size=10000):
+    # {canonical key: (key, hash of the row)} for every row in the table matching where; unlike stream_query, errors are raised, since a partial read would look like missing rows
+    cursor = connection.cursor(buffered=False)
+    unread = False
+    hashes = {}
+    try:
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table}{f' WHERE {where}' if where else ''};", params)
+        unread = True
+        key_positions = [columns.index(column) for column in key]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                unread = False
+                break
+            for row in rows:
+                row_key = tuple(row[i] for i in key_positions)
+                hashes[tuple(canonical_value(value) for value in row_key)] = (row_key, row_hash(row))
+    finally:
+        close_cursor(cursor, unread, batch_size)
+    return hashes
+
+
+def merge_frame(connection, table, df, key, delete_missing=False, packet_bytes=None, delete_batch=1000, chunk_size=10):
+    key = [key] if isinstance(key, str) else list(key)
+    columns = list(df.columns)
+    missing_key = [column for column in key if column not in columns]
+    if missing_key:
+        raise ValueError(f"The DataFrame has no {', '.join(missing_key)} column")
+    key_positions = [columns.index(column) for column in key]
+    start = time.perf_counter()
+
+    # Checksum the DataFrame's rows in chunks, the way chunk_checksums has the server checksum the table's
+    chunks = max(1, -(-len(df) // chunk_size))
+    local, local_keys = {}, []
+    for row in df.itertuples(index=False, name=None):
+        row_key = tuple(canonical_value(row[i]) for i in key_positions)
+        chunk = zlib.crc32(SEPARATOR.join(row_key).encode()) % chunks
+        count, checksum = local.get(chunk, (0, 0))
+        local[chunk] = (count + 1, checksum ^ zlib.crc32(row_text(row).encode()))
+        local_keys.append((row_key, chunk))
+
+    try:
+        remote, chunk_of, chunk_params = chunk_checksums(connection, table, key, columns, chunks)
+        differing = {chunk for chunk, checksum in local.items() if remote.get(chunk) != checksum}
+        if delete_missing:
+            differing.update(set(remote) - set(local))
+        current = {}
+        if differing:
+            placeholders = ", ".join(["%s"] * len(differing))
+            current = table_hashes(connection, table, key, columns, f"{chunk_of} IN ({placeholders})", chunk_params + sorted(differing))
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+
+    changed, seen = [], set()
+    inserted = updated = unchanged = 0
+    for row, (row_key, chunk) in zip(df.itertuples(index=False, name=None), local_keys):
+        seen.add(row_key)
+        old_key, old_hash = current.get(row_key, (None, None))
+        if chunk not in differing or old_hash == row_hash(row):
+            unchanged += 1
+            continue
+        if old_hash is None:
+            inserted += 1
+        else:
+            updated += 1
+        changed.append([python_value(value) for value in row])
+    removed = [old_key for row_key, (old_key, _) in current.items() if row_key not in seen] if delete_missing else []
+
+    packet_bytes = packet_bytes or max_allowed_packet(connection)
+    updates = ", ".join(f"{column} = VALUES({column})" for column in columns if column not in key)
+    # With every column in the key there is nothing to update, only rows to insert
+    prefix = f"INSERT {'' if updates else 'IGNORE '}INTO {table} ({', '.join(columns)}) VALUES "
+    suffix = f" ON DUPLICATE KEY UPDATE {updates}" if updates else ""
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    key_placeholders = "(" + ", ".join(["%s"] * len(key)) + ")" if len(key) > 1 else "%s"
+    key_list = f"({', '.join(key)})" if len(key) > 1 else key[0]
+
+    cursor = connection.cursor()
+    statements = 0
+    # Inside a transaction, a failure only undoes this merge's statements: the rest of the transaction is up to its owner
+    in_transaction = isinstance(connection, Transaction)
+    try:
+        with connection.savepoint() if in_transaction else contextlib.nullcontext():
+            for batch in packet_batches(changed, int(packet_bytes * 0.9) - len(prefix) - len(suffix)):
+                cursor.execute(prefix + ", ".join([placeholders] * len(batch)) + suffix, [value for row in batch for value in row])
+                statements += 1
+            for i in range(0, len(removed), delete_batch):
+                batch = removed[i:i + delete_batch]
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {key_list} IN ({', '.join([key_placeholders] * len(batch))});",
+                    [value for row_key in batch for value in row_key]
+                )
+                statements += 1
+            connection.commit()
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        if in_transaction:
+            raise
+        try:
+            connection.rollback()
+        except connector.Error:
+            pass
+        return None
+    finally:
+        cursor.close()
+        invalidate_tables({table_name(table)})
+
+    stats = {
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": len(removed),
+        "unchanged": unchanged,
+        "rows_read": len(current),
+        "statements": statements,
+        "seconds": time.perf_counter() - start,
+    }
+    print(f"Merged into {table}: {inserted:,} inserted, {updated:,} updated, {len(removed):,} deleted, "
+          f"{unchanged:,} unchanged, in {statements:,} statements")
+    return stats
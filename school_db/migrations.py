@@ -0,0 +1,183 @@
+"""The school schema as numbered migrations, applied once each and recorded in a schema_migrations table."""
+
+import hashlib
+
+from ._lazy import connector
+
+
+create_teacher_table = """
+CREATE TABLE teacher (
+  teacher_id INT PRIMARY KEY,
+  first_name VARCHAR(40) NOT NULL,
+  last_name VARCHAR(40) NOT NULL,
+  language_1 VARCHAR(3) NOT NULL,
+  language_2 VARCHAR(3),
+  dob DATE,
+  tax_id INT UNIQUE,
+  phone_no VARCHAR(20)
+  );
+ """
+
+create_client_table = """
+CREATE TABLE client (
+  client_id INT PRIMARY KEY,
+  client_name VARCHAR(40) NOT NULL,
+  address VARCHAR(60) NOT NULL,
+  industry VARCHAR(20)
+);
+ """
+
+create_participant_table = """
+CREATE TABLE participant (
+  participant_id INT PRIMARY KEY,
+  first_name VARCHAR(40) NOT NULL,
+  last_name VARCHAR(40) NOT NULL,
+  phone_no VARCHAR(20),
+  client INT
+);
+"""
+
+create_course_table = """
+CREATE TABLE course (
+  course_id INT PRIMARY KEY,
+  course_name VARCHAR(40) NOT NULL,
+  language VARCHAR(3) NOT NULL,
+  level VARCHAR(2),
+  course_length_weeks INT,
+  start_date DATE,
+  in_school BOOLEAN,
+  teacher INT,
+  client INT
+);
+"""
+
+alter_participant = """
+ALTER TABLE participant
+ADD FOREIGN KEY(client)
+REFERENCES client(client_id)
+ON DELETE SET NULL;
+"""
+
+alter_course = """
+ALTER TABLE course
+ADD FOREIGN KEY(teacher)
+REFERENCES teacher(teacher_id)
+ON DELETE SET NULL;
+"""
+
+alter_course_again = """
+ALTER TABLE course
+ADD FOREIGN KEY(client)
+REFERENCES client(client_id)
+ON DELETE SET NULL;
+"""
+
+create_takescourse_table = """
+CREATE TABLE takes_course (
+  participant_id INT,
+  course_id INT,
+  PRIMARY KEY(participant_id, course_id),
+  FOREIGN KEY(participant_id) REFERENCES participant(participant_id) ON DELETE CASCADE, -- it makes no sense to keep this rtelation when a participant or course is no longer in the system, hence why CASCADE this time
+  FOREIGN KEY(course_id) REFERENCES course(course_id) ON DELETE CASCADE
+);
+"""
+
+
+class Migration:
+    def __init__(self, version, name, sql, table, foreign_key=None):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.table = table
+        self.foreign_key = foreign_key # (column, referenced table), for ALTER TABLE ... ADD FOREIGN KEY migrations
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(" ".join(self.sql.split()).encode()).hexdigest()
+
+    def applied(self, existing):
+        # existing is the set of (table, column, referenced table) read from information_schema, with tables as (table, None, None)
+        if self.foreign_key is None:
+            return (self.table, None, None) in existing
+        return (self.table, *self.foreign_key) in existing
+
+
+MIGRATIONS = [
+    Migration(1, "create teacher", create_teacher_table, "teacher"),
+    Migration(2, "create client", create_client_table, "client"),
+    Migration(3, "create participant", create_participant_table, "participant"),
+    Migration(4, "create course", create_course_table, "course"),
+    Migration(5, "participant.client references client", alter_participant, "participant", ("client", "client")),
+    Migration(6, "course.teacher references teacher", alter_course, "course", ("teacher", "teacher")),
+    Migration(7, "course.client references client", alter_course_again, "course", ("client", "client")),
+    Migration(8, "create takes_course", create_takescourse_table, "takes_course"),
+]
+
+create_migrations_table = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INT PRIMARY KEY,
+  name VARCHAR(100) NOT NULL,
+  checksum CHAR(64) NOT NULL,
+  applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+existing_schema_query = """
+SELECT TABLE_NAME, NULL, NULL
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = DATABASE()
+UNION ALL
+SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME
+FROM information_schema.KEY_COLUMN_USAGE
+WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL;
+"""
+
+
+def applied_migrations(connection):
+    # {version: checksum}, or None if the database has never been migrated
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT version, checksum FROM schema_migrations;")
+        return dict(cursor.fetchall())
+    except connector.Error as err:
+        if err.errno == connector.errorcode.ER_NO_SUCH_TABLE:
+            return None
+        raise
+    finally:
+        cursor.close()
+
+
+def migrate(connection, migrations=MIGRATIONS):
+    applied = applied_migrations(connection)
+    for migration in migrations:
+        if applied and migration.version in applied and applied[migration.version] != migration.checksum:
+            print(f"Warning: migration {migration.version} ({migration.name}) has changed since it was applied")
+    pending = [migration for migration in migrations if migration.version not in (applied or {})]
+    if not pending:
+        print("Schema is up to date")
+        return []
+
+    cursor = connection.cursor()
+    try:
+        if applied is None:
+            cursor.execute(create_migrations_table)
+        cursor.execute(existing_schema_query)
+        existing = set(cursor.fetchall())
+        for migration in sorted(pending, key=lambda migration: migration.version):
+            if migration.applied(existing):
+                print(f"Migration {migration.version} ({migration.name}) already present, recording it")
+            else:
+                try:
+                    cursor.execute(migration.sql)
+                except connector.Error as err:
+                    print(f"Error: migration {migration.version} ({migration.name}) failed: '{err}'")
+                    raise
+                print(f"Migration {migration.version} ({migration.name}) applied")
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+                (migration.version, migration.name, migration.checksum)
+            )
+            connection.commit()
+    finally:
+        cursor.close()
+    return pending
@@ -0,0 +1,103 @@
+"""Keyset pagination over any SELECT, with opaque page tokens."""
+
+import base64
+import hashlib
+import json
+import re
+
+from .incremental import from_state, to_state
+from .parsing import SQL_LITERAL, identifier, normalize_sql, select_list_end
+from .queries import read_query
+from .views import scoped_query
+
+
+class KeysetPaginator:
+    def __init__(self, connection, query, order_by, key, page_size=20, params=None):
+        self.connection = connection
+        self.query = normalize_sql(query)
+        if re.search(r"\b(?:ORDER\s+BY|LIMIT|GROUP\s+BY)\b", SQL_LITERAL.sub("?", self.query), re.I):
+            raise ValueError("The query must not have its own ORDER BY, LIMIT or GROUP BY")
+        if not re.match(r"^SELECT\s", self.query, re.I) or re.match(r"^SELECT\s+DISTINCT\b", self.query, re.I):
+            raise ValueError("The query must be a SELECT (without DISTINCT)")
+        self.order_by = [(identifier(column), direction.upper()) for column, direction in order_by]
+        if any(direction not in ("ASC", "DESC") for _, direction in self.order_by):
+            raise ValueError("Directions must be 'ASC' or 'DESC'")
+        if identifier(key) not in [column for column, _ in self.order_by]:
+            self.order_by.append((key, "ASC"))
+        self.page_size = page_size
+        self.params = tuple(params or ())
+        listing = json.dumps([self.query, self.order_by, [repr(param) for param in self.params]])
+        self.listing = hashlib.sha256(listing.encode()).hexdigest()[:16]
+
+    def seek_condition(self, last):
+        # Rows which sort after the row whose ordering values are last: (params, SQL)
+        alternatives, params = [], []
+        for i, (column, direction) in enumerate(self.order_by):
+            terms, term_params = [], []
+            for (previous, _), value in zip(self.order_by[:i], last):
+                if value is None:
+                    terms.append(f"{previous} IS NULL")
+                else:
+                    terms.append(f"{previous} = %s")
+                    term_params.append(value)
+            value = last[i]
+            if direction == "ASC": # NULLs come first
+                after = f"{column} IS NOT NULL" if value is None else f"{column} > %s"
+            else: # NULLs come last
+                after = None if value is None else f"({column} < %s OR {column} IS NULL)"
+            if after is None:
+                continue
+            if value is not None:
+                term_params.append(value)
+            alternatives.append("(" + " AND ".join(terms + [after]) + ")" if terms else after)
+            params += term_params
+        return "(" + " OR ".join(alternatives or ["FALSE"]) + ")", params
+
+    def encode(self, last):
+        try:
+            token = json.dumps({"listing": self.listing, "last": [to_state(value) for value in last]})
+        except TypeError as err:
+            raise ValueError(f"Can't put the last row's ordering values in a page token: {err}")
+        return base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+
+    def decode(self, token):
+        try:
+            token = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            last = [from_state(value) for value in token["last"]]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid page token")
+        if token.get("listing") != self.listing or len(last) != len(self.order_by):
+            raise ValueError("This page token belongs to a different listing")
+        return last
+
+    def page_query(self, token=None):
+        # The ordering values go after the select list, as MySQL only accepts an unqualified * first
+        keys = ", ".join(f"{column} AS _page_key_{i}" for i, (column, _) in enumerate(self.order_by))
+        end = select_list_end(self.query)
+        sql = f"{self.query[:end].rstrip()}, {keys} {self.query[end:]}".rstrip()
+        params = list(self.params)
+        if token is not None:
+            condition, condition_params = self.seek_condition(self.decode(token))
+            sql = scoped_query(sql, condition)
+            params += condition_params
+        order = ", ".join(f"{column} {direction}" for column, direction in self.order_by)
+        return f"{sql} ORDER BY {order} LIMIT {self.page_size + 1};", tuple(params) or None
+
+    def page(self, token=None):
+        sql, params = self.page_query(token)
+        rows = read_query(self.connection, sql, params)
+        if rows is None:
+            return None, None
+        keys = len(self.order_by)
+        next_token = self.encode(rows[self.page_size - 1][-keys:]) if len(rows) > self.page_size else None
+        return [row[:-keys] for row in rows[:self.page_size]], next_token
+
+    def __iter__(self):
+        # Every page in turn
+        token = None
+        while True:
+            rows, token = self.page(token)
+            if rows:
+                yield rows
+            if token is None:
+                return
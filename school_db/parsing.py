@@ -0,0 +1,89 @@
+"""Working out what a statement does from its SQL text: the tables it reads and writes, and its fingerprint."""
+
+import re
+
+SQL_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"", re.S)
+
+FROM_CLAUSE = re.compile(
+    r"\b(?:FROM|JOIN)\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|LIMIT|HAVING|JOIN|ON|USING|INNER|LEFT|RIGHT|CROSS|NATURAL"
+    r"|STRAIGHT_JOIN|UNION|FOR|WINDOW|LOCK)\b|[;)]|$)",
+    re.I | re.S
+)
+
+WRITTEN_TABLE = re.compile(r"\b(?:UPDATE|INTO|FROM|JOIN|TABLE)\s+(?:IGNORE\s+|LOW_PRIORITY\s+)*([`\w.]+)", re.I)
+
+READ_ONLY_STATEMENT = re.compile(r"^\s*(?:SELECT|SHOW|DESCRIBE|DESC|EXPLAIN|WITH)\b", re.I)
+
+NON_DETERMINISTIC = re.compile(
+    r"\b(?:NOW|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|UTC_DATE|UTC_TIME"
+    r"|UTC_TIMESTAMP|UNIX_TIMESTAMP|RAND|UUID|UUID_SHORT|LAST_INSERT_ID|CONNECTION_ID|FOUND_ROWS|ROW_COUNT)\b|@",
+    re.I
+)
+
+FINGERPRINT_VALUE = re.compile(r"\b\d+(?:\.\d+)?\b|\b(?:TRUE|FALSE|NULL)\b", re.I)
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+def normalize_sql(sql):
+    # Collapse runs of whitespace and drop the trailing semicolon, leaving string literals untouched
+    normalized, position = [], 0
+    for literal in SQL_LITERAL.finditer(sql):
+        normalized.append(re.sub(r"\s+", " ", sql[position:literal.start()]))
+        normalized.append(literal.group())
+        position = literal.end()
+    normalized.append(re.sub(r"\s+", " ", sql[position:]))
+    return "".join(normalized).strip().rstrip(";").rstrip()
+
+
+def select_list_end(sql):
+    # Where a SELECT's select list ends: at its first FROM outside brackets and string literals
+    masked = SQL_LITERAL.sub(lambda literal: "?" * len(literal.group()), sql)
+    depth = 0
+    for match in re.finditer(r"[()]|\bFROM\b", masked, re.I):
+        if match.group() == "(":
+            depth += 1
+        elif match.group() == ")":
+            depth -= 1
+        elif depth == 0:
+            return match.start()
+    return len(sql)
+
+
+def table_name(token):
+    return token.strip("`").split(".")[-1].strip("`").lower()
+
+
+def tables_read(sql):
+    # The tables a SELECT reads from, or None if we can't tell for sure (e.g. it has a subquery)
+    sql = SQL_LITERAL.sub("?", sql)
+    if not re.match(r"^\s*SELECT\b", sql, re.I) or NON_DETERMINISTIC.search(sql) or re.search(r"\(\s*SELECT\b", sql, re.I):
+        return None
+    tables = set()
+    for clause in FROM_CLAUSE.findall(sql):
+        for source in clause.split(","):
+            words = source.split()
+            if not words:
+                return None
+            tables.add(table_name(words[0]))
+    return tables or None
+
+
+def tables_written(sql):
+    # The tables a statement may change: an empty set for reads, None if we can't tell
+    sql = SQL_LITERAL.sub("?", sql)
+    if READ_ONLY_STATEMENT.match(sql):
+        return set()
+    tables = {table_name(token) for token in WRITTEN_TABLE.findall(sql)}
+    return tables or None
+
+
+def query_fingerprint(sql):
+    fingerprint = FINGERPRINT_VALUE.sub("?", SQL_LITERAL.sub("?", normalize_sql(sql)))
+    return re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?+)", fingerprint) # IN lists and VALUES rows of any length
+
+
+def identifier(name):
+    if not IDENTIFIER.match(name):
+        raise ValueError(f"{name!r} is not a column or table name")
+    return name
@@ -0,0 +1,206 @@
+"""Per-query latency histograms, row counts and estimated bytes, grouped by query fingerprint."""
+
+import math
+import threading
+import time
+
+from ._lazy import pd
+from .parsing import normalize_sql, query_fingerprint
+
+
+ESCAPED_BYTES = (b"\\", b"'", b'"', b"\0", b"\n", b"\r", b"\x1a") # each written out with a backslash in front
+
+
+def value_bytes(value):
+    # The UTF-8 bytes of the value written out as a SQL literal: quoted and escaped, unless it's a number or NULL
+    if value is None:
+        return 4
+    if isinstance(value, (int, float)):
+        return len(str(value))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value) + sum(value.count(escaped) for escaped in ESCAPED_BYTES) + len("_binary''")
+    text = str(value).encode()
+    return len(text) + sum(text.count(escaped) for escaped in ESCAPED_BYTES) + 2
+
+
+def estimate_row_bytes(row):
+    # What the row will look like once written out as SQL text, with its separators and brackets
+    return sum(value_bytes(value) + 2 for value in row) + 4
+
+
+class LatencyHistogram:
+    BUCKETS_PER_DOUBLING = 4
+    SMALLEST = 1e-6 # seconds
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        bucket = math.floor(math.log2(max(seconds, self.SMALLEST) / self.SMALLEST) * self.BUCKETS_PER_DOUBLING)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        # The upper edge of the bucket holding the requested rank, capped at the largest value seen
+        rank, seen = fraction * self.count, 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.SMALLEST * 2 ** ((bucket + 1) / self.BUCKETS_PER_DOUBLING), self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "mean": self.total / self.count if self.count else 0.0,
+                "p50": self.percentile(0.50), "p95": self.percentile(0.95), "p99": self.percentile(0.99), "max": self.max}
+
+
+class QueryStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.execute = LatencyHistogram()
+        self.fetch = LatencyHistogram()
+        self.total = LatencyHistogram()
+        self.example = None # the most recent (query, params), so it can be run again later
+
+
+class QueryProfiler:
+    def __init__(self, slow_query_seconds=None, on_slow_query=None):
+        self.slow_query_seconds = slow_query_seconds
+        self.on_slow_query = on_slow_query or print_slow_query
+        self.connect = LatencyHistogram()
+        self.queries = {} # fingerprint -> QueryStats
+        self._lock = threading.Lock()
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connect.add(seconds)
+
+    def record(self, sample):
+        fingerprint = query_fingerprint(sample.query)
+        with self._lock:
+            stats = self.queries.get(fingerprint)
+            if stats is None:
+                stats = self.queries[fingerprint] = QueryStats()
+            stats.calls += 1
+            stats.errors += sample.failed
+            stats.rows += sample.rows
+            stats.bytes_sent += sample.bytes_sent
+            stats.bytes_received += sample.bytes_received
+            stats.execute.add(sample.execute_seconds)
+            stats.fetch.add(sample.fetch_seconds)
+            stats.total.add(sample.total_seconds)
+            stats.example = (sample.query, sample.params)
+        if self.slow_query_seconds is not None and sample.total_seconds >= self.slow_query_seconds:
+            self.on_slow_query(sample)
+
+    def captured_queries(self):
+        with self._lock:
+            return [stats.example for stats in self.queries.values()]
+
+    def export(self):
+        with self._lock:
+            return {
+                "connect": self.connect.summary(),
+                "queries": {
+                    fingerprint: {
+                        "calls": stats.calls, "errors": stats.errors, "rows": stats.rows,
+                        "bytes_sent": stats.bytes_sent, "bytes_received": stats.bytes_received,
+                        "execute": stats.execute.summary(), "fetch": stats.fetch.summary(), "total": stats.total.summary(),
+                    }
+                    for fingerprint, stats in self.queries.items()
+                },
+            }
+
+    def report(self):
+        rows = []
+        for fingerprint, stats in self.export()["queries"].items():
+            rows.append({
+                "query": fingerprint, "calls": stats["calls"], "errors": stats["errors"], "rows": stats["rows"],
+                "p50_ms": stats["total"]["p50"] * 1000, "p95_ms": stats["total"]["p95"] * 1000,
+                "p99_ms": stats["total"]["p99"] * 1000, "execute_p95_ms": stats["execute"]["p95"] * 1000,
+                "fetch_p95_ms": stats["fetch"]["p95"] * 1000, "kib_received": stats["bytes_received"] / 1024,
+            })
+        return pd.DataFrame(rows).sort_values("p95_ms", ascending=False, ignore_index=True) if rows else pd.DataFrame()
+
+
+class QuerySample:
+    # The measurements for one call; used as `with profile_query(query) as sample:`
+    def __init__(self, profiler, query, params=None):
+        self.profiler = profiler
+        self.query = query
+        self.params = params
+        self.failed = False
+        self.rows = 0
+        self.execute_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.total_seconds = 0.0
+        self.bytes_sent = len(query.encode())
+        self.bytes_received = 0
+
+    def __enter__(self):
+        self._start = self._mark = time.perf_counter()
+        return self
+
+    def executed(self, cursor):
+        now = time.perf_counter()
+        self.execute_seconds, self._mark = now - self._mark, now
+        self.rows = max(cursor.rowcount, 0)
+
+    def fetched(self, rows):
+        self.fetch_seconds = time.perf_counter() - self._mark
+        self.rows = len(rows)
+        # Estimate from (up to) the first 100 rows rather than measuring every one
+        sample = rows[:100]
+        if sample:
+            self.bytes_received = sum(estimate_row_bytes(row) for row in sample) * len(rows) // len(sample)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.total_seconds = time.perf_counter() - self._start
+        self.failed = exc_type is not None
+        self.profiler.record(self)
+
+
+class NoSample:
+    # What profile_query hands out while profiling is switched off: it does nothing, as cheaply as possible
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def executed(self, cursor):
+        pass
+
+    def fetched(self, rows):
+        pass
+
+NO_SAMPLE = NoSample()
+
+
+def print_slow_query(sample):
+    print(f"Slow query ({sample.total_seconds * 1000:.1f}ms, {sample.rows} rows): {normalize_sql(sample.query)}")
+
+
+profiler = None
+
+def enable_profiling(slow_query_seconds=None, on_slow_query=None):
+    global profiler
+    profiler = QueryProfiler(slow_query_seconds, on_slow_query)
+    return profiler
+
+def disable_profiling():
+    global profiler
+    profiler = None
+
+def profile_query(query, params=None):
+    current = profiler
+    return NO_SAMPLE if current is None else QuerySample(current, query, params)
@@ -0,0 +1,101 @@
+"""read_query, execute_query and execute_list_query, with caching, profiling, retries and view routing."""
+
+from . import caching
+from ._lazy import connector
+from .connections import close_cursor, connection_identity
+from .parsing import normalize_sql, tables_read, tables_written
+from .profiling import profile_query
+from .resilience import run_resilient
+from .statements import run_statement
+from .transactions import invalidate_tables
+from .views import refreshes_views, routes_to_views
+
+
+def read_query(connection, query, params=None):
+    cache = caching.result_cache
+    tables = tables_read(query) if cache is not None else None
+
+    def read(connection):
+        # The cache key names the server which answers, so it is worked out on the connection the read runs on
+        if tables:
+            key = (connection_identity(connection), normalize_sql(query), tuple(params) if params is not None else None)
+            result = cache.get(key)
+            if result is not None:
+                return result
+            versions = cache.versions(tables)
+        with profile_query(query, params) as sample:
+            cursor = run_statement(connection, query, params)
+            sample.executed(cursor)
+            result = cursor.fetchall()
+            sample.fetched(result)
+        if tables:
+            cache.put(key, result, tables, versions)
+        return result
+
+    try:
+        return run_resilient(connection, read, read_only=tables_written(query) == set())
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+
+def execute_query(connection, query, params=None):
+    def execute(connection):
+        with profile_query(query, params) as sample:
+            cursor = run_statement(connection, query, params)
+            connection.commit()
+            sample.executed(cursor)
+
+    try:
+        run_resilient(connection, execute, read_only=False)
+        invalidate_tables(tables_written(query))
+        print("Query successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+
+def execute_list_query(connection, sql, val):
+    def execute(connection):
+        cursor = connection.cursor()
+        with profile_query(sql) as sample:
+            cursor.executemany(sql, val)
+            connection.commit()
+            sample.executed(cursor)
+
+    try:
+        run_resilient(connection, execute, read_only=False)
+        invalidate_tables(tables_written(sql))
+        print("Query successful")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+
+read_query = routes_to_views(read_query)
+execute_query = refreshes_views(execute_query)
+execute_list_query = refreshes_views(execute_list_query, many=True)
+
+
+def stream_query(connection, query, batch_size=1000, batches=False):
+    cursor = connection.cursor(buffered=False)
+    unread = False
+    try:
+        cursor.execute(query)
+        unread = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                unread = False
+                break
+            if batches:
+                yield rows
+            else:
+                yield from rows
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        raise # a result cut short mustn't pass for the whole of it
+    finally:
+        close_cursor(cursor, unread, batch_size)
+
+
+def max_allowed_packet(connection):
+    result = read_query(connection, "SELECT @@max_allowed_packet;")
+    return int(result[0][0]) if result else 4 * 2**20 # the MySQL 5.7 default
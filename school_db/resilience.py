@@ -0,0 +1,189 @@
+"""Retries with backoff, circuit breakers and read failover to replicas."""
+
+import functools
+import random
+import threading
+import time
+
+from ._lazy import connector
+from .connections import get_pool
+from .transactions import current_transaction
+
+
+@functools.cache
+def error_codes():
+    # (lost connection errors, transient server errors); looked up on first use, so importing this module stays cheap
+    errorcode = connector.errorcode
+    lost = {
+        errorcode.CR_CONNECTION_ERROR,
+        errorcode.CR_CONN_HOST_ERROR,
+        errorcode.CR_SERVER_GONE_ERROR,
+        errorcode.CR_SERVER_LOST,
+        errorcode.CR_SERVER_LOST_EXTENDED,
+    }
+    transient = {
+        errorcode.ER_LOCK_DEADLOCK,
+        errorcode.ER_LOCK_WAIT_TIMEOUT,
+    }
+    return lost, transient
+
+
+@functools.cache
+def circuit_open_error():
+    # CircuitOpenError is one of the connector's errors, so the class is only created once it is needed
+    class CircuitOpenError(connector.Error):
+        pass
+    CircuitOpenError.__module__ = __name__
+    CircuitOpenError.__qualname__ = "CircuitOpenError"
+    return CircuitOpenError
+
+
+def __getattr__(name):
+    if name == "CircuitOpenError":
+        return circuit_open_error()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class RetryPolicy:
+    def __init__(self, attempts=5, base_delay=0.05, max_delay=2.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        # "Full jitter": anywhere between no wait and the exponential backoff for this attempt
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.opened_at = time.monotonic() # let this one call through, and keep the rest out while it runs
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def split_host(host):
+    name, _, port = host.partition(":")
+    return name, int(port) if port else 3306
+
+
+class ResilientConnection:
+    wraps_connection = True
+
+    def __init__(self, hosts, user_name, user_password, db_name, retry=None, failure_threshold=5, reset_seconds=30,
+                 connect=None, **connect_options):
+        self.hosts = list(hosts)
+        self.retry = retry or RetryPolicy()
+        self.breakers = {host: CircuitBreaker(failure_threshold, reset_seconds) for host in self.hosts}
+        self._connect = connect or (lambda host: get_pool(
+            split_host(host)[0], user_name, user_password, db_name, {**connect_options, "port": split_host(host)[1]}
+        ).checkout())
+        self._current = None
+        self.host = None # the host we are currently connected to
+
+    @property
+    def _raw(self):
+        return self.connection(read_only=False)
+
+    def __getattr__(self, name):
+        # Anything else (cursor, commit, ...) goes to the current connection, without retries
+        return getattr(self.connection(read_only=False), name)
+
+    def connection(self, read_only):
+        hosts = self.hosts if read_only else self.hosts[:1]
+        if self._current is not None and self.host in hosts:
+            return self._current
+        self.disconnect()
+        last_error = None
+        for host in hosts:
+            breaker = self.breakers[host]
+            if not breaker.allow():
+                continue
+            try:
+                self._current = self._connect(host)
+            except connector.Error as err:
+                breaker.record_failure()
+                last_error = err
+                continue
+            self.host = host
+            if host != self.hosts[0]:
+                print(f"Failed over to replica {host}")
+            return self._current
+        raise last_error or circuit_open_error()(msg=f"No host available: every circuit breaker is open for {', '.join(hosts)}")
+
+    def disconnect(self):
+        current, self._current, self.host = self._current, None, None
+        if current is not None:
+            try:
+                current.close()
+            except connector.Error:
+                pass
+
+    def close(self):
+        self.disconnect()
+
+    def run(self, operation, read_only):
+        lost_connection_errors, transient_server_errors = error_codes()
+        for attempt in range(self.retry.attempts):
+            sent = False
+            try:
+                connection = self.connection(read_only)
+                sent = True
+                result = operation(connection)
+                self.breakers[self.host].record_success()
+                return result
+            except connector.Error as err:
+                if err.errno in lost_connection_errors:
+                    if self.host is not None:
+                        self.breakers[self.host].record_failure()
+                    self.disconnect()
+                    retryable = read_only or not sent
+                elif err.errno in transient_server_errors:
+                    retryable = True
+                else:
+                    raise
+                if not retryable or current_transaction() is not None or attempt == self.retry.attempts - 1:
+                    raise
+                delay = self.retry.delay(attempt)
+                print(f"Retrying in {delay * 1000:.0f}ms after: '{err}'")
+                time.sleep(delay)
+
+
+def create_resilient_connection(hosts, user_name, user_password, db_name, **options):
+    if isinstance(hosts, str):
+        hosts = [hosts]
+    return ResilientConnection(hosts, user_name, user_password, db_name, **options)
+
+
+def run_resilient(connection, operation, read_only):
+    if isinstance(connection, ResilientConnection):
+        return connection.run(operation, read_only)
+    return operation(connection)
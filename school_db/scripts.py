@@ -0,0 +1,134 @@
+"""Running multi-statement SQL scripts, batching statements into as few round trips as possible."""
+
+import os
+import re
+
+from ._lazy import connector
+from .connections import close_cursor, forget_identity
+from .parsing import SQL_LITERAL, tables_written
+from .queries import max_allowed_packet
+from .transactions import invalidate_tables
+
+
+SCRIPT_SKIP = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`[^`]*`|--(?=[ \t\r\n]|$)[^\n]*|#[^\n]*|/\*.*?\*/", re.S)
+SCRIPT_COMMENT = re.compile(r"--(?=[ \t\r\n]|$)[^\n]*|#[^\n]*|/\*.*?\*/", re.S)
+DELIMITER_LINE = re.compile(r"[ \t]*DELIMITER[ \t]+(\S+)[ \t]*(?:\r?\n|$)", re.I)
+
+
+def split_statements(script):
+    # [(statement, batchable)], where statements written between DELIMITER lines are not batchable
+    statements = []
+    delimiter, start, position, line_start = ";", 0, 0, True
+
+    def add(end):
+        statement = script[start:end].strip()
+        if SCRIPT_COMMENT.sub("", SQL_LITERAL.sub("''", statement)).strip():
+            statements.append((statement, delimiter == ";"))
+
+    while position < len(script):
+        if line_start:
+            line = DELIMITER_LINE.match(script, position)
+            if line:
+                add(position)
+                delimiter = line.group(1)
+                position = start = line.end()
+                continue
+        if script.startswith(delimiter, position):
+            add(position)
+            position = start = position + len(delimiter)
+            line_start = False
+            continue
+        skip = SCRIPT_SKIP.match(script, position)
+        if skip:
+            position = skip.end()
+            line_start = False
+            continue
+        line_start = script[position] == "\n"
+        position += 1
+    add(len(script))
+    return statements
+
+
+def read_script(script):
+    if script.rstrip().lower().endswith(".sql") and "\n" not in script and os.path.isfile(script):
+        with open(script, encoding="utf-8") as file:
+            return file.read()
+    return script
+
+
+def statement_batches(statements, first, max_bytes):
+    # The statements to send together, starting at index first
+    statement, batchable = statements[first]
+    if not batchable:
+        return [statement]
+    batch, size = [statement], len(statement.encode())
+    for statement, batchable in statements[first + 1:]:
+        size += len(statement.encode()) + 2
+        if not batchable or size > max_bytes:
+            break
+        batch.append(statement)
+    return batch
+
+
+def iter_script(connection, script, stop_on_error=True, max_batch_bytes=None):
+    statements = split_statements(read_script(script))
+    if not statements:
+        return
+    max_batch_bytes = max_batch_bytes or int(max_allowed_packet(connection) * 0.9)
+    cursor = connection.cursor()
+    written = []
+    index = 0
+    try:
+        while index < len(statements):
+            batch = statement_batches(statements, index, max_batch_bytes)
+            try:
+                if statements[index][1]:
+                    cursor.execute(";\n".join(batch), map_results=True)
+                else:
+                    cursor.execute(batch[0])
+                while True:
+                    statement = statements[index][0]
+                    yield {
+                        "index": index,
+                        "statement": statement,
+                        "rowcount": cursor.rowcount,
+                        "rows": cursor.fetchall() if cursor.with_rows else None,
+                        "error": None,
+                    }
+                    written.append(tables_written(statement))
+                    forget_identity(connection, statement)
+                    index += 1
+                    if not cursor.nextset():
+                        break
+            except connector.Error as err:
+                yield {"index": index, "statement": statements[index][0], "rowcount": -1, "rows": None, "error": err}
+                index += 1
+                if stop_on_error:
+                    break
+                # The server skipped the rest of the batch: start a new one with the next statement
+                close_cursor(cursor)
+                cursor = connection.cursor()
+        connection.commit()
+    finally:
+        close_cursor(cursor)
+        for tables in written:
+            invalidate_tables(tables)
+
+
+def run_script(connection, script, stop_on_error=True, max_batch_bytes=None):
+    results = []
+    try:
+        for result in iter_script(connection, script, stop_on_error, max_batch_bytes):
+            results.append(result)
+            first_line = result["statement"].splitlines()[0][:60]
+            if result["error"] is not None:
+                print(f"[{result['index'] + 1}] Error: '{result['error']}' in: {first_line}")
+            elif result["rows"] is not None:
+                print(f"[{result['index'] + 1}] {len(result['rows'])} rows: {first_line}")
+            else:
+                print(f"[{result['index'] + 1}] Query successful ({result['rowcount']} rows affected): {first_line}")
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+    failed = sum(result["error"] is not None for result in results)
+    print(f"Ran {len(results) - failed} of {len(results)} statements successfully")
+    return results
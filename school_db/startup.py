@@ -0,0 +1,57 @@
+"""How long importing school_db takes, measured with python -X importtime, against a startup budget."""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+STARTUP_BUDGET_MS = 50
+
+# Modules which must only be imported on first use, never by importing school_db itself
+HEAVY_MODULES = ("pandas", "mysql.connector", "pyarrow")
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def import_times(module="school_db", python=sys.executable):
+    # [(name, depth, self µs, cumulative µs)] for everything `import module` imports, in a fresh interpreter
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])))
+    env.pop("PYTHONIMPORTTIME", None)
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=package_root, env=env)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    times = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append((name, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+    return times
+
+
+def startup_cost(times, package="school_db"):
+    # (milliseconds spent importing the package, heavy modules it imported)
+    total_us = sum(cumulative for name, depth, _, cumulative in times
+                   if depth == 0 and (name == package or name.startswith(package + ".")))
+    imported = {name for name, _, _, _ in times}
+    heavy = [module for module in HEAVY_MODULES if module in imported]
+    return total_us / 1000, heavy
+
+
+def benchmark_startup(modules=("school_db", "school_db.queries", "school_db.cli"), runs=5, budget_ms=STARTUP_BUDGET_MS):
+    results = []
+    for module in modules:
+        timings, heavy = [], []
+        for _ in range(runs):
+            milliseconds, heavy = startup_cost(import_times(module))
+            timings.append(milliseconds)
+        median_ms = statistics.median(timings)
+        within_budget = median_ms <= budget_ms and not heavy
+        results.append({"module": module, "median_ms": median_ms, "heavy_imports": heavy, "within_budget": within_budget})
+        print(f"import {module}: {median_ms:.1f}ms (budget {budget_ms}ms)"
+              + (f", imports {', '.join(heavy)}" if heavy else "")
+              + ("" if within_budget else " - OVER BUDGET"))
+    return results
@@ -0,0 +1,66 @@
+"""Prepared statements, cached per connection."""
+
+from collections import OrderedDict
+
+from .connections import forget_identity, raw_connection
+
+STATEMENT_CACHE_SIZE = 64
+
+
+class StatementCache:
+    def __init__(self, connection, max_size=STATEMENT_CACHE_SIZE):
+        self.connection = connection
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._statements = OrderedDict() # SQL text -> (the same SQL string object, prepared cursor)
+
+    def execute(self, sql, params):
+        entry = self._statements.get(sql)
+        if entry is None:
+            self.misses += 1
+            entry = self._statements[sql] = (sql, self.connection.cursor(prepared=True))
+            if len(self._statements) > self.max_size:
+                _, (_, evicted) = self._statements.popitem(last=False)
+                evicted.close()
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self._statements.move_to_end(sql)
+        # MySQL Connector only skips re-preparing when it is handed the very same string object it prepared
+        # last time, so we always pass the one we cached rather than the caller's (equal but distinct) copy
+        cached_sql, cursor = entry
+        cursor.execute(cached_sql, params)
+        return cursor
+
+    def clear(self):
+        for _, cursor in self._statements.values():
+            cursor.close()
+        self._statements.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"size": len(self._statements), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate()}
+
+
+def statement_cache(connection):
+    # Kept on the underlying connection, since that is where the prepared statements live: the cache and its
+    # cursors refer back to the connection, so a cache held anywhere else would keep the connection alive
+    raw = raw_connection(connection)
+    cache = getattr(raw, "_statement_cache", None)
+    if cache is None:
+        cache = raw._statement_cache = StatementCache(raw)
+    return cache
+
+def run_statement(connection, query, params=None):
+    forget_identity(connection, query)
+    if params is None:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        return cursor
+    return statement_cache(connection).execute(query, params)
@@ -0,0 +1,413 @@
+"""Stand-ins for a MySQL server, synthetic school data and a fault-injecting proxy, for benchmarks and experiments without a real database."""
+
+import asyncio
+import datetime
+import random
+import re
+import socket
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import deque
+
+from ._lazy import connector
+from .bulk import bulk_insert
+from .scripts import SCRIPT_COMMENT, split_statements
+
+# merge_frame's queries, which the stand-in server answers from its rows
+CHUNK_CHECKSUMS = re.compile(
+    r"^SELECT MOD\(CRC32\(CONCAT_WS\(%s, (.*?)\)\), %s\) AS chunk, COUNT\(\*\), BIT_XOR\(CRC32\(CONCAT_WS\(%s, (.*)\)\)\) FROM", re.S
+)
+CHUNK_FILTER = re.compile(r"\bWHERE MOD\(CRC32\(CONCAT_WS\(%s, (.*?)\)\), %s\) IN \(", re.S)
+
+
+class StandInServer:
+    def __init__(self, handshake_latency=0.005, query_latency=0.0002, rows=None, columns=None, parse_latency=0.0):
+        self.handshake_latency = handshake_latency
+        self.query_latency = query_latency
+        self.parse_latency = parse_latency
+        self.rows = rows or []
+        self.columns = columns or []
+        self.table_checksum = 0 # what CHECKSUM TABLE reports for every table
+        self.results = {} # canned results: a regular expression for the statement -> (columns, rows or rows(query, params)), or an error to raise
+        self.connections_opened = 0
+        self.statements = []
+
+    def connect(self, **kwargs):
+        time.sleep(self.handshake_latency)
+        self.connections_opened += 1
+        return StandInConnection(self)
+
+
+class StandInConnection:
+    def __init__(self, server):
+        self.server = server
+        self.open = True
+        self.in_transaction = False
+
+    def is_connected(self):
+        return self.open
+
+    def cursor(self, *args, prepared=False, **kwargs):
+        return StandInCursor(self, prepared)
+
+    def commit(self):
+        self.in_transaction = False
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def close(self):
+        self.open = False
+
+
+class StandInCursor:
+    def __init__(self, connection, prepared=False):
+        self.connection = connection
+        self.prepared = prepared
+        self._prepared_query = None
+        self.description = None
+        self.rowcount = -1
+        self.statement = None
+        self._rows = iter(())
+        self._pending = deque() # the rest of a multi-statement execute
+
+    @property
+    def with_rows(self):
+        return self.description is not None
+
+    def execute(self, query, params=None, map_results=False):
+        server = self.connection.server
+        if not self.prepared or query is not self._prepared_query:
+            time.sleep(server.parse_latency)
+            self._prepared_query = query
+        time.sleep(server.query_latency)
+        if map_results:
+            self._pending = deque(statement for statement, _ in split_statements(query))
+            query = self._pending.popleft()
+        self.statement = query
+        self.run(query, params)
+
+    def nextset(self):
+        if not self._pending:
+            return None
+        self.statement = self._pending.popleft()
+        self.run(self.statement)
+        return True
+
+    def run(self, query, params=None):
+        # Execute the statement on the stand-in server, without any simulated latency
+        server = self.connection.server
+        server.statements.append((query, params))
+        canned = next((result for pattern, result in server.results.items() if re.search(pattern, query, re.I | re.S)), None)
+        if isinstance(canned, Exception):
+            raise canned
+        if canned is not None:
+            columns, rows = canned
+            self.description = [(name, field_type, None, None, None, None, 1, 0) for name, field_type in columns]
+            self._rows = iter(rows(query, params) if callable(rows) else rows)
+            self.rowcount = -1
+        elif CHUNK_CHECKSUMS.match(query):
+            self.description = [(name, connector.FieldType.LONGLONG, None, None, None, None, 1, 0)
+                                for name in ("chunk", "COUNT(*)", "BIT_XOR")]
+            self._rows = iter(self.chunk_checksums(*CHUNK_CHECKSUMS.match(query).groups(), params))
+            self.rowcount = -1
+        elif SCRIPT_COMMENT.sub("", query).lstrip().upper().startswith("SELECT"): # as the server does, skipping comments
+            self.description = [(name, field_type, None, None, None, None, 1, 0) for name, field_type in server.columns]
+            rows = server.rows() if callable(server.rows) else server.rows
+            chunk_filter = CHUNK_FILTER.search(query)
+            if chunk_filter:
+                rows = self.rows_in_chunks(rows, chunk_filter.group(1), params)
+            self._rows = iter(rows)
+            self.rowcount = -1
+        elif query.lstrip().upper().startswith("CHECKSUM TABLE"):
+            tables = query.strip().rstrip(";")[len("CHECKSUM TABLE"):].split(",")
+            self.description = [("Table", connector.FieldType.VAR_STRING, None, None, None, None, 0, 0),
+                                ("Checksum", connector.FieldType.LONGLONG, None, None, None, None, 1, 0)]
+            self._rows = iter([(f"school.{table.strip()}", server.table_checksum) for table in tables])
+            self.rowcount = -1
+        else:
+            self.description = None
+            self._rows = iter(())
+            self.rowcount = 1
+            self.connection.in_transaction = True
+
+    def columns_in(self, sql):
+        # The positions of the server's columns which sql mentions, in the order it mentions them
+        names = [name for name, _ in self.connection.server.columns]
+        found = [(match.start(), position) for position, name in enumerate(names) for match in [re.search(rf"\b{name}\b", sql)] if match]
+        return [position for _, position in sorted(found)]
+
+    def chunk_of(self, row, key, chunks):
+        from .merge import row_text
+        return zlib.crc32(row_text([row[i] for i in key]).encode()) % chunks
+
+    def chunk_checksums(self, key_sql, row_sql, params):
+        from .merge import row_text
+        server = self.connection.server
+        key, columns = self.columns_in(key_sql), self.columns_in(row_sql)
+        chunks = params[len(key) + 1]
+        checksums = {}
+        for row in server.rows() if callable(server.rows) else server.rows:
+            chunk = self.chunk_of(row, key, chunks)
+            count, checksum = checksums.get(chunk, (0, 0))
+            checksums[chunk] = (count + 1, checksum ^ zlib.crc32(row_text([row[i] for i in columns]).encode()))
+        return [(chunk, count, checksum) for chunk, (count, checksum) in checksums.items()]
+
+    def rows_in_chunks(self, rows, key_sql, params):
+        key = self.columns_in(key_sql)
+        chunks, wanted = params[len(key) + 1], set(params[len(key) + 2:])
+        return [row for row in rows if self.chunk_of(row, key, chunks) in wanted]
+
+    def executemany(self, query, seq_params):
+        for params in seq_params:
+            self.execute(query, params)
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        return [row for _, row in zip(range(size), self._rows)]
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        self._rows = iter(())
+
+
+class AsyncStandInConnection:
+    def __init__(self, server):
+        self.server = server
+        self.open = True
+        self.in_transaction = False
+
+    async def is_connected(self):
+        return self.open
+
+    async def cursor(self, *args, **kwargs):
+        return AsyncStandInCursor(self)
+
+    async def commit(self):
+        self.in_transaction = False
+
+    async def rollback(self):
+        self.in_transaction = False
+
+    async def close(self):
+        self.open = False
+
+
+class AsyncStandInCursor:
+    def __init__(self, connection):
+        self._cursor = StandInCursor(connection)
+
+    async def execute(self, query, params=None):
+        await asyncio.sleep(self._cursor.connection.server.query_latency)
+        self._cursor.run(query, params)
+
+    async def executemany(self, query, seq_params):
+        for params in seq_params:
+            await self.execute(query, params)
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def close(self):
+        self._cursor.close()
+
+
+async def connect_to_stand_in(server):
+    await asyncio.sleep(server.handshake_latency)
+    server.connections_opened += 1
+    return AsyncStandInConnection(server)
+
+
+def course_columns():
+    # The (name, type) of each column of the course table, for StandInServer(columns=...)
+    FieldType = connector.FieldType
+    return [
+        ("course_id", FieldType.LONG),
+        ("course_name", FieldType.VAR_STRING),
+        ("language", FieldType.VAR_STRING),
+        ("level", FieldType.VAR_STRING),
+        ("course_length_weeks", FieldType.LONG),
+        ("start_date", FieldType.DATE),
+        ("in_school", FieldType.TINY),
+        ("teacher", FieldType.LONG),
+        ("client", FieldType.LONG),
+    ]
+
+
+def synthetic_courses(n):
+    languages = ["ENG", "FRA", "DEU", "MAN", "RUS"]
+    levels = ["A1", "A2", "B1", "B2", "C1"]
+    first_day = datetime.date(2019, 1, 1)
+    for i in range(n):
+        yield (i, f"Course {i}", languages[i % 5], levels[i // 5 % 5], 10 + i % 30,
+               first_day + datetime.timedelta(days=i % 730), i % 2, 1 + i % 6, 101 + i % 5)
+
+
+def synthetic_participants(n):
+    for i in range(n):
+        yield (1000 + i, f"First{i}", f"Last{i}", f"49155{i:06d}", 101 + i % 5)
+
+
+class SchoolDataGenerator:
+    FIRST_NAMES = ["Anna", "Ben", "Chloe", "David", "Elena", "Felix", "Greta", "Hugo", "Ines", "Jonas", "Klara", "Luca"]
+    LAST_NAMES = ["Schmidt", "Meyer", "Weber", "Wagner", "Becker", "Hoffmann", "Koch", "Richter", "Klein", "Wolf"]
+    LANGUAGES = ["ENG", "FRA", "DEU", "MAN", "RUS", "ITA", "ESP"]
+    LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
+    INDUSTRIES = ["NGO", "Retail", "Auto", "Banking", "Logistics", "Pharma", "Energy"]
+
+    def __init__(self, scale, seed=42, first_id=1000):
+        self.scale = scale
+        self.seed = seed
+        self.first_id = first_id
+        self.sizes = {
+            "teacher": max(6, scale // 100),
+            "client": max(5, scale // 50),
+            "participant": scale,
+            "course": max(9, scale // 10),
+        }
+
+    def _random(self, table):
+        return random.Random(f"{self.seed}-{table}")
+
+    def _ids(self, table):
+        return range(self.first_id, self.first_id + self.sizes[table])
+
+    def _name(self, rng):
+        return rng.choice(self.FIRST_NAMES), rng.choice(self.LAST_NAMES)
+
+    def teachers(self):
+        rng = self._random("teacher")
+        for teacher_id in self._ids("teacher"):
+            language_1, language_2 = rng.sample(self.LANGUAGES, 2)
+            dob = datetime.date(1955, 1, 1) + datetime.timedelta(days=rng.randrange(45 * 365))
+            yield (teacher_id, *self._name(rng), language_1, language_2 if rng.random() < 0.5 else None,
+                   dob, teacher_id, f"+49{rng.randrange(10**9, 10**10)}")
+
+    def clients(self):
+        rng = self._random("client")
+        for client_id in self._ids("client"):
+            yield (client_id, f"Client {client_id}", f"{rng.randrange(1, 300)} Beispielstraße, {rng.randrange(10000, 14999)} Berlin",
+                   rng.choice(self.INDUSTRIES))
+
+    def participants(self):
+        rng = self._random("participant")
+        clients = self._ids("client")
+        for participant_id in self._ids("participant"):
+            yield (participant_id, *self._name(rng), f"49{rng.randrange(10**9, 10**10)}", rng.choice(clients))
+
+    def courses(self):
+        rng = self._random("course")
+        teachers, clients = self._ids("teacher"), self._ids("client")
+        for course_id in self._ids("course"):
+            language, level = rng.choice(self.LANGUAGES), rng.choice(self.LEVELS)
+            start_date = datetime.date(2018, 1, 1) + datetime.timedelta(days=rng.randrange(5 * 365))
+            yield (course_id, f"{language} {level} #{course_id}", language, level, rng.choice([4, 8, 10, 15, 18, 40]),
+                   start_date, rng.random() < 0.4, rng.choice(teachers), rng.choice(clients))
+
+    def enrolments(self):
+        rng = self._random("takes_course")
+        courses = self._ids("course")
+        for participant_id in self._ids("participant"):
+            for course_id in sorted(rng.sample(courses, rng.randint(1, 3))):
+                yield (participant_id, course_id)
+
+    def tables(self):
+        # In an order which satisfies the foreign keys
+        return [("teacher", self.teachers()), ("client", self.clients()), ("participant", self.participants()),
+                ("course", self.courses()), ("takes_course", self.enrolments())]
+
+
+def populate_school(connection, generator, rows_per_commit=50000):
+    loaded = {}
+    for table, rows in generator.tables():
+        print(f"{table}:")
+        loaded[table] = bulk_insert(connection, table, None, rows, rows_per_commit=rows_per_commit)["rows"]
+    return loaded
+
+
+def peak_memory(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class FaultInjectingProxy:
+    def __init__(self, target_host="localhost", target_port=3306, host="127.0.0.1", port=0, latency=0.0, drop_rate=0.0, seed=None):
+        self.target = (target_host, target_port)
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.refuse = False
+        self._random = random.Random(seed)
+        self._links = set() # (client socket, server socket) pairs
+        self._lock = threading.Lock()
+        self._listener = socket.create_server((host, port))
+        self.address = f"{host}:{self._listener.getsockname()[1]}"
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            if self.refuse:
+                client.close()
+                continue
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                client.close()
+                continue
+            link = (client, upstream)
+            with self._lock:
+                self._links.add(link)
+            threading.Thread(target=self._pump, args=(client, upstream, link), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client, link), daemon=True).start()
+
+    def _pump(self, source, sink, link):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if self.latency:
+                    time.sleep(self.latency)
+                if self.drop_rate and self._random.random() < self.drop_rate:
+                    break
+                sink.sendall(data)
+        except OSError:
+            pass
+        finally:
+            self._cut(link)
+
+    def _cut(self, link):
+        with self._lock:
+            self._links.discard(link)
+        for sock in link:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def drop_connections(self):
+        with self._lock:
+            links = list(self._links)
+        for link in links:
+            self._cut(link)
+        return len(links)
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+        self.drop_connections()
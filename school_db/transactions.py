@@ -0,0 +1,123 @@
+"""Grouping statements into one transaction, with savepoints and periodic commits."""
+
+import contextlib
+import functools
+import threading
+
+from .caching import invalidate_cached_tables
+from .parsing import table_name, tables_written
+from .profiling import profile_query
+from .statements import run_statement
+
+_transactions = threading.local()
+
+def current_transaction():
+    stack = getattr(_transactions, "stack", None)
+    return stack[-1] if stack else None
+
+
+class Transaction:
+    wraps_connection = True
+
+    def __init__(self, connection, commit_every=None):
+        self._raw = connection
+        self.commit_every = commit_every
+        self.statements = 0 # since the last commit
+        self.commits = 0
+        self.written = [] # tables to invalidate in the result cache once the changes are really committed
+        self._savepoints = 0
+        self._open_savepoints = 0
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["_raw"], name)
+
+    def __enter__(self):
+        if not hasattr(_transactions, "stack"):
+            _transactions.stack = []
+        _transactions.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _transactions.stack.remove(self)
+        if exc_type is None:
+            self.commit_now()
+        else:
+            self.rollback()
+            print(f"Transaction rolled back: '{exc_value}'")
+        return False
+
+    def execute(self, query, params=None):
+        with profile_query(query, params) as sample:
+            cursor = run_statement(self, query, params)
+            sample.executed(cursor)
+        invalidate_tables(tables_written(query))
+        self.commit()
+        return cursor.rowcount
+
+    def execute_list(self, sql, val):
+        cursor = self._raw.cursor()
+        with profile_query(sql) as sample:
+            cursor.executemany(sql, val)
+            sample.executed(cursor)
+        invalidate_tables(tables_written(sql))
+        self.commit()
+        return cursor.rowcount
+
+    def commit(self):
+        # What our other functions call after each statement: only counts it, unless commit_every says it's time
+        self.statements += 1
+        if self.commit_every and self.statements >= self.commit_every and not self._open_savepoints:
+            self.commit_now()
+
+    def commit_now(self):
+        self._raw.commit()
+        self.commits += 1
+        self.statements = 0
+        written, self.written = self.written, []
+        for tables in written:
+            invalidate_cached_tables(tables)
+
+    def rollback(self):
+        self._raw.rollback()
+        self.statements = 0
+        self.written = []
+
+    @contextlib.contextmanager
+    def savepoint(self, name=None):
+        self._savepoints += 1
+        name = name or f"savepoint_{self._savepoints}"
+        cursor = self._raw.cursor()
+        cursor.execute(f"SAVEPOINT {name};")
+        self._open_savepoints += 1
+        try:
+            yield name
+        except BaseException:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {name};")
+            raise
+        else:
+            cursor.execute(f"RELEASE SAVEPOINT {name};")
+        finally:
+            self._open_savepoints -= 1
+            cursor.close()
+
+
+def transaction(connection, commit_every=None):
+    return Transaction(connection, commit_every)
+
+
+def invalidate_tables(tables):
+    # Inside a transaction, the invalidation is repeated when it commits, so nobody caches the old rows in between
+    transaction = current_transaction()
+    if transaction is not None:
+        transaction.written.append(tables)
+    invalidate_cached_tables(tables)
+
+
+def invalidates_table(load):
+    @functools.wraps(load)
+    def load_and_invalidate(connection, table, *args, **kwargs):
+        try:
+            return load(connection, table, *args, **kwargs)
+        finally:
+            invalidate_tables({table_name(table)})
+    return load_and_invalidate
@@ -0,0 +1,256 @@
+"""Materialized summary tables, refreshed group by group as the tables they read are written."""
+
+import functools
+import re
+
+from ._lazy import connector
+from .caching import dependent_tables, invalidate_cached_tables, invalidation_hooks
+from .parsing import identifier, normalize_sql, tables_read, tables_written
+
+SQL_VALUE = r"(?:%s|'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|[-+]?\d+(?:\.\d+)?|NULL|TRUE|FALSE)"
+SQL_TUPLE = rf"\(\s*{SQL_VALUE}(?:\s*,\s*{SQL_VALUE})*\s*\)"
+
+INSERT_STATEMENT = re.compile(
+    rf"^INSERT\s+(?:IGNORE\s+)?INTO\s+[`\w.]+\s*(?:\(([^()]*)\))?\s*VALUES?\s*({SQL_TUPLE}(?:\s*,\s*{SQL_TUPLE})*)\s*(?:ON DUPLICATE KEY UPDATE\b.*)?$",
+    re.I | re.S
+)
+UPDATE_STATEMENT = re.compile(r"^UPDATE\s+[`\w.]+\s+SET\s+(.*?)\s+(WHERE\s+.*)$", re.I | re.S)
+DELETE_STATEMENT = re.compile(r"^DELETE\s+FROM\s+[`\w.]+\s+(WHERE\s+.*)$", re.I | re.S)
+DELETES_ROWS = re.compile(r"^\s*(?:DELETE|REPLACE)\b", re.I) # the statements whose deletes cascade through foreign keys
+SCOPE_CONDITION = re.compile(
+    rf"^WHERE\s+(?:`?\w+`?\.)?`?(\w+)`?\s*(?:=\s*({SQL_VALUE})|IN\s*\(\s*({SQL_VALUE}(?:\s*,\s*{SQL_VALUE})*)\s*\))$",
+    re.I | re.S
+)
+GROUP_BY = re.compile(r"\bGROUP\s+BY\b", re.I)
+WHERE = re.compile(r"\bWHERE\b", re.I)
+ORDER_BY_OUTPUT = re.compile(r"^(.*?)\s+ORDER\s+BY\s+(\w+(?:\s+(?:ASC|DESC))?(?:\s*,\s*\w+(?:\s+(?:ASC|DESC))?)*)$", re.I | re.S)
+
+
+def sql_values(text, params):
+    # The values in a list of SQL literals and %s placeholders, taking the placeholders' values from params
+    params = iter(params or ())
+    values = []
+    for token in re.findall(SQL_VALUE, text, re.I):
+        if token == "%s":
+            values.append(next(params))
+        elif token[0] in "'\"":
+            values.append(token[1:-1].replace(token[0] * 2, token[0]).replace("\\" + token[0], token[0]))
+        elif token.upper() in ("NULL", "TRUE", "FALSE"):
+            values.append({"NULL": None, "TRUE": 1, "FALSE": 0}[token.upper()])
+        else:
+            values.append(token)
+    return values
+
+
+def touched_values(sql, param_rows, column, table_columns):
+    # The values of column in the rows sql changes, or None if we can't tell; table_columns() gives the table's columns in order
+    sql = normalize_sql(sql)
+    param_rows = param_rows or [None]
+    insert = INSERT_STATEMENT.match(sql)
+    if insert:
+        columns = [name.strip(" `") for name in insert.group(1).split(",")] if insert.group(1) else table_columns()
+        if column not in columns:
+            return None
+        touched = set()
+        for params in param_rows:
+            for row in re.findall(SQL_TUPLE, insert.group(2), re.I):
+                values = sql_values(row, params)
+                params = params[len(re.findall(r"%s", row)):] if params else params
+                touched.add(values[columns.index(column)])
+        return touched
+
+    update, delete = UPDATE_STATEMENT.match(sql), DELETE_STATEMENT.match(sql)
+    if not (update or delete):
+        return None
+    where = update.group(2) if update else delete.group(1)
+    if update and re.search(rf"(?:^|,)\s*(?:`?\w+`?\.)?`?{column}`?\s*=", update.group(1)):
+        return None # the statement moves rows from one group to another
+    condition = SCOPE_CONDITION.match(where)
+    if not condition or condition.group(1).lower() != column.lower():
+        return None
+    text = condition.group(2) or condition.group(3)
+    placeholders = len(re.findall(r"%s", text))
+    touched = set()
+    for params in param_rows:
+        touched.update(sql_values(text, params[len(params) - placeholders:] if placeholders else None))
+    return touched
+
+
+def scoped_query(query, condition):
+    # The query, restricted to rows matching condition
+    sql = normalize_sql(query)
+    group_by = GROUP_BY.search(sql)
+    split = group_by.start() if group_by else len(sql)
+    head, tail = sql[:split].rstrip(), sql[split:]
+    where = WHERE.search(head)
+    if where:
+        return f"{head[:where.start()]}WHERE ({head[where.end():].strip()}) AND {condition} {tail}".rstrip()
+    return f"{head} WHERE {condition} {tail}".rstrip()
+
+
+def table_columns(connection, table):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION;",
+            (table,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class MaterializedView:
+    def __init__(self, name, query, key, scopes=None):
+        self.name = identifier(name)
+        self.query = normalize_sql(query if isinstance(query, str) else query.to_sql()[0]) # SQL, or a LazyTable
+        self.key = [identifier(column) for column in key]
+        self.tables = tables_read(self.query)
+        if not self.tables or not GROUP_BY.search(self.query) or re.search(r"\b(?:ORDER\s+BY|LIMIT)\b", self.query, re.I):
+            raise ValueError("A materialized view needs a single-level SELECT ... GROUP BY query, without ORDER BY or LIMIT")
+        self.scopes = {}
+        for table, (column, expression) in (scopes or {}).items():
+            alias = re.search(rf"{re.escape(expression)}\s+AS\s+(\w+)", self.query, re.I)
+            self.scopes[table] = (identifier(column), identifier(expression), alias.group(1) if alias else expression.split(".")[-1])
+        self.columns = []
+        self.stale = True
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+
+    def build(self, connection):
+        key = ", ".join(self.key)
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.name}__new, {self.name}__old;")
+            cursor.execute(f"CREATE TABLE {self.name}__new (PRIMARY KEY ({key})) AS {self.query};")
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.name} LIKE {self.name}__new;")
+            cursor.execute(f"RENAME TABLE {self.name} TO {self.name}__old, {self.name}__new TO {self.name};")
+            cursor.execute(f"DROP TABLE {self.name}__old;")
+            cursor.execute(f"SELECT * FROM {self.name} LIMIT 0;")
+            cursor.fetchall()
+            self.columns = [column[0] for column in cursor.description]
+        finally:
+            cursor.close()
+        self.stale = False
+        self.full_refreshes += 1
+        invalidate_cached_tables({self.name})
+
+    def refresh(self, connection, table, values):
+        # Recompute just the groups whose rows in table have one of these values in its scope column
+        _, expression, column = self.scopes[table]
+        values = sorted(values, key=str)
+        placeholders = ", ".join(["%s"] * len(values))
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"DELETE FROM {self.name} WHERE {column} IN ({placeholders});", values)
+            cursor.execute(f"INSERT INTO {self.name} {scoped_query(self.query, f'{expression} IN ({placeholders})')};", values)
+            connection.commit()
+        except connector.Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.partial_refreshes += 1
+        invalidate_cached_tables({self.name})
+        print(f"Refreshed {len(values)} {column} group{'s' if len(values) != 1 else ''} of {self.name}")
+
+    def after_write(self, connection, sql, param_rows, was_stale):
+        written = tables_written(sql)
+        if written is not None and DELETES_ROWS.match(sql):
+            written = dependent_tables(written)
+        if written is not None and not (written & self.tables):
+            self.stale = was_stale
+            return
+        if was_stale or written is None or len(written) != 1:
+            self.stale = True
+            return
+        table = next(iter(written))
+        scope = self.scopes.get(table)
+        values = touched_values(sql, param_rows, scope[0], lambda: table_columns(connection, table)) if scope else None
+        if values is None:
+            self.stale = True
+            return
+        try:
+            if values:
+                self.refresh(connection, table, values)
+            self.stale = False
+        except connector.Error as err:
+            print(f"Error: '{err}' - {self.name} will be rebuilt on its next read")
+            self.stale = True
+
+    def route(self, query):
+        # The query to run instead, if this one asks for the view's result
+        sql = normalize_sql(query)
+        if sql == self.query:
+            return f"SELECT * FROM {self.name};"
+        ordered = ORDER_BY_OUTPUT.match(sql)
+        if ordered and normalize_sql(ordered.group(1)) == self.query:
+            order_columns = [part.split()[0] for part in ordered.group(2).split(",")]
+            if all(column in self.columns for column in order_columns):
+                return f"SELECT * FROM {self.name} ORDER BY {ordered.group(2)};"
+        return None
+
+
+_views = {}
+
+def materialize(connection, name, query, key, scopes=None):
+    view = MaterializedView(name, query, key, scopes)
+    try:
+        view.build(connection)
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+        return None
+    _views[view.name] = view
+    print(f"Materialized {view.name}")
+    return view
+
+
+def refresh_view(connection, name):
+    view = _views[name]
+    try:
+        view.build(connection)
+    except connector.Error as err:
+        print(f"Error: '{err}'")
+
+
+def drop_view(connection, name):
+    from .queries import execute_query # queries wraps its functions with the ones below, so it imports this module
+    _views.pop(name, None)
+    execute_query(connection, f"DROP TABLE IF EXISTS {identifier(name)};")
+
+
+def route_query(connection, query):
+    for view in list(_views.values()):
+        routed = view.route(query)
+        if routed is not None:
+            if view.stale:
+                refresh_view(connection, view.name)
+            return query if view.stale else routed
+    return query
+
+
+def mark_stale(tables):
+    for view in _views.values():
+        if tables is None or view.tables & set(tables):
+            view.stale = True
+
+invalidation_hooks.append(mark_stale)
+
+
+def routes_to_views(read):
+    @functools.wraps(read)
+    def read_routed(connection, query, *args, **kwargs):
+        return read(connection, route_query(connection, query) if _views else query, *args, **kwargs)
+    return read_routed
+
+
+def refreshes_views(execute, many=False):
+    @functools.wraps(execute)
+    def execute_and_refresh(connection, query, params=None):
+        was_stale = {name: view.stale for name, view in _views.items()}
+        result = execute(connection, query, params)
+        param_rows = params if many else [params]
+        for name, view in list(_views.items()):
+            view.after_write(connection, query, param_rows, was_stale.get(name, True))
+        return result
+    return execute_and_refresh
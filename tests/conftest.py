@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# The repository root, so that school_db imports without being installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def server():
+    from school_db.testing import StandInServer
+    return StandInServer(handshake_latency=0, query_latency=0)
@@ -0,0 +1,44 @@
+import datetime
+import decimal
+
+import pytest
+
+
+@pytest.fixture
+def sparse(server):
+    pytest.importorskip("pyarrow")
+    from school_db._lazy import connector
+    server.columns = [("course_id", connector.FieldType.LONG), ("price", connector.FieldType.NEWDECIMAL),
+                      ("notes", connector.FieldType.BLOB), ("duration", connector.FieldType.TIME)]
+    # The first batch has only NULLs outside course_id
+    server.rows = [(1, None, None, None), (2, None, None, None),
+                   (3, decimal.Decimal("9.50"), "bring a pen", datetime.timedelta(hours=1, minutes=30)),
+                   (4, None, None, None)]
+    return server.connect()
+
+
+def test_every_batch_has_the_same_schema(sparse):
+    import pyarrow as pa
+    from school_db import arrow_batches
+    first, second = arrow_batches(sparse, "SELECT * FROM course", batch_size=2)
+    assert first.schema == second.schema
+    assert first.schema.types == [pa.int32(), pa.float64(), pa.string(), pa.duration("us")]
+
+
+def test_a_batch_of_nulls_doesnt_break_the_table(sparse):
+    from school_db import read_query_arrow
+    table = read_query_arrow(sparse, "SELECT * FROM course", batch_size=2)
+    assert table.column("price").to_pylist() == [None, None, 9.5, None]
+    assert table.column("notes").to_pylist() == [None, None, "bring a pen", None]
+    assert table.column("duration").to_pylist() == [None, None, datetime.timedelta(hours=1, minutes=30), None]
+
+
+def test_an_empty_result_keeps_its_columns(sparse):
+    import pyarrow as pa
+    from school_db import read_query_arrow, read_query_df_arrow
+    sparse.server.rows = []
+    table = read_query_arrow(sparse, "SELECT * FROM course")
+    assert table.num_rows == 0
+    assert table.schema.names == ["course_id", "price", "notes", "duration"]
+    assert table.schema.types == [pa.int32(), pa.float64(), pa.string(), pa.duration("us")]
+    assert list(read_query_df_arrow(sparse, "SELECT * FROM course").columns) == table.schema.names
@@ -0,0 +1,15 @@
+def test_restoring_a_course_restores_its_enrolments(server):
+    from school_db.benchmarks import school_operations
+    from school_db.testing import SchoolDataGenerator
+    generator = SchoolDataGenerator(200)
+    course_id = next(generator.courses())[0]
+    enrolled = [row for row in generator.enrolments() if row[1] == course_id]
+    assert enrolled
+
+    operations = school_operations(server.connect(), generator, {})
+    delete_course, _, cleanup = operations["delete_course"]
+    delete_course()
+    cleanup()
+    assert cleanup is operations["restore_course"][0]
+    restored = [params for query, params in server.statements if query.startswith("INSERT INTO takes_course")]
+    assert sorted(restored) == sorted(enrolled)
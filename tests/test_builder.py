@@ -0,0 +1,55 @@
+import pytest
+
+
+@pytest.fixture
+def courses(server):
+    from school_db import lazy
+    return lazy(server.connect(), "course")
+
+
+def test_filters_joins_and_aggregations_become_one_query(courses):
+    query = (courses.join("client", on="course.client = client.client_id")
+             .filter(language="ENG")
+             .filter("course_length_weeks >= %s", 10)
+             .groupby("client.client_name")
+             .agg(courses=("course_id", "count"), weeks=("course_length_weeks", "sum"))
+             .filter("COUNT(course_id) > %s", 1)
+             .sort_values("weeks", ascending=False)
+             .head(3))
+    assert query.to_sql() == (
+        "SELECT client.client_name AS client_name, COUNT(course_id) AS courses, SUM(course_length_weeks) AS weeks\n"
+        "FROM course\n"
+        "JOIN client ON course.client = client.client_id\n"
+        "WHERE (language = %s) AND (course_length_weeks >= %s)\n"
+        "GROUP BY client.client_name\n"
+        "HAVING (COUNT(course_id) > %s)\n"
+        "ORDER BY weeks DESC\n"
+        "LIMIT 3;",
+        ("ENG", 10, 1),
+    )
+
+
+def test_each_step_returns_a_new_table(courses):
+    english = courses.filter(language="ENG")
+    english.filter(level="A1")
+    assert english.to_sql() == ("SELECT *\nFROM course\nWHERE (language = %s);", ("ENG",))
+    assert courses.to_sql() == ("SELECT *\nFROM course;", None)
+
+
+def test_names_are_checked(courses):
+    with pytest.raises(ValueError):
+        courses.select("course_id; DROP TABLE course")
+    with pytest.raises(ValueError):
+        courses.agg(total=("course_id", "median"))
+    with pytest.raises(ValueError):
+        courses.join("client", on="course.client = client.client_id", how="outer")
+
+
+def test_collect_reads_a_frame(server, courses):
+    pytest.importorskip("pandas")
+    from school_db._lazy import connector
+    server.columns = [("language", connector.FieldType.VAR_STRING), ("size", connector.FieldType.LONGLONG)]
+    server.rows = [("ENG", 5), ("DEU", 3)]
+    df = courses.groupby("language").size().sort_values("size", ascending=False).collect()
+    assert df.to_dict("list") == {"language": ["ENG", "DEU"], "size": [5, 3]}
+    assert server.statements[-1] == ("SELECT language, COUNT(*) AS size\nFROM course\nGROUP BY language\nORDER BY size DESC;", None)
@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+
+def literal(value):
+    # The value written out as a SQL literal, as the connector sends it
+    from school_db._lazy import connector
+    converter = connector.conversion.MySQLConverter("utf8mb4")
+    return converter.quote(converter.escape(converter.to_mysql(value)))
+
+
+def statement_bytes(sql, params):
+    return len(sql.encode()) - 2 * len(params) + sum(len(literal(value)) for value in params)
+
+
+@pytest.mark.parametrize("value", ["Beispielstraße", "O'Brien", "C:\\Kurse\\", "北京", datetime.date(2020, 3, 1), None, 42, 1.5])
+def test_value_bytes_match_the_connector(value):
+    from school_db.profiling import value_bytes
+    assert value_bytes(value) == len(literal(value))
+
+
+def test_binary_values_are_sized_with_room_for_escapes():
+    from school_db.profiling import value_bytes
+    assert value_bytes(b"\x00'ab") == 4 + 2 + len("_binary''")
+
+
+def test_batches_of_multibyte_text_fit_the_packet(server):
+    from school_db import bulk_insert
+    rows = [(client_id, f"Client {client_id}", f"{client_id} " + "北京路 " * 40, "NGO")
+            for client_id in range(1000)]
+    stats = bulk_insert(server.connect(), "client", None, rows, packet_bytes=4096)
+    assert stats["rows"] == 1000
+    inserts = [(sql, params) for sql, params in server.statements if sql.startswith("INSERT")]
+    assert len(inserts) > 1
+    assert max(statement_bytes(sql, params) for sql, params in inserts) <= 4096
+
+
+def load_statement(server):
+    return next(sql for sql, _ in server.statements if sql.startswith("LOAD DATA"))
+
+
+def test_load_data_takes_a_list_of_frame_columns(server):
+    pd = pytest.importorskip("pandas")
+    from school_db import load_data_infile
+    df = pd.DataFrame({"client_id": [1, 2], "client_name": ["A", "B"], "notes": ["x", "y"]})
+    load_data_infile(server.connect(), "client", df, columns=["client_id", "client_name"])
+    assert load_statement(server).endswith("(client_id, client_name);")
+
+
+def test_load_data_takes_a_list_of_csv_columns(server, tmp_path):
+    pytest.importorskip("pandas")
+    from school_db import load_data_infile
+    path = tmp_path / "clients.csv"
+    path.write_text("client_id,notes,client_name\n1,x,A\n", encoding="utf-8")
+    load_data_infile(server.connect(), "client", str(path), columns=["client_id", "client_name"])
+    sql = load_statement(server)
+    assert "(@c0, @skip, @c2) SET client_id = IF(@c0 IN (''), NULL, @c0), client_name = IF(@c2 IN (''), NULL, @c2);" in sql
@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.fixture
+def cache():
+    from school_db import disable_result_cache, enable_result_cache
+    yield enable_result_cache()
+    disable_result_cache()
+
+
+def connect(server, database, host="localhost", port=3306):
+    connection = server.connect()
+    connection.server_host, connection.server_port, connection.database = host, port, database
+    return connection
+
+
+def selects(server):
+    return sum(query.startswith("SELECT") for query, _ in server.statements)
+
+
+def test_reads_are_cached_per_connection_identity(server, cache):
+    from school_db import read_query
+    school, copy, replica = connect(server, "school"), connect(server, "school_copy"), connect(server, "school", port=3307)
+    for connection in (school, school, copy, replica, connect(server, "school")):
+        read_query(connection, "SELECT * FROM client;")
+    assert selects(server) == 3
+    assert cache.hits == 2
+
+
+def test_use_changes_the_identity(server, cache):
+    from school_db import execute_query, read_query
+    connection = connect(server, "school")
+    read_query(connection, "SELECT * FROM client;")
+    connection.database = "school_copy"
+    execute_query(connection, "USE school_copy;")
+    read_query(connection, "SELECT * FROM client;")
+    # Another connection to school mustn't be handed school_copy's rows
+    read_query(connect(server, "school"), "SELECT * FROM client;")
+    assert selects(server) == 3
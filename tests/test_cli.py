@@ -0,0 +1,105 @@
+import os
+import time
+
+import pytest
+
+from school_db import cli
+from school_db.diskcache import DiskCache
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    cache = DiskCache(str(tmp_path))
+    for i in range(3):
+        df = pd.DataFrame({"course_id": range(10 * (i + 1)), "language": ["ENG"] * 10 * (i + 1)})
+        cache.put(cache.key(f"SELECT * FROM course WHERE level = {i}", None, {"course": i}), df,
+                  f"SELECT * FROM course WHERE level = {i}", {"course"})
+    # Make the first entry the least recently used, and old
+    oldest = cache.entries()[-1]
+    two_days_ago = time.time() - 48 * 3600
+    os.utime(cache.path(oldest["key"]), (two_days_ago, two_days_ago))
+    return tmp_path
+
+
+@pytest.fixture
+def stand_in(server, monkeypatch):
+    monkeypatch.setattr(cli, "connect", lambda args: server.connect())
+    return server
+
+
+def test_help_exits_cleanly(capsys):
+    with pytest.raises(SystemExit) as exit:
+        cli.main(["--help"])
+    assert exit.value.code == 0
+    assert "cache" in capsys.readouterr().out
+
+
+def test_a_command_is_required():
+    with pytest.raises(SystemExit) as exit:
+        cli.main([])
+    assert exit.value.code == 2
+
+
+def test_cache_stats(cache_dir, capsys):
+    assert cli.main(["cache", "--dir", str(cache_dir), "stats"]) == 0
+    assert capsys.readouterr().out.startswith("3 entries")
+
+
+def test_cache_list(cache_dir, capsys):
+    assert cli.main(["cache", "--dir", str(cache_dir), "list"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3
+    assert "level = 0" not in lines[0] # most recently used first
+    assert all("SELECT * FROM course" in line for line in lines)
+
+
+def test_cache_purge_older_than(cache_dir, capsys):
+    assert cli.main(["cache", "--dir", str(cache_dir), "purge", "--older-than", "24"]) == 0
+    assert capsys.readouterr().out.strip() == "Removed 1 entries"
+    assert len(DiskCache(str(cache_dir)).entries()) == 2
+
+
+def test_cache_purge_to_size(cache_dir, capsys):
+    assert cli.main(["cache", "--dir", str(cache_dir), "purge", "--max-bytes", "0"]) == 0
+    assert capsys.readouterr().out.strip() == "Removed 3 entries"
+
+
+def test_cache_purge_everything(cache_dir, capsys):
+    assert cli.main(["cache", "--dir", str(cache_dir), "purge"]) == 0
+    assert capsys.readouterr().out.strip() == "Removed 3 entries"
+    assert DiskCache(str(cache_dir)).entries() == []
+
+
+def test_migrate(stand_in, capsys):
+    assert cli.main(["migrate"]) == 0
+    output = capsys.readouterr().out
+    assert "Migration 1 (create teacher) applied" in output
+    assert "Migration 8 (create takes_course) applied" in output
+    recorded = [params for query, params in stand_in.statements if query.startswith("INSERT INTO schema_migrations")]
+    assert [version for version, _, _ in recorded] == list(range(1, 9))
+
+
+def test_script(stand_in, tmp_path):
+    script = tmp_path / "setup.sql"
+    script.write_text("INSERT INTO client VALUES (106, 'A', 'B', NULL);\nINSERT INTO client VALUES (107, 'C', 'D', NULL);\n")
+    assert cli.main(["script", str(script), "--keep-going"]) == 0
+    assert [query for query, _ in stand_in.statements if query.startswith("INSERT")] == [
+        "INSERT INTO client VALUES (106, 'A', 'B', NULL)", "INSERT INTO client VALUES (107, 'C', 'D', NULL)"]
+
+
+def test_commands_needing_a_server_fail_without_one(monkeypatch, tmp_path):
+    monkeypatch.setattr(cli, "connect", lambda args: None)
+    assert cli.main(["migrate"]) == 1
+    assert cli.main(["script", str(tmp_path / "setup.sql")]) == 1
+
+
+def test_startup_within_budget(capsys):
+    assert cli.main(["startup", "school_db", "--runs", "1", "--budget", "10000"]) == 0
+    assert "import school_db:" in capsys.readouterr().out
+
+
+def test_startup_over_budget(capsys):
+    assert cli.main(["startup", "school_db.queries", "--runs", "1", "--budget", "0"]) == 1
+    assert "OVER BUDGET" in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+
+def run_partitions(monkeypatch, fail_at):
+    # The partition starting at fail_at fails. The one worker thread is held up by the next partition until
+    # release is set, so by then any later partitions must have been cancelled.
+    from school_db import concurrency
+    from school_db._lazy import connector
+    release, started = threading.Event(), []
+
+    def read_partition(connection_details, query, params):
+        started.append(params[0])
+        if params[0] == fail_at:
+            raise connector.Error("Lost connection to MySQL server during query")
+        if params[0] > fail_at:
+            release.wait(5)
+        return [(key,) for key in range(*params)], [("course_id", connector.FieldType.LONG, None, None, None, None, 1, 0)]
+
+    monkeypatch.setattr(concurrency, "read_partition", read_partition)
+    return release, started
+
+
+def finish(release, started):
+    release.set()
+    time.sleep(0.1) # time for a partition which wasn't cancelled to start
+    return started
+
+
+def test_partitioned_frame_reports_errors(monkeypatch, capsys):
+    from school_db import read_partitioned
+    release, started = run_partitions(monkeypatch, fail_at=0)
+    assert read_partitioned("localhost", "root", "", "school", "SELECT * FROM course", "course_id",
+                            partitions=4, workers=1, bounds=(0, 99)) is None
+    assert "Lost connection" in capsys.readouterr().out
+    assert 50 not in finish(release, started) and 75 not in started
+
+
+def test_partitioned_rows_raise_errors(monkeypatch, capsys):
+    from school_db import read_partitioned
+    from school_db._lazy import connector
+    release, started = run_partitions(monkeypatch, fail_at=25)
+    rows = read_partitioned("localhost", "root", "", "school", "SELECT * FROM course", "course_id",
+                            partitions=4, workers=1, bounds=(0, 99), as_frame=False)
+    read = []
+    with pytest.raises(connector.Error):
+        for row in rows:
+            read.append(row)
+    assert read == [(key,) for key in range(25)]
+    assert "Lost connection" in capsys.readouterr().out
+    assert 75 not in finish(release, started)
+
+
+def test_forked_workers_forget_the_parents_pools():
+    from school_db import connections
+    parent_pool = connections.get_pool("localhost", "root", "", "school")
+    saved = connections._pools, connections._pools_lock
+    try:
+        connections.forget_pools()
+        assert connections.get_pool("localhost", "root", "", "school") is not parent_pool
+        assert parent_pool in connections._inherited_pools[-1].values() # set aside, not closed
+    finally:
+        connections._inherited_pools.pop()
+        connections._pools, connections._pools_lock = saved
+
+
+JOIN = "SELECT * FROM takes_course JOIN course ON takes_course.course_id = course.course_id"
+
+
+def record_partitions(monkeypatch):
+    from school_db import concurrency
+    from school_db._lazy import connector
+    queries = []
+
+    def read_partition(connection_details, query, params):
+        queries.append((query, params))
+        if query.startswith("SELECT MIN("):
+            return [(1, 4)], None
+        return [(key, key) for key in range(*params)], [(name, connector.FieldType.LONG, None, None, None, None, 1, 0)
+                                                       for name in ("participant_id", "course_id")]
+
+    monkeypatch.setattr(concurrency, "read_partition", read_partition)
+    return queries
+
+
+def test_partitions_filter_a_join_in_its_where_clause(monkeypatch):
+    from school_db import read_partitioned
+    queries = record_partitions(monkeypatch)
+    df = read_partitioned("localhost", "root", "", "school", JOIN + " WHERE course.language = 'ENG';", "course.course_id",
+                          partitions=2, workers=1)
+    assert list(df["course_id"]) == [1, 2, 3, 4]
+    assert queries[0] == ("SELECT MIN(course.course_id), MAX(course.course_id) FROM takes_course JOIN course "
+                          "ON takes_course.course_id = course.course_id WHERE course.language = 'ENG'", ())
+    assert queries[1] == (JOIN + " WHERE (course.language = 'ENG') AND course.course_id >= %s AND course.course_id < %s "
+                          "ORDER BY course.course_id", (1, 3))
+
+
+def test_partitions_of_a_grouped_query(monkeypatch):
+    from school_db import read_partitioned
+    queries = record_partitions(monkeypatch)
+    read_partitioned("localhost", "root", "", "school", "SELECT course_id, COUNT(*) FROM takes_course GROUP BY course_id",
+                     "course_id", partitions=2, workers=1)
+    assert queries[0][0] == "SELECT MIN(course_id), MAX(course_id) FROM takes_course"
+    assert queries[1][0] == ("SELECT course_id, COUNT(*) FROM takes_course WHERE course_id >= %s AND course_id < %s "
+                             "GROUP BY course_id ORDER BY course_id")
+
+
+def test_partitioned_queries_cant_have_their_own_order(monkeypatch):
+    from school_db import read_partitioned
+    record_partitions(monkeypatch)
+    with pytest.raises(ValueError):
+        read_partitioned("localhost", "root", "", "school", JOIN + " ORDER BY course.start_date", "course.course_id")
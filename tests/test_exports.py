@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import school_db
+from school_db.startup import HEAVY_MODULES, import_times
+
+
+@pytest.mark.parametrize("name", school_db.__all__)
+def test_every_export_resolves_to_its_module(name):
+    value = getattr(school_db, name)
+    assert value is getattr(sys.modules[f"school_db.{school_db._MODULE_OF[name]}"], name)
+    assert school_db.__dict__[name] is value # cached, so the next lookup skips __getattr__
+
+
+def test_exports_are_unique():
+    names = [name for names in school_db._EXPORTS.values() for name in names]
+    assert len(names) == len(set(names))
+
+
+@pytest.mark.parametrize("name", sorted(school_db._SUBMODULES))
+def test_submodules_resolve(name):
+    assert getattr(school_db, name) is sys.modules[f"school_db.{name}"]
+
+
+def test_unknown_name_raises_attribute_error():
+    with pytest.raises(AttributeError, match="no_such_name"):
+        school_db.no_such_name
+
+
+def test_dir_lists_exports_and_submodules():
+    listed = dir(school_db)
+    assert set(school_db.__all__) <= set(listed)
+    assert {"testing", "startup", "cli"} <= set(listed)
+
+
+def test_circuit_open_error_is_a_connector_error():
+    from mysql.connector import Error
+    assert issubclass(school_db.CircuitOpenError, Error)
+
+
+def test_import_loads_no_heavy_modules():
+    imported = {name for name, _, _, _ in import_times("school_db")}
+    assert not imported & set(HEAVY_MODULES)
+
+
+def test_import_has_no_side_effects():
+    # Importing the package and looking up a name neither connects nor loads the connector
+    code = ("import sys, school_db; school_db.read_query; "
+            "print(','.join(m for m in ('pandas', 'mysql.connector', 'pyarrow') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(school_db.__file__)))
+    assert result.stdout.strip() == ""
@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def chunked(server):
+    from school_db._lazy import connector
+    server.columns = [("language", connector.FieldType.VAR_STRING), ("in_school", connector.FieldType.TINY)]
+    # Two languages and 0/1 in the first chunk; a new language and a 2 in the second
+    server.rows = [("ENG", 0), ("ENG", 1), ("ENG", 1), ("DEU", 0),
+                   ("ENG", 2), ("FRA", 1), ("FRA", 1), ("FRA", 0)]
+    return server.connect()
+
+
+def test_chunks_keep_tinyint_values_beyond_the_first_chunk(chunked):
+    from school_db import read_query_chunks
+    chunks = list(read_query_chunks(chunked, "SELECT language, in_school FROM course", chunksize=4))
+    assert [list(chunk["in_school"]) for chunk in chunks] == [[0, 1, 1, 0], [2, 1, 1, 0]]
+    assert [str(chunk["in_school"].dtype) for chunk in chunks] == ["Int8", "Int8"]
+
+
+def test_chunk_categories_grow(chunked):
+    from school_db import read_query_chunks
+    first, second = read_query_chunks(chunked, "SELECT language, in_school FROM course", chunksize=4)
+    assert list(first["language"].cat.categories) == ["DEU", "ENG"]
+    assert list(second["language"].cat.categories) == ["DEU", "ENG", "FRA"]
+    # ENG keeps its code from the first chunk
+    assert list(first["language"].cat.codes) == [1, 1, 1, 0]
+    assert list(second["language"].cat.codes) == [1, 2, 2, 2]
+
+
+def test_aggregate_chunks_over_growing_categories(chunked):
+    from school_db import aggregate_chunks, read_query_chunks
+    chunks = read_query_chunks(chunked, "SELECT language, in_school FROM course", chunksize=4)
+    totals = aggregate_chunks(chunks, {"rows": ("in_school", "count"), "total": ("in_school", "sum")}, by="language")
+    assert totals.to_dict() == {"rows": {"DEU": 1, "ENG": 4, "FRA": 3}, "total": {"DEU": 0, "ENG": 4, "FRA": 2}}
@@ -0,0 +1,89 @@
+import datetime
+import re
+
+import pytest
+
+MONDAY, TUESDAY = datetime.datetime(2020, 3, 2, 9), datetime.datetime(2020, 3, 3, 9)
+
+
+@pytest.fixture
+def courses(server):
+    # A course table the stand-in server filters on updated_at or course_id, and checksums in key chunks
+    pytest.importorskip("pandas")
+    from school_db._lazy import connector
+    from school_db.incremental import key_checksums
+    table = [(1, MONDAY), (2, MONDAY), (3, TUESDAY)]
+
+    def select(query, params):
+        where = re.search(r"WHERE (\w+) (>=?) %s", query)
+        if where is None:
+            return sorted(table)
+        position = 0 if where.group(1) == "course_id" else 1
+        after = [row for row in table if row[position] > params[0] or (where.group(2) == ">=" and row[position] == params[0])]
+        return sorted(after, key=lambda row: (row[position], row[0]))
+
+    def checksums(query, params):
+        return [(chunk, count, checksum) for chunk, (count, checksum) in key_checksums([row[0] for row in table], params[0]).items()]
+
+    def key_range(query, params):
+        return [(row[0],) for row in table if params[0] <= row[0] < params[1]]
+
+    server.results = {
+        r"BIT_XOR": ([("chunk", connector.FieldType.LONGLONG), ("count", connector.FieldType.LONGLONG),
+                      ("checksum", connector.FieldType.LONGLONG)], checksums),
+        r"^SELECT course_id FROM course WHERE": ([("course_id", connector.FieldType.LONG)], key_range),
+        r"^SELECT \* FROM course": ([("course_id", connector.FieldType.LONG), ("updated_at", connector.FieldType.DATETIME)], select),
+    }
+    return server, table
+
+
+@pytest.fixture
+def state(tmp_path):
+    from school_db import ExtractState
+    return ExtractState(str(tmp_path / "state.json"))
+
+
+def test_only_new_rows_are_read(courses, state):
+    from school_db import ExtractState, read_incremental
+    server, table = courses
+    connection = server.connect()
+    assert list(read_incremental(connection, "course", "course_id", state)["course_id"]) == [1, 2, 3]
+    table.append((4, TUESDAY))
+    assert list(read_incremental(connection, "course", "course_id", state)["course_id"]) == [4]
+    assert len(read_incremental(connection, "course", "course_id", state)) == 0
+    # The mark survives a restart
+    assert ExtractState(state.path).get("course")["mark"] == 4
+
+
+def test_rows_sharing_the_mark_are_not_read_twice(courses, state):
+    from school_db import read_incremental
+    server, table = courses
+    connection = server.connect()
+    read_incremental(connection, "course", "updated_at", state, key="course_id")
+    assert state.get("course")["keys_at_mark"] == [3]
+    # A row committed later with the same timestamp as the mark is still picked up
+    table.append((4, TUESDAY))
+    assert list(read_incremental(connection, "course", "updated_at", state, key="course_id")["course_id"]) == [4]
+    assert state.get("course")["keys_at_mark"] == [4, 3]
+
+
+def test_reconcile_reads_only_the_chunks_which_changed(courses):
+    from school_db import reconcile_deletes
+    server, table = courses
+    table.extend((course_id, MONDAY) for course_id in range(10, 40))
+    local_keys = [row[0] for row in table]
+    table.remove((25, MONDAY))
+    assert reconcile_deletes(server.connect(), "course", "course_id", local_keys, chunk_size=10) == {25}
+    assert [params for sql, params in server.statements if sql.startswith("SELECT course_id")] == [(20, 30)]
+
+
+def test_sync_table_applies_new_rows_and_deletes(courses, state):
+    from school_db import sync_table
+    server, table = courses
+    connection = server.connect()
+    local = sync_table(connection, "course", "course_id", state, reconcile_every=2)
+    table.remove((2, MONDAY))
+    table.append((4, TUESDAY))
+    local = sync_table(connection, "course", "course_id", state, local, reconcile_every=2)
+    assert list(local["course_id"]) == [1, 3, 4]
+    assert state.get("course")["runs"] == 0
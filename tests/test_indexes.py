@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+Q3 = "SELECT * FROM course WHERE language = 'ENG' ORDER BY start_date DESC;"
+
+# What EXPLAIN FORMAT=JSON reports for q3 on a course table with only its primary key
+PLAN = {"query_block": {"select_id": 1, "ordering_operation": {"using_filesort": True, "table": {
+    "table_name": "course", "access_type": "ALL", "rows_examined_per_scan": 9,
+    "used_columns": ["course_id", "course_name", "language", "start_date"],
+}}}}
+
+
+@pytest.fixture
+def explained(server):
+    from school_db._lazy import connector
+    server.results = {
+        r"^EXPLAIN FORMAT=JSON": ([("EXPLAIN", connector.FieldType.JSON)], [(json.dumps(PLAN),)]),
+        r"information_schema\.statistics": ([("index_name", connector.FieldType.VAR_STRING),
+                                              ("column_name", connector.FieldType.VAR_STRING)],
+                                             [("PRIMARY", "course_id")]),
+    }
+    return server
+
+
+def test_plan_problems_finds_the_full_scan_and_the_filesort():
+    from school_db import plan_problems
+    assert plan_problems(PLAN) == [{"alias": "course", "access_type": "ALL", "rows_examined": 9, "full_scan": True,
+                                    "filesort": True, "used_columns": ["course_id", "course_name", "language", "start_date"]}]
+
+
+def test_plan_problems_of_an_indexed_plan():
+    from school_db import plan_problems
+    plan = {"query_block": {"table": {"table_name": "course", "access_type": "const", "used_columns": ["course_id"]}}}
+    assert plan_problems(plan) == []
+
+
+def test_advise_indexes_puts_equality_columns_before_the_sort(explained):
+    pytest.importorskip("pandas")
+    from school_db import advise_indexes
+    advice = advise_indexes(explained.connect(), [Q3])
+    assert advice[["table", "problem", "index"]].to_dict("records") == [
+        {"table": "course", "problem": "full scan + filesort", "index": "course(language, start_date)"}]
+
+
+def test_advise_indexes_skips_indexes_which_already_exist(explained):
+    pytest.importorskip("pandas")
+    from school_db import advise_indexes
+    explained.results[r"information_schema\.statistics"] = (
+        explained.results[r"information_schema\.statistics"][0], [("PRIMARY", "course_id"), ("idx", "language"), ("idx", "start_date")])
+    advice = advise_indexes(explained.connect(), [Q3])
+    assert advice["index"].tolist() == [None]
+
+
+def test_advise_indexes_can_create_the_indexes(explained):
+    pytest.importorskip("pandas")
+    from school_db import advise_indexes
+    advice = advise_indexes(explained.connect(), [Q3], apply=True, runs=1)
+    assert ("CREATE INDEX idx_course_language_start_date ON course (language, start_date);", None) in explained.statements
+    assert {"before_ms", "after_ms"} <= set(advice.columns)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from school_db._lazy import LazyModule, import_package
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def shadowed(tmp_path, monkeypatch):
+    # A plain module `shadow` ahead of the package `shadow` on sys.path, as mysql.py is ahead of MySQL Connector
+    (tmp_path / "first").mkdir()
+    (tmp_path / "first" / "shadow.py").write_text("raise AssertionError('the shadowing module was imported')\n")
+    (tmp_path / "second" / "shadow").mkdir(parents=True)
+    (tmp_path / "second" / "shadow" / "__init__.py").write_text("")
+    (tmp_path / "second" / "shadow" / "inner.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path / "second"))
+    monkeypatch.syspath_prepend(str(tmp_path / "first"))
+    yield tmp_path
+    for name in ["shadow", "shadow.inner"]:
+        sys.modules.pop(name, None)
+
+
+def test_import_package_skips_a_module_hiding_the_package(shadowed):
+    import_package("shadow")
+    assert sys.modules["shadow"].__path__ == [str(shadowed / "second" / "shadow")]
+    from shadow.inner import VALUE
+    assert VALUE == 42
+
+
+def test_lazy_module_finds_a_hidden_package(shadowed):
+    inner = LazyModule("shadow.inner")
+    assert inner.available()
+    assert inner.VALUE == 42
+
+
+def test_import_package_leaves_an_unshadowed_package_alone():
+    import_package("json")
+    import_package("no_such_package")
+    assert "no_such_package" not in sys.modules
+
+
+def test_import_package_without_a_package_does_nothing(shadowed, monkeypatch):
+    monkeypatch.setattr(sys, "path", [str(shadowed / "first")])
+    import_package("shadow")
+    assert "shadow" not in sys.modules
+
+
+def test_missing_module_suggests_how_to_install_it():
+    missing = LazyModule("no_such_module", install="no-such-module")
+    assert not missing.available()
+    with pytest.raises(ImportError, match="pip install no-such-module"):
+        missing.anything
+
+
+def test_connector_is_found_next_to_the_tutorial():
+    # Run from the repository, where mysql.py (which refuses to be imported) comes first on sys.path
+    code = ("from school_db._lazy import connector; assert connector.available(); "
+            "import mysql; assert hasattr(mysql, '__path__'); print(connector.Error.__module__)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=REPOSITORY)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "mysql.connector.errors"
+
+
+def test_importing_the_tutorial_fails_without_running_it():
+    result = subprocess.run([sys.executable, "-c", "import mysql"], capture_output=True, text=True, cwd=REPOSITORY)
+    assert "import school_db instead" in result.stderr
+    assert "connection successful" not in result.stdout
@@ -0,0 +1,55 @@
+import pytest
+
+
+@pytest.fixture
+def clients(server):
+    import pandas as pd
+    from school_db._lazy import connector
+    FieldType = connector.FieldType
+    server.columns = [("client_id", FieldType.LONG), ("client_name", FieldType.VAR_STRING), ("address", FieldType.VAR_STRING)]
+    server.rows = [(client_id, f"Client {client_id}", f"{client_id} Musterstraße") for client_id in range(1000)]
+    return server, pd.DataFrame(server.rows, columns=["client_id", "client_name", "address"])
+
+
+def writes(server):
+    return [query for query, _ in server.statements if not query.startswith("SELECT")]
+
+
+def test_merge_reads_only_the_chunks_which_differ(clients):
+    from school_db import merge_frame
+    server, df = clients
+    df.loc[df["client_id"] == 500, "address"] = "23 Fingiertweg"
+    stats = merge_frame(server.connect(), "client", df, key="client_id")
+    assert (stats["updated"], stats["inserted"], stats["unchanged"]) == (1, 0, 999)
+    assert 1 <= stats["rows_read"] <= 20
+    assert [query.split(" VALUES ")[0] for query in writes(server)] == ["INSERT INTO client (client_id, client_name, address)"]
+
+
+def test_merge_without_changes_reads_no_rows(clients):
+    from school_db import merge_frame
+    server, df = clients
+    stats = merge_frame(server.connect(), "client", df, key="client_id")
+    assert (stats["unchanged"], stats["rows_read"], stats["statements"]) == (1000, 0, 0)
+
+
+def test_merge_inserts_and_deletes(clients):
+    import pandas as pd
+    from school_db import merge_frame
+    server, df = clients
+    new = pd.DataFrame([(1000, "Client 1000", "1000 Musterstraße")], columns=df.columns)
+    df = pd.concat([df[df["client_id"] != 7], new], ignore_index=True)
+    stats = merge_frame(server.connect(), "client", df, key="client_id", delete_missing=True)
+    assert (stats["inserted"], stats["updated"], stats["deleted"]) == (1, 0, 1)
+    assert [params for query, params in server.statements if query.startswith("DELETE")] == [[7]]
+
+
+def test_merge_with_every_column_in_the_key_inserts_ignoring_duplicates(server):
+    import pandas as pd
+    from school_db import merge_frame
+    from school_db._lazy import connector
+    server.columns = [("participant_id", connector.FieldType.LONG), ("course_id", connector.FieldType.LONG)]
+    server.rows = [(101, 12)]
+    df = pd.DataFrame([(101, 12), (102, 12)], columns=["participant_id", "course_id"])
+    stats = merge_frame(server.connect(), "takes_course", df, key=["participant_id", "course_id"])
+    assert stats["inserted"] == 1
+    assert writes(server) == ["INSERT IGNORE INTO takes_course (participant_id, course_id) VALUES (%s, %s)"]
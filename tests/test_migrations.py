@@ -0,0 +1,74 @@
+import pytest
+
+
+def no_such_table():
+    from school_db._lazy import connector
+    return connector.ProgrammingError(msg="Table 'school.schema_migrations' doesn't exist", errno=connector.errorcode.ER_NO_SUCH_TABLE)
+
+
+@pytest.fixture
+def school(server):
+    # A database whose schema_migrations table is empty, or missing: set server.results to change either
+    from school_db._lazy import connector
+    text = connector.FieldType.VAR_STRING
+    server.results = {
+        r"^SELECT version, checksum FROM schema_migrations": ([("version", connector.FieldType.LONG), ("checksum", text)], []),
+        r"information_schema\.TABLES": ([("TABLE_NAME", text), ("COLUMN_NAME", text), ("REFERENCED_TABLE_NAME", text)], []),
+    }
+    return server
+
+
+def run(server, statement):
+    return [sql for sql, _ in server.statements if sql.lstrip().startswith(statement)]
+
+
+def test_a_new_database_gets_every_migration(school):
+    from school_db import migrate
+    from school_db.migrations import MIGRATIONS
+    school.results[r"^SELECT version, checksum FROM schema_migrations"] = no_such_table()
+    assert migrate(school.connect()) == MIGRATIONS
+    assert len(run(school, "CREATE TABLE IF NOT EXISTS schema_migrations")) == 1
+    assert len(run(school, "ALTER TABLE")) == 3
+    assert [params[0] for sql, params in school.statements if sql.startswith("INSERT INTO schema_migrations")] == list(range(1, 9))
+
+
+def test_tables_created_before_migrations_are_only_recorded(school):
+    from school_db import migrate
+    tables = [(table, None, None) for table in ("teacher", "client", "participant", "course")]
+    keys = [("participant", "client", "client"), ("course", "teacher", "teacher"), ("course", "client", "client")]
+    school.results[r"information_schema\.TABLES"] = (school.results[r"information_schema\.TABLES"][0], tables + keys)
+    assert [migration.version for migration in migrate(school.connect())] == list(range(1, 9))
+    # Only takes_course is missing, and no foreign key is added twice
+    assert [sql.split()[2] for sql in run(school, "CREATE TABLE")] == ["takes_course"]
+    assert run(school, "ALTER TABLE") == []
+
+
+def test_an_up_to_date_schema_takes_one_query(school, capsys):
+    from school_db import migrate
+    from school_db.migrations import MIGRATIONS
+    columns = school.results[r"^SELECT version, checksum FROM schema_migrations"][0]
+    school.results[r"^SELECT version, checksum FROM schema_migrations"] = (
+        columns, [(migration.version, migration.checksum) for migration in MIGRATIONS])
+    assert migrate(school.connect()) == []
+    assert len(school.statements) == 1
+    assert "Schema is up to date" in capsys.readouterr().out
+
+
+def test_changed_migrations_are_reported(school, capsys):
+    from school_db import migrate
+    from school_db.migrations import MIGRATIONS
+    columns = school.results[r"^SELECT version, checksum FROM schema_migrations"][0]
+    school.results[r"^SELECT version, checksum FROM schema_migrations"] = (
+        columns, [(migration.version, "0" * 64 if migration.version == 2 else migration.checksum) for migration in MIGRATIONS])
+    migrate(school.connect())
+    assert "migration 2 (create client) has changed" in capsys.readouterr().out
+
+
+def test_a_failing_migration_stops_the_run(school):
+    from school_db import migrate
+    from school_db._lazy import connector
+    school.results[r"^\s*CREATE TABLE participant"] = connector.ProgrammingError(msg="Access denied", errno=1142)
+    with pytest.raises(connector.Error):
+        migrate(school.connect())
+    # Everything before it was recorded, so the next run resumes at the failed migration
+    assert [params[0] for sql, params in school.statements if sql.startswith("INSERT INTO schema_migrations")] == [1, 2]
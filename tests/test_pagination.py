@@ -0,0 +1,58 @@
+import datetime
+import decimal
+
+import pytest
+
+
+@pytest.fixture
+def paginator(server):
+    from school_db import KeysetPaginator
+    return KeysetPaginator(server.connect(), "SELECT * FROM recording",
+                           [("fingerprint", "ASC"), ("duration", "DESC"), ("price", "ASC")], key="recording_id")
+
+
+def test_tokens_round_trip_binary_time_and_decimal_values(paginator):
+    last = [b"\x00\xff\x10", datetime.timedelta(hours=1, minutes=2, microseconds=3), decimal.Decimal("9.50"), 7]
+    token = paginator.encode(last)
+    assert paginator.decode(token) == last
+    assert isinstance(paginator.decode(token)[2], decimal.Decimal)
+
+
+def test_values_a_token_cant_hold_are_rejected(paginator):
+    with pytest.raises(ValueError):
+        paginator.encode([{"ENG", "DEU"}, None, None, 7])
+
+
+COURSES = [(course_id, f"Course {course_id}") for course_id in range(1, 8)]
+
+
+@pytest.fixture
+def courses(server):
+    from school_db._lazy import connector
+
+    def seek(query, params):
+        # Emulate the page query: rows after the token's course_id, in order, one more than a page, keys at the end
+        after = params[-1] if params else 0
+        limit = int(query.rsplit("LIMIT", 1)[1].strip(" ;"))
+        return [row + (row[0],) for row in COURSES if row[0] > after][:limit]
+
+    server.results = {r"_page_key_0": ([("course_id", connector.FieldType.LONG), ("course_name", connector.FieldType.VAR_STRING),
+                                        ("_page_key_0", connector.FieldType.LONG)], seek)}
+    return server
+
+
+def test_paging_through_select_star(courses):
+    from school_db import KeysetPaginator
+    paginator = KeysetPaginator(courses.connect(), "SELECT * FROM course", [("course_id", "ASC")], key="course_id", page_size=3)
+    assert list(paginator) == [COURSES[:3], COURSES[3:6], COURSES[6:]]
+    sql, _ = courses.statements[0]
+    assert sql == "SELECT *, course_id AS _page_key_0 FROM course ORDER BY course_id ASC LIMIT 4;"
+
+
+def test_ordering_values_go_after_subqueries_in_the_select_list(server):
+    from school_db import KeysetPaginator
+    query = "SELECT c.*, (SELECT COUNT(*) FROM takes_course t WHERE t.course_id = c.course_id) AS n FROM course c"
+    paginator = KeysetPaginator(server.connect(), query, [("c.start_date", "DESC")], key="c.course_id")
+    sql, _ = paginator.page_query()
+    assert sql.startswith("SELECT c.*, (SELECT COUNT(*) FROM takes_course t WHERE t.course_id = c.course_id) AS n, "
+                          "c.start_date AS _page_key_0, c.course_id AS _page_key_1 FROM course c")
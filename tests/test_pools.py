@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def pool(server):
+    from school_db import ConnectionPool
+    return ConnectionPool(server.connect, max_size=2, checkout_timeout=0.05)
+
+
+def test_connections_are_reused(server, pool):
+    with pool.connection() as connection:
+        first = connection._raw
+    with pool.connection() as connection:
+        assert connection._raw is first
+    assert server.connections_opened == 1
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0}
+
+
+def test_checkout_waits_for_a_free_connection(pool):
+    from school_db._lazy import connector
+    held = [pool.checkout(), pool.checkout()]
+    with pytest.raises(connector.errors.PoolError):
+        pool.checkout()
+    held.pop().close()
+    assert pool.checkout() is not None
+
+
+def test_open_transactions_are_rolled_back_on_checkin(pool):
+    with pool.connection() as connection:
+        raw = connection._raw
+        connection.cursor().execute("INSERT INTO client VALUES (107, 'A', 'B', 'C');")
+        assert raw.in_transaction
+    assert not raw.in_transaction
+
+
+def test_broken_and_expired_connections_are_replaced(server, pool):
+    with pool.connection() as connection:
+        connection._raw.close()
+    with pool.connection():
+        pass
+    assert server.connections_opened == 2
+    pool.max_lifetime_seconds = 0
+    time.sleep(0.01)
+    with pool.connection():
+        pass
+    assert server.connections_opened == 3
+    assert pool.stats()["size"] == 0 # the expired connection was closed on its way back, too
+
+
+def test_idle_connections_are_closed(server, pool):
+    pool.max_idle_seconds = 0
+    with pool.connection() as connection:
+        raw = connection._raw
+    time.sleep(0.01)
+    with pool.connection():
+        pass
+    assert not raw.open and server.connections_opened == 2
+
+
+def test_a_returned_connection_cant_be_used(pool):
+    from school_db._lazy import connector
+    connection = pool.checkout()
+    connection.close()
+    with pytest.raises(connector.errors.PoolError):
+        connection.cursor()
+    pool.close()
+    with pytest.raises(connector.errors.PoolError):
+        pool.checkout()
+
+
+def async_pool(server, **options):
+    from school_db import AsyncConnectionPool
+    from school_db.testing import connect_to_stand_in
+    return AsyncConnectionPool(lambda: connect_to_stand_in(server), **options)
+
+
+def test_async_connections_are_reused(server):
+    async def main():
+        pool = async_pool(server, max_size=2)
+        async with pool.connection() as connection:
+            first = connection._raw
+        async with pool.connection() as connection:
+            assert connection._raw is first
+        await pool.close()
+    asyncio.run(main())
+    assert server.connections_opened == 1
+
+
+def test_async_checkout_waits_for_a_free_connection(server):
+    from school_db._lazy import connector
+
+    async def main():
+        pool = async_pool(server, max_size=1, checkout_timeout=0.05)
+        held = await pool.checkout()
+        with pytest.raises(connector.errors.PoolError):
+            await pool.checkout()
+        asyncio.get_running_loop().call_later(0.01, lambda: asyncio.ensure_future(held.close()))
+        pool.checkout_timeout = 1
+        return await pool.checkout()
+    assert asyncio.run(main()) is not None
+
+
+def test_queries_run_concurrently_on_the_pool(server):
+    from school_db import read_queries_concurrently
+    from school_db._lazy import connector
+    server.query_latency = 0.05
+    server.columns, server.rows = [("client_id", connector.FieldType.LONG)], [(101,)]
+
+    async def main():
+        pool = async_pool(server, max_size=5)
+        start = time.perf_counter()
+        results = await read_queries_concurrently(pool, ["SELECT client_id FROM client;"] * 10, concurrency=5)
+        return results, time.perf_counter() - start
+    results, elapsed = asyncio.run(main())
+    assert results == [[(101,)]] * 10
+    assert server.connections_opened == 5
+    assert elapsed < 10 * 0.05 # two rounds of five, rather than ten in a row
@@ -0,0 +1,68 @@
+import pytest
+
+
+@pytest.fixture
+def profiler():
+    from school_db import disable_profiling, enable_profiling
+    slow = []
+    yield enable_profiling(slow_query_seconds=0, on_slow_query=slow.append), slow
+    disable_profiling()
+
+
+def test_reads_are_grouped_by_fingerprint(server, profiler):
+    from school_db import read_query
+    from school_db._lazy import connector
+    profiler, _ = profiler
+    server.columns, server.rows = [("client_id", connector.FieldType.LONG)], [(101,), (102,)]
+    connection = server.connect()
+    for client_id in (101, 102, 103):
+        read_query(connection, f"SELECT client_id FROM client WHERE client_id = {client_id};")
+    queries = profiler.export()["queries"]
+    assert list(queries) == ["SELECT client_id FROM client WHERE client_id = ?"]
+    stats = queries["SELECT client_id FROM client WHERE client_id = ?"]
+    assert stats["calls"] == 3 and stats["rows"] == 6 and stats["errors"] == 0
+    assert stats["bytes_received"] == 3 * 2 * (3 + 2 + 4)
+    # The latest call is kept, so it can be run again, e.g. by the index advisor
+    assert profiler.captured_queries() == [("SELECT client_id FROM client WHERE client_id = 103;", None)]
+
+
+def test_failed_calls_are_counted(server, profiler):
+    from school_db import execute_query
+    from school_db._lazy import connector
+    profiler, _ = profiler
+    server.results = {r"^DELETE": connector.DatabaseError(msg="Cannot delete a parent row", errno=1451)}
+    execute_query(server.connect(), "DELETE FROM client WHERE client_id = 101;")
+    assert profiler.export()["queries"]["DELETE FROM client WHERE client_id = ?"]["errors"] == 1
+
+
+def test_slow_queries_are_reported(server, profiler):
+    from school_db import execute_query
+    _, slow = profiler
+    execute_query(server.connect(), "UPDATE client SET industry = 'NGO' WHERE client_id = 101;")
+    assert [sample.query for sample in slow] == ["UPDATE client SET industry = 'NGO' WHERE client_id = 101;"]
+
+
+def test_connects_are_timed(server, profiler, monkeypatch):
+    from school_db import connections, create_db_connection
+    profiler, _ = profiler
+    monkeypatch.setattr(connections, "get_pool", lambda *args: connections.ConnectionPool(server.connect))
+    create_db_connection("localhost", "root", "", "school")
+    assert profiler.export()["connect"]["count"] == 1
+
+
+def test_histogram_percentiles():
+    from school_db.profiling import LatencyHistogram
+    histogram = LatencyHistogram()
+    for milliseconds in range(1, 101):
+        histogram.add(milliseconds / 1000)
+    summary = histogram.summary()
+    assert summary["count"] == 100 and summary["max"] == 0.1
+    # Each percentile is the upper edge of its bucket, a quarter of a doubling wide
+    assert 0.050 <= summary["p50"] <= 0.050 * 2 ** 0.25
+    assert 0.095 <= summary["p95"] <= summary["p99"] <= 0.1
+
+
+def test_nothing_is_recorded_while_profiling_is_off():
+    from school_db import profiling
+    assert profiling.profiler is None
+    assert profiling.profile_query("SELECT 1") is profiling.NO_SAMPLE
@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def lost_connection(server):
+    # The connection drops after 5 rows
+    from school_db._lazy import connector
+    server.columns = [("course_id", connector.FieldType.LONG)]
+
+    def rows():
+        yield from ((course_id,) for course_id in range(5))
+        raise connector.Error("Lost connection to MySQL server during query")
+
+    server.rows = rows
+    return server.connect()
+
+
+def test_stream_query_raises_errors(lost_connection, capsys):
+    from school_db import stream_query
+    from school_db._lazy import connector
+    streamed = []
+    with pytest.raises(connector.Error):
+        for row in stream_query(lost_connection, "SELECT course_id FROM course", batch_size=2):
+            streamed.append(row)
+    assert streamed == [(0,), (1,), (2,), (3,)]
+    assert "Lost connection" in capsys.readouterr().out
+
+
+def test_chunks_and_their_aggregates_raise_errors(lost_connection):
+    from school_db import aggregate_chunks, read_query_chunks
+    from school_db._lazy import connector
+    with pytest.raises(connector.Error):
+        list(read_query_chunks(lost_connection, "SELECT course_id FROM course", chunksize=2))
+    with pytest.raises(connector.Error):
+        aggregate_chunks(read_query_chunks(lost_connection, "SELECT course_id FROM course", chunksize=2),
+                         {"courses": ("course_id", "count")})
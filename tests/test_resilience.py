@@ -0,0 +1,133 @@
+import pytest
+
+
+def refused(host):
+    from school_db._lazy import connector
+    return connector.InterfaceError(msg=f"Can't connect to MySQL server on '{host}'", errno=connector.errorcode.CR_CONN_HOST_ERROR)
+
+
+def lost():
+    from school_db._lazy import connector
+    return connector.OperationalError(msg="Lost connection to MySQL server during query", errno=connector.errorcode.CR_SERVER_LOST)
+
+
+@pytest.fixture
+def cluster(server):
+    from school_db import RetryPolicy, ResilientConnection
+    from school_db._lazy import connector
+    server.columns, server.rows = [("client_id", connector.FieldType.LONG)], [(1,)]
+    down = set()
+    attempts, opened = [], []
+
+    def connect(host):
+        attempts.append(host)
+        if host in down:
+            raise refused(host)
+        connection = server.connect()
+        connection.server_host, connection.server_port, connection.database = host, 3306, "school"
+        opened.append((host, connection))
+        return connection
+
+    connection = ResilientConnection(["primary", "replica"], "root", "", "school", connect=connect,
+                                     retry=RetryPolicy(attempts=3, base_delay=0), failure_threshold=2, reset_seconds=60)
+    return connection, down, attempts, opened
+
+
+def fail_next(server, pattern, errors):
+    # The next len(errors) statements matching pattern raise these errors; the ones after that run as usual
+    errors = list(errors)
+
+    def rows(query, params):
+        if errors:
+            raise errors.pop(0)
+        return server.rows
+    server.results[pattern] = (server.columns, rows)
+
+
+def test_reads_are_retried_on_a_new_connection(server, cluster):
+    from school_db import read_query
+    connection, _, attempts, opened = cluster
+    fail_next(server, r"^SELECT", [lost()])
+    assert read_query(connection, "SELECT client_id FROM client;") == [(1,)]
+    assert attempts == ["primary", "primary"]
+    assert not opened[0][1].open # the broken connection was closed
+
+
+def test_writes_which_may_have_run_are_not_retried(server, cluster, capsys):
+    from school_db import execute_query
+    connection, _, attempts, _ = cluster
+    fail_next(server, r"^UPDATE", [lost()])
+    execute_query(connection, "UPDATE client SET industry = 'NGO' WHERE client_id = 1;")
+    assert "Lost connection" in capsys.readouterr().out
+    assert sum(sql.startswith("UPDATE") for sql, _ in server.statements) == 1
+
+
+def test_deadlocks_are_retried(server, cluster, capsys):
+    from school_db import execute_query
+    from school_db._lazy import connector
+    connection, *_ = cluster
+    deadlock = connector.DatabaseError(msg="Deadlock found when trying to get lock", errno=connector.errorcode.ER_LOCK_DEADLOCK)
+    fail_next(server, r"^UPDATE", [deadlock])
+    execute_query(connection, "UPDATE client SET industry = 'NGO' WHERE client_id = 1;")
+    assert "Query successful" in capsys.readouterr().out
+
+
+def test_reads_fail_over_and_writes_do_not(cluster, capsys):
+    from school_db import execute_query, read_query
+    connection, down, attempts, _ = cluster
+    down.add("primary")
+    assert read_query(connection, "SELECT client_id FROM client;") == [(1,)]
+    assert connection.host == "replica"
+    execute_query(connection, "UPDATE client SET industry = 'NGO' WHERE client_id = 1;")
+    assert "Query successful" not in capsys.readouterr().out
+    assert "replica" not in attempts[attempts.index("replica") + 1:]
+
+
+def test_the_circuit_breaker_keeps_calls_away_from_a_down_host(cluster):
+    from school_db import read_query
+    connection, down, attempts, _ = cluster
+    down.add("primary")
+    for _ in range(3):
+        connection.disconnect()
+        read_query(connection, "SELECT client_id FROM client;")
+    # Two failures open the primary's breaker, so the third read goes straight to the replica
+    assert attempts == ["primary", "replica", "primary", "replica", "replica"]
+    assert connection.breakers["primary"].state == "open"
+
+
+def test_no_host_available(cluster):
+    from school_db._lazy import connector
+    from school_db.resilience import CircuitOpenError
+    connection, down, _, _ = cluster
+    down.update({"primary", "replica"})
+    for _ in range(2):
+        with pytest.raises(connector.Error):
+            connection.connection(read_only=True)
+    with pytest.raises(CircuitOpenError):
+        connection.connection(read_only=True)
+
+
+def test_a_half_open_breaker_lets_one_call_through():
+    from school_db.resilience import CircuitBreaker
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_cached_reads_fail_over_to_the_replica(cluster):
+    from school_db import disable_result_cache, enable_result_cache, read_query
+    connection, down, _, opened = cluster
+    cache = enable_result_cache()
+    try:
+        down.add("primary")
+        assert read_query(connection, "SELECT client_id FROM client;") == [(1,)]
+        assert read_query(connection, "SELECT client_id FROM client;") == [(1,)]
+        assert cache.hits == 1
+    finally:
+        disable_result_cache()
+    # The replica connection is kept for the cached read, rather than dropped for a try at the primary
+    assert [host for host, _ in opened] == ["replica"]
+    assert opened[0][1].open
@@ -0,0 +1,73 @@
+import pytest
+
+TRIGGER_SCRIPT = """
+CREATE TABLE audit (note VARCHAR(100)); -- where changes are logged
+INSERT INTO audit VALUES ('a; b'), ("it's");
+/* a block comment; with a semicolon */
+DELIMITER //
+CREATE TRIGGER course_audit AFTER DELETE ON course FOR EACH ROW
+BEGIN
+  INSERT INTO audit VALUES ('deleted');
+END//
+DELIMITER ;
+# a comment on its own
+SELECT * FROM audit;
+"""
+
+
+def test_split_statements():
+    from school_db import split_statements
+    statements = split_statements(TRIGGER_SCRIPT)
+    # Semicolons in strings and comments don't end a statement, and comments on their own aren't statements
+    assert [statement.splitlines()[-1] for statement, _ in statements] == [
+        "CREATE TABLE audit (note VARCHAR(100))",
+        "INSERT INTO audit VALUES ('a; b'), (\"it's\")",
+        "END",
+        "SELECT * FROM audit",
+    ]
+    # Statements between DELIMITER lines are sent on their own
+    assert [batchable for _, batchable in statements] == [True, True, False, True]
+
+
+def test_statements_are_batched_up_to_the_size_limit():
+    from school_db.scripts import split_statements, statement_batches
+    statements = split_statements("\n".join(f"INSERT INTO audit VALUES ({i});" for i in range(10)))
+    # Each statement is 30 bytes, and 2 more to join it to the batch: three fit in 100 bytes
+    assert len(statement_batches(statements, 0, 100)) == 3
+    assert len(statement_batches(statements, 9, 100)) == 1
+
+
+def test_a_trigger_script_runs_statement_by_statement(server):
+    from school_db import run_script
+    from school_db._lazy import connector
+    server.columns, server.rows = [("note", connector.FieldType.VAR_STRING)], [("a; b",), ("it's",)]
+    results = run_script(server.connect(), TRIGGER_SCRIPT, max_batch_bytes=1000)
+    assert [result["error"] for result in results] == [None] * 4
+    assert results[-1]["rows"] == [("a; b",), ("it's",)]
+
+
+def failing_insert(server):
+    from school_db._lazy import connector
+    server.results = {r"^INSERT INTO audit VALUES \(1\)": connector.IntegrityError(msg="Duplicate entry '1'", errno=1062)}
+    return "\n".join(f"INSERT INTO audit VALUES ({i});" for i in range(4))
+
+
+def test_a_failing_statement_stops_the_script(server):
+    from school_db import run_script
+    results = run_script(server.connect(), failing_insert(server), max_batch_bytes=1000)
+    assert [result["index"] for result in results] == [0, 1]
+    assert "Duplicate entry" in str(results[1]["error"])
+
+
+def test_keep_going_resends_the_rest_of_the_batch(server):
+    from school_db import run_script
+    results = run_script(server.connect(), failing_insert(server), stop_on_error=False, max_batch_bytes=1000)
+    assert [result["error"] is None for result in results] == [True, False, True, True]
+
+
+def test_scripts_can_be_read_from_files(server, tmp_path):
+    from school_db import run_script
+    path = tmp_path / "setup.sql"
+    path.write_text("CREATE DATABASE school_copy;\nUSE school_copy;\n", encoding="utf-8")
+    results = run_script(server.connect(), str(path), max_batch_bytes=1000)
+    assert [result["statement"] for result in results] == ["CREATE DATABASE school_copy", "USE school_copy"]
@@ -0,0 +1,56 @@
+from school_db import startup
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        900 | encodings
+import time:       800 |        800 |     school_db._lazy
+import time:      1500 |       2500 |   school_db.connections
+import time:      1000 |       4000 | school_db
+import time:     30000 |      60000 |   pandas
+import time:      2000 |      62000 | school_db.frames
+import time:       500 |        500 | school_dbx
+"""
+
+
+def test_import_time_lines_are_parsed():
+    match = startup.IMPORT_TIME.match("import time:      1500 |       2500 |   school_db.connections")
+    assert match.groups() == ("1500", "2500", "   ", "school_db.connections")
+    assert startup.IMPORT_TIME.match("import time: self [us] | cumulative | imported package") is None
+
+
+def test_startup_cost_counts_top_level_package_imports():
+    times = parse(IMPORTTIME_OUTPUT)
+    assert ("school_db.connections", 1, 1500, 2500) in times
+    milliseconds, heavy = startup.startup_cost(times)
+    assert milliseconds == 66.0 # school_db and school_db.frames; nested imports are inside their cumulative times
+    assert heavy == ["pandas"]
+
+
+def test_import_times_measures_a_fresh_interpreter():
+    times = startup.import_times("school_db")
+    assert [name for name, depth, _, _ in times if depth == 0][-1] == "school_db"
+
+
+def test_benchmark_startup_checks_the_budget(monkeypatch, capsys):
+    monkeypatch.setattr(startup, "import_times", lambda module: parse(IMPORTTIME_OUTPUT))
+    over, = startup.benchmark_startup(["school_db"], runs=3, budget_ms=50)
+    assert over == {"module": "school_db", "median_ms": 66.0, "heavy_imports": ["pandas"], "within_budget": False}
+    assert "OVER BUDGET" in capsys.readouterr().out
+
+    light = "import time:      1000 |       4000 | school_db\n"
+    monkeypatch.setattr(startup, "import_times", lambda module: parse(light))
+    within, = startup.benchmark_startup(["school_db"], runs=1, budget_ms=50)
+    assert within["within_budget"]
+    assert not startup.benchmark_startup(["school_db"], runs=1, budget_ms=3)[0]["within_budget"]
+
+
+def parse(output):
+    # What import_times returns for this -X importtime output
+    times = []
+    for line in output.splitlines():
+        match = startup.IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append((name, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+    return times
@@ -0,0 +1,21 @@
+import gc
+import weakref
+
+
+def test_statement_cache_is_per_connection(server):
+    from school_db import run_statement, statement_cache
+    first, second = server.connect(), server.connect()
+    for client_id in (101, 102, 101):
+        run_statement(first, "SELECT * FROM client WHERE client_id = %s", (client_id,))
+    assert statement_cache(first).stats()["hits"] == 2
+    assert statement_cache(second).stats()["misses"] == 0
+
+
+def test_statement_cache_does_not_keep_its_connection_alive(server):
+    from school_db import run_statement
+    connection = server.connect()
+    run_statement(connection, "SELECT * FROM client WHERE client_id = %s", (101,))
+    collected = weakref.ref(connection)
+    del connection
+    gc.collect()
+    assert collected() is None
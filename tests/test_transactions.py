@@ -0,0 +1,58 @@
+import pytest
+
+
+@pytest.fixture
+def failing_teachers(server, monkeypatch):
+    # Inserts into teacher fail, as if a tax_id were already taken; rollbacks of the whole transaction are counted
+    from school_db._lazy import connector
+    from school_db.testing import StandInConnection, StandInCursor
+    run, rollbacks = StandInCursor.run, []
+
+    def run_or_fail(self, query, params=None):
+        if query.startswith("INSERT INTO teacher"):
+            self.connection.server.statements.append((query, params))
+            raise connector.Error("Duplicate entry '62884' for key 'teacher.tax_id'")
+        return run(self, query, params)
+
+    monkeypatch.setattr(StandInCursor, "run", run_or_fail)
+    monkeypatch.setattr(StandInConnection, "rollback", lambda connection: rollbacks.append(connection))
+    return server, rollbacks
+
+
+def statements(server):
+    return [query.split(" VALUES")[0].rstrip(";") for query, _ in server.statements]
+
+
+def test_failing_bulk_insert_only_undoes_itself(failing_teachers):
+    from school_db import bulk_insert, transaction
+    from school_db._lazy import connector
+    server, rollbacks = failing_teachers
+    with transaction(server.connect()) as tx:
+        tx.execute("INSERT INTO client VALUES (%s, %s, %s, %s)", (107, "Lingua", "1 Weg", "NGO"))
+        with pytest.raises(connector.Error):
+            bulk_insert(tx, "teacher", ["teacher_id", "tax_id"], [(8, 62884)], packet_bytes=2**20)
+        tx.execute("INSERT INTO course (course_id) VALUES (%s)", (21,))
+    assert statements(server) == [
+        "INSERT INTO client",
+        "SAVEPOINT savepoint_1",
+        "INSERT INTO teacher (teacher_id, tax_id)",
+        "ROLLBACK TO SAVEPOINT savepoint_1",
+        "INSERT INTO course (course_id)",
+    ]
+    assert rollbacks == [] and tx.commits == 1
+
+
+def test_failing_merge_only_undoes_itself(failing_teachers):
+    import pandas as pd
+    from school_db import merge_frame, transaction
+    from school_db._lazy import connector
+    server, rollbacks = failing_teachers
+    server.columns = [("teacher_id", connector.FieldType.LONG), ("tax_id", connector.FieldType.LONG)]
+    with transaction(server.connect()) as tx:
+        tx.execute("INSERT INTO client VALUES (%s, %s, %s, %s)", (107, "Lingua", "1 Weg", "NGO"))
+        with pytest.raises(connector.Error):
+            merge_frame(tx, "teacher", pd.DataFrame({"teacher_id": [8], "tax_id": [62884]}), key="teacher_id", packet_bytes=2**20)
+        tx.execute("INSERT INTO course (course_id) VALUES (%s)", (21,))
+    assert "ROLLBACK TO SAVEPOINT savepoint_1" in statements(server)
+    assert statements(server)[-1] == "INSERT INTO course (course_id)"
+    assert rollbacks == [] and tx.commits == 1
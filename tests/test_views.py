@@ -0,0 +1,52 @@
+import pytest
+
+ENROLMENTS = """
+SELECT course.course_id, course.course_name, client.client_id, client.client_name,
+       COUNT(takes_course.participant_id) AS enrolments
+FROM takes_course
+JOIN course ON takes_course.course_id = course.course_id
+JOIN client ON course.client = client.client_id
+GROUP BY course.course_id, course.course_name, client.client_id, client.client_name;
+"""
+
+
+@pytest.fixture
+def view(server):
+    from school_db import views
+    connection = server.connect()
+    view = views.materialize(connection, "course_client_enrolments", ENROLMENTS, key=["course_id", "client_id"], scopes={
+        "takes_course": ("course_id", "course.course_id"),
+        "course": ("course_id", "course.course_id"),
+        "client": ("client_id", "client.client_id"),
+    })
+    yield connection, view
+    views._views.pop(view.name, None)
+
+
+def test_deleting_a_participant_refreshes_the_view(view):
+    from school_db.queries import execute_query, read_query
+    connection, view = view
+    assert not view.stale and view.full_refreshes == 1
+
+    # Deleting a participant cascades into takes_course, which the view reads
+    execute_query(connection, "DELETE FROM participant WHERE participant_id = 101;")
+    assert view.stale
+
+    read_query(connection, ENROLMENTS)
+    assert view.full_refreshes == 2 and not view.stale
+
+
+def test_inserting_a_participant_leaves_the_view_fresh(view):
+    from school_db.queries import execute_query
+    connection, view = view
+    execute_query(connection, "INSERT INTO participant VALUES (199, 'Ada', 'Lovelace', '555-0199', 101);")
+    assert not view.stale
+
+
+def test_invalidating_a_table_marks_views_over_its_dependents_stale(view):
+    from school_db.caching import dependent_tables, invalidate_cached_tables
+    _, view = view
+    assert dependent_tables({"client"}) == {"client", "participant", "course", "takes_course"}
+
+    invalidate_cached_tables({"participant"})
+    assert view.stale